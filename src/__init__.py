@@ -1,13 +1,35 @@
 """
 Sistema de Detecção de Árvores PXG
 Versão otimizada para detecção em movimento
+
+TreeDetector e OverlayWindow são importados no primeiro uso: `import src.detector`
+só carrega numpy/cv2, sem tkinter, keyboard ou PIL (roda em workers Linux headless).
 """
 
 __version__ = "2.0.0"
 __author__ = "PXG Tree Detector"
 
-from src.detector import TreeDetector
-from src.overlay import OverlayWindow
 from src.config import *
 
 __all__ = ['TreeDetector', 'OverlayWindow']
+
+# Nome exportado -> módulo que o define (carregado sob demanda, PEP 562)
+_LAZY_ATTRIBUTES = {
+    'TreeDetector': 'src.detector',
+    'OverlayWindow': 'src.overlay',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value  # Próximos acessos não passam mais por aqui
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
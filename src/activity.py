@@ -0,0 +1,114 @@
+"""
+Monitor de atividade: baixa o ritmo de captura/detecção com a tela parada
+
+A cada captura, uma amostra esparsa da ROI (1 pixel a cada
+ACTIVITY_SAMPLE_STEP) é comparada com a anterior: a tela "mexeu" se a
+fração de pixels amostrados que mudaram mais de ACTIVITY_PIXEL_DELTA passar
+de ACTIVITY_MIN_CHANGED. Custo: alguns milhares de pixels por frame.
+
+- Ativo: ritmo normal (FPS_TARGET), detecção em todo frame
+- Parada há ACTIVITY_IDLE_AFTER segundos: repouso a ACTIVITY_IDLE_FPS, sem
+  detecção (o último resultado continua valendo, a tela não mudou)
+- O primeiro frame em repouso que mostrar movimento volta ao ritmo normal e
+  já é detectado
+"""
+
+import numpy as np
+
+from src.config import *
+
+
+class ActivityMonitor:
+    """Decide, frame a frame, se vale detectar e qual o intervalo até a próxima captura"""
+
+    def __init__(self, idle_after=ACTIVITY_IDLE_AFTER, idle_fps=ACTIVITY_IDLE_FPS, active_fps=FPS_TARGET):
+        self.idle_after = idle_after
+        self.idle_delay = 1.0 / idle_fps
+        self.active_delay = 1.0 / active_fps
+
+        self.idle = False
+        self.previous = None
+        self.last_motion = None
+        self.last_time = None
+
+        self.change = 0.0  # Fração de pixels que mudaram no último frame
+        self.time_at = {'active': 0.0, 'idle': 0.0}
+        self.frames_at = {'active': 0, 'idle': 0}
+        self.wakeups = 0
+        self.busy_at = {'active': 0.0, 'idle': 0.0}  # Tempo de trabalho (captura, amostra, detecção)
+
+    def _sample(self, frame, roi):
+        """Amostra esparsa da ROI (PIL ou array), sem converter o frame inteiro"""
+        step = ACTIVITY_SAMPLE_STEP
+        if isinstance(frame, np.ndarray):
+            if roi:
+                x1, y1, x2, y2 = roi
+                frame = frame[y1:y2, x1:x2]
+            return frame[::step, ::step].astype(np.int16)
+
+        if roi:
+            frame = frame.crop(roi)
+        small = frame.resize((max(1, frame.width // step), max(1, frame.height // step)), 0)  # 0 = NEAREST
+        return np.asarray(small).astype(np.int16)
+
+    def observe(self, frame, now, roi=None):
+        """
+        Mede a mudança em relação ao frame anterior e atualiza o estado
+
+        Retorna True se o frame deve ser detectado (estado ativo).
+        """
+        sample = self._sample(frame, roi)
+
+        moved = True
+        if self.previous is not None and self.previous.shape == sample.shape:
+            delta = np.abs(sample - self.previous)
+            if delta.ndim == 3:
+                delta = delta.max(axis=2)
+            self.change = float(np.count_nonzero(delta > ACTIVITY_PIXEL_DELTA)) / delta.size
+            moved = self.change > ACTIVITY_MIN_CHANGED
+        self.previous = sample
+
+        # Tempo desde a última observação conta para o estado em que estava
+        if self.last_time is not None:
+            self.time_at['idle' if self.idle else 'active'] += now - self.last_time
+        self.last_time = now
+
+        if moved:
+            self.last_motion = now
+            if self.idle:
+                self.idle = False
+                self.wakeups += 1
+        elif not self.idle and now - self.last_motion >= self.idle_after:
+            self.idle = True
+
+        self.frames_at['idle' if self.idle else 'active'] += 1
+        return not self.idle
+
+    def account(self, busy_seconds):
+        """Registra o trabalho do último frame (base da estimativa de CPU poupada)"""
+        self.busy_at['idle' if self.idle else 'active'] += busy_seconds
+
+    def frame_delay(self):
+        """Intervalo alvo entre capturas no estado atual"""
+        return self.idle_delay if self.idle else self.active_delay
+
+    def stats(self):
+        total = self.time_at['active'] + self.time_at['idle']
+        active_frames = self.frames_at['active']
+        cost = self.busy_at['active'] / active_frames if active_frames else 0.0
+
+        # Sem repouso, o tempo parado teria rodado frames ativos no ritmo normal
+        would_spend = self.time_at['idle'] / max(self.active_delay, cost) * cost if cost else 0.0
+        saved = max(0.0, would_spend - self.busy_at['idle'])
+        return {
+            'state': 'idle' if self.idle else 'active',
+            'change': self.change,
+            'active_s': self.time_at['active'],
+            'idle_s': self.time_at['idle'],
+            'idle_fraction': self.time_at['idle'] / total if total else 0.0,
+            'active_frames': active_frames,
+            'idle_frames': self.frames_at['idle'],
+            'wakeups': self.wakeups,
+            'cpu_saved_s': saved,
+            'cpu_saved_fraction': saved / total if total else 0.0
+        }
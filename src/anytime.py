@@ -0,0 +1,259 @@
+"""
+Detecção com prazo (anytime)
+
+O trabalho de um frame é dividido em jobs (template, escala, faixa horizontal
+da imagem de matching). Os jobs rodam do mais valioso para o menos valioso até
+o prazo acabar; o que sobrou passa na frente no frame seguinte. Assim cada
+job roda pelo menos a cada poucos frames e o tempo por frame fica estável.
+"""
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from src.config import *
+from src.prefilter import intersect_regions
+
+
+class Detections(list):
+    """Lista de detecções com a flag `complete` (False = prazo estourou antes de todos os jobs)"""
+
+    def __init__(self, detections=(), complete=True):
+        super().__init__(detections)
+        self.complete = complete
+
+
+class DeadlineScheduler:
+    """
+    Escolhe e executa os jobs de um frame dentro do prazo
+
+    Estado por job: custo (ms de relógio que ele ocupa, média e desvio móveis), valor
+    (detecções por ms) e idade (frames desde a última execução). Prioridade:
+    jobs atrasados primeiro (idade), depois os mais valiosos.
+
+    O custo é medido como é usado: enquanto k jobs rodam juntos, cada um é
+    cobrado por 1/k do tempo que passou. A soma dos custos é o tempo de relógio
+    do lote, com ou sem paralelismo real (numa CPU só, seis jobs juntos levam
+    seis vezes mais cada um). Um job só começa se o que ainda falta dos jobs em
+    andamento mais o custo dele terminam antes do prazo; o prazo dos jobs já
+    desconta o pós-processamento (fusão, NMS) medido nos frames anteriores.
+    """
+
+    def __init__(self, bands=DEADLINE_BANDS, smoothing=DEADLINE_SMOOTHING):
+        self.bands = bands
+        self.smoothing = smoothing
+        self.jobs = {}  # (template_idx, escala, faixa) -> {'cost': ms, 'deviation': ms, 'value': det/ms, 'age': frames}
+        self.maps = {}  # (template_idx, escala) -> custo de montar os mapas dos pré-filtros
+        self.post = {'cost': None, 'deviation': 0.0}  # Pós-processamento depois dos jobs
+
+    def reset(self):
+        self.jobs = {}
+        self.maps = {}
+        self.post = {'cost': None, 'deviation': 0.0}
+
+    def observe_post(self, elapsed_ms):
+        """Tempo entre o fim dos jobs e a entrega do frame (medido pelo detector)"""
+        self._smooth(self.post, elapsed_ms)
+
+    def _smooth(self, estimate, elapsed_ms):
+        """Atualiza média e desvio médio móveis de um custo"""
+        a = self.smoothing
+        if estimate['cost'] is None:
+            estimate['cost'] = elapsed_ms
+        else:
+            estimate['deviation'] = (1 - a) * estimate['deviation'] + a * abs(elapsed_ms - estimate['cost'])
+            estimate['cost'] = (1 - a) * estimate['cost'] + a * elapsed_ms
+
+    def _band_regions(self, ctx, max_th):
+        """Faixas horizontais (x, y, w, h) com sobreposição da altura do maior template"""
+        screen_h, screen_w = ctx['screen'].shape
+        step = -(-screen_h // self.bands)
+
+        bands = []
+        for band in range(self.bands):
+            y1 = band * step
+            if y1 >= screen_h:
+                break
+            y2 = min(screen_h, y1 + step + max_th - 1)
+            region = [(0, y1, screen_w, y2 - y1)]
+            if ctx['regions'] is not None:
+                region = intersect_regions(ctx['regions'], region)
+            bands.append(region)
+        return bands
+
+    def _order(self, keys):
+        def priority(key):
+            job = self.jobs[key]
+            return (-job['age'], -job['value'])
+        return sorted(keys, key=priority)
+
+    def _estimated_cost(self, key):
+        """
+        Custo médio + 2 desvios médios do job (estimativa conservadora); jobs novos
+        herdam a maior estimativa dos já medidos (None se nenhum foi medido)
+        """
+        job = self.jobs[key]
+        if job['cost'] is not None:
+            return job['cost'] + 2 * job['deviation']
+        return max((job['cost'] + 2 * job['deviation'] for job in self.jobs.values() if job['cost'] is not None),
+                   default=None)
+
+    def _finish(self, key, detections, elapsed_ms):
+        """elapsed_ms: tempo cobrado do job (parte dele no relógio enquanto dividia as threads)"""
+        job = self.jobs[key]
+        a = self.smoothing
+        self._smooth(job, elapsed_ms)
+        value = len(detections) / max(elapsed_ms, 0.01)
+        job['value'] = (1 - a) * job['value'] + a * value
+        job['age'] = 0
+
+    def run(self, detector, ctx, deadline):
+        """
+        Executa os jobs até `deadline` (instante de time.perf_counter())
+
+        Retorna (detecções, completo, estatísticas). Pelo menos um job roda
+        por frame. Os mapas dos pré-filtros de cada variante (template, escala)
+        são montados pelo primeiro job dela e medidos à parte: o custo entra só
+        na admissão desse primeiro job, não na estimativa das faixas.
+        """
+        templates = ctx['templates']
+        heights = [t.shape[0] for template_data in templates for t in template_data[ctx['variants']].values()]
+        max_th = max((int(h / ctx['scale_back']) for h in heights), default=1)
+
+        bands = self._band_regions(ctx, max_th)
+
+        keys = []
+        for idx, template_data in enumerate(templates):
+            for scale in template_data[ctx['variants']]:
+                for band in range(len(bands)):
+                    key = (idx, scale, band)
+                    keys.append(key)
+                    self.jobs.setdefault(key, {'cost': None, 'deviation': 0.0, 'value': 0.0, 'age': 0})
+
+        # Templates removidos / faixas que não existem mais
+        for key in set(self.jobs) - set(keys):
+            del self.jobs[key]
+        variants = {key[:2] for key in keys}
+        for variant in set(self.maps) - variants:
+            del self.maps[variant]
+
+        pending = self._order(keys)
+        detections = []
+        started = 0
+        done = 0
+
+        # Prazo dos jobs: o pós-processamento ainda precisa caber depois deles
+        post_ms = self.post['cost'] + 2 * self.post['deviation'] if self.post['cost'] is not None else 0.0
+        jobs_deadline = deadline - post_ms / 1000
+        running = {}  # job em andamento -> {'key', 'charged': ms cobrados, 'estimate', 'match_estimate': ms}
+        clock = time.perf_counter()
+
+        # Mapas de cada variante: montados uma vez por frame, pelo primeiro job que chegar
+        planned = set()
+        map_locks = {variant: threading.Lock() for variant in variants}
+
+        # Frame mais pesado que a média (mais candidatos, máquina ocupada): os jobs já
+        # terminados neste frame corrigem a estimativa dos próximos (nunca para baixo)
+        measured = {'charged': 0.0, 'estimated': 0.0}
+
+        def advance():
+            """Divide o tempo desde a última chamada entre os jobs em andamento"""
+            nonlocal clock
+            now = time.perf_counter()
+            if running:
+                share = (now - clock) * 1000 / len(running)
+                for job_state in running.values():
+                    job_state['charged'] += share
+            clock = now
+            return now
+
+        def maps_cost(variant):
+            if variant in planned:
+                return 0.0
+            if variant in self.maps:
+                return self.maps[variant]['cost'] + 2 * self.maps[variant]['deviation']
+            return max((m['cost'] + 2 * m['deviation'] for m in self.maps.values()), default=0.0)
+
+        def fits(key, now):
+            if started == 0:
+                return True
+            cost = self._estimated_cost(key)
+            if cost is None:
+                return False
+            if measured['estimated'] > 0:
+                cost *= max(1.0, measured['charged'] / measured['estimated'])
+            cost += maps_cost(key[:2])
+            backlog = sum(max(0.0, job_state['estimate'] - job_state['charged']) for job_state in running.values())
+            return now + (backlog + cost) / 1000 <= jobs_deadline
+
+        def job(key):
+            idx, scale, band = key
+            start = time.perf_counter()
+            with map_locks[(idx, scale)]:
+                if (idx, scale) not in ctx['window_maps']:
+                    detector._prepare_window_maps(ctx, idx, scale)
+            maps_ms = (time.perf_counter() - start) * 1000
+
+            variants = ctx['variants']
+            template_data = dict(templates[idx], **{variants: {scale: templates[idx][variants][scale]}})
+            result = detector._match_template(dict(ctx, regions=bands[band]), template_data, idx)
+            # Fração do job gasta nos mapas (o tempo cobrado é dividido na mesma proporção)
+            return result, maps_ms / max((time.perf_counter() - start) * 1000, 1e-6)
+
+        def start(handle, key):
+            nonlocal started
+            started += 1
+            match_estimate = self._estimated_cost(key) or 0.0
+            running[handle] = {'key': key, 'charged': 0.0, 'match_estimate': match_estimate,
+                               'estimate': match_estimate + maps_cost(key[:2])}
+            planned.add(key[:2])
+
+        def collect(handle, outcome):
+            nonlocal done
+            result, maps_fraction = outcome
+            job_state = running.pop(handle)
+            key = job_state['key']
+            maps_charged = job_state['charged'] * maps_fraction
+            match_charged = job_state['charged'] - maps_charged
+
+            if key[:2] not in self.maps or maps_charged > 0.01:
+                self._smooth(self.maps.setdefault(key[:2], {'cost': None, 'deviation': 0.0}), maps_charged)
+            if job_state['match_estimate'] > 0:
+                measured['charged'] += match_charged
+                measured['estimated'] += job_state['match_estimate']
+            self._finish(key, result, match_charged)
+            detections.extend(result)
+            done += 1
+
+        if detector.executor is None:
+            while pending and fits(pending[0], advance()):
+                key = pending.pop(0)
+                start(key, key)
+                outcome = job(key)
+                advance()
+                collect(key, outcome)
+        else:
+            while pending or running:
+                now = advance()
+                while pending and len(running) < MAX_WORKERS and fits(pending[0], now):
+                    key = pending.pop(0)
+                    start(detector.executor.submit(job, key), key)
+                    now = advance()
+                if not running:
+                    break
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                advance()
+                for future in finished:
+                    collect(future, future.result())
+
+        # O que não rodou envelhece e passa na frente no próximo frame
+        for key in pending:
+            self.jobs[key]['age'] += 1
+
+        stats = {
+            'jobs_total': len(keys),
+            'jobs_done': done,
+            'jobs_carried': len(pending),
+            'max_job_age': max((self.jobs[key]['age'] for key in keys), default=0)
+        }
+        return detections, not pending, stats
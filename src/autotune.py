@@ -0,0 +1,269 @@
+"""
+Autotuner offline: mede latência e precisão/recall de várias configurações
+sobre frames gravados com rótulos e mostra a fronteira de Pareto
+
+Conjunto rotulado = pasta com imagens + labels.jsonl, uma linha por frame:
+    {"frame": "f0000.png", "boxes": [[x, y, w, h], ...]}
+
+Uso:
+    python -m src.autotune dataset/                      # grade completa
+    python -m src.autotune dataset/ --random 30          # 30 pontos aleatórios
+    python -m src.autotune dataset/ --target-recall 0.9  # perfil = mais rápido com recall >= 90%
+
+Com --profile, o ponto escolhido é gravado num JSON; ele só é aplicado
+quando pedido explicitamente (variável de ambiente PXG_PROFILE):
+    python -m src.autotune dataset/ --target-recall 0.9 --profile perfil.json
+    PXG_PROFILE=perfil.json python main_refactored.py
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+from contextlib import contextmanager
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+# Espaço de busca padrão (nomes = constantes de src/config.py)
+SEARCH_SPACE = {
+    'SIMILARITY_THRESHOLD': [0.50, 0.55, 0.60, 0.65, 0.70],
+    'DOWNSAMPLE_FACTOR': [0.5, 0.6, 0.75, 1.0],
+    'ROI_PADDING': [0.2, 0.3, 0.4],
+    'SCALES': [[1.0], [0.9, 1.0, 1.1], [0.8, 0.9, 1.0, 1.1, 1.2]],
+    'MAX_WORKERS': [2, 4, 6],
+}
+
+LABELS_FILE = 'labels.jsonl'
+
+
+def load_labelled_set(folder, max_frames=None):
+    """
+    Carrega [(frame RGB, [(x, y, w, h), ...])] de uma pasta rotulada
+
+    `folder` também pode ser uma cena sintética ('synthetic:LxA:árvores:frames[:seed]')
+    """
+    if folder.startswith('synthetic:'):
+        from src.synthetic import SyntheticScene, parse_spec
+        kwargs, count = parse_spec(folder)
+        if max_frames:
+            count = min(count, max_frames)
+        return [(frame.copy(), boxes) for _, _, frame, boxes in SyntheticScene(**kwargs).frames(count)]
+
+    samples = []
+    with open(os.path.join(folder, LABELS_FILE), 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            # cv2.imdecode em vez de cv2.imread: aceita caminhos com acentos no Windows
+            frame_bgr = cv2.imdecode(np.fromfile(os.path.join(folder, entry['frame']), dtype=np.uint8),
+                                     cv2.IMREAD_COLOR)
+            if frame_bgr is None:
+                print(f"  ❌ Erro ao ler {entry['frame']}")
+                continue
+            boxes = [tuple(box) for box in entry['boxes']]
+            samples.append((cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB), boxes))
+            if max_frames and len(samples) >= max_frames:
+                break
+    return samples
+
+
+@contextmanager
+def config_overrides(params):
+    """
+    Substitui temporariamente constantes de configuração
+
+    Os módulos usam `from src.config import *`, então cada módulo do pacote
+    tem sua própria cópia: todas são trocadas e restauradas no final.
+    """
+    modules = [m for name, m in sys.modules.items()
+               if m is not None and (name == 'src' or name.startswith('src.'))]
+
+    saved = []
+    for module in modules:
+        for name, value in params.items():
+            if hasattr(module, name):
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+def score_frame(detections, boxes, min_iou):
+    """Casamento guloso detecção ↔ rótulo por IoU: retorna (tp, fp, fn)"""
+    unmatched = list(boxes)
+    tp = 0
+    for det in sorted(detections, key=lambda d: d['confidence'], reverse=True):
+        box = (det['x'], det['y'], det['w'], det['h'])
+        best = max(unmatched, key=lambda b: iou(box, b), default=None)
+        if best is not None and iou(box, best) >= min_iou:
+            unmatched.remove(best)
+            tp += 1
+    return tp, len(detections) - tp, len(unmatched)
+
+
+def evaluate(params, samples, templates_folder=SAVE_FOLDER, min_iou=0.3, engine=DETECTION_ENGINE,
+             full_frame=False):
+    """
+    Roda o detector com `params` em todos os frames e mede latência e acurácia
+
+    full_frame=True busca no frame inteiro (rótulos fora da ROI padrão, ex.: cenas sintéticas)
+    """
+    from src.benchmark import run_detector
+    from src.detector import TreeDetector
+
+    frames = [frame for frame, _ in samples]
+
+    with config_overrides(params):
+        detector = TreeDetector(
+            similarity_threshold=params.get('SIMILARITY_THRESHOLD', SIMILARITY_THRESHOLD),
+            save_folder=templates_folder, verbose=False, engine=engine
+        )
+        try:
+            custom_roi = (0, 0, frames[0].shape[1], frames[0].shape[0]) if full_frame else None
+            results, times = run_detector(detector, frames, custom_roi)
+        finally:
+            detector.cleanup()
+
+    tp = fp = fn = 0
+    for detections, (_, boxes) in zip(results, samples):
+        t, f, n = score_frame(detections, boxes, min_iou)
+        tp, fp, fn = tp + t, fp + f, fn + n
+
+    return {
+        'params': params,
+        'mean_ms': float(times.mean()),
+        'p95_ms': float(np.percentile(times, 95)),
+        'precision': tp / (tp + fp) if tp + fp else 1.0,
+        'recall': tp / (tp + fn) if tp + fn else 1.0,
+    }
+
+
+def candidate_params(space, random_samples=None, seed=0):
+    """Todas as combinações da grade ou `random_samples` pontos aleatórios"""
+    names = list(space)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(space[n] for n in names))]
+    if random_samples and random_samples < len(grid):
+        return random.Random(seed).sample(grid, random_samples)
+    return grid
+
+
+def pareto_front(results, min_precision=0.0):
+    """Configurações não dominadas em (latência menor, recall maior) com precisão mínima"""
+    eligible = [r for r in results if r['precision'] >= min_precision]
+    front = []
+    for r in eligible:
+        dominated = any(
+            o['mean_ms'] <= r['mean_ms'] and o['recall'] >= r['recall']
+            and (o['mean_ms'] < r['mean_ms'] or o['recall'] > r['recall'])
+            for o in eligible
+        )
+        if not dominated:
+            front.append(r)
+    return sorted(front, key=lambda r: r['mean_ms'])
+
+
+def choose(front, target_recall=None):
+    """Mais rápido com recall >= alvo; sem alvo (ou ninguém atinge), o de maior recall"""
+    if not front:
+        return None
+    if target_recall is not None:
+        fast_enough = [r for r in front if r['recall'] >= target_recall]
+        if fast_enough:
+            return min(fast_enough, key=lambda r: r['mean_ms'])
+    return max(front, key=lambda r: (r['recall'], -r['mean_ms']))
+
+
+def write_profile(path, result):
+    """Grava o perfil no formato lido por src/config.py"""
+    profile = {
+        'config': result['params'],
+        'measured': {k: result[k] for k in ('mean_ms', 'p95_ms', 'precision', 'recall')}
+    }
+    with open(path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+
+def _format_params(params):
+    return ' '.join(f"{name}={value}" for name, value in params.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.autotune',
+        description='Busca configurações rápidas e precisas sobre frames rotulados'
+    )
+    parser.add_argument('dataset', help=f'Pasta com imagens + {LABELS_FILE} ou synthetic:LxA:árvores:frames')
+    parser.add_argument('--random', type=int, default=None, help='Amostrar N pontos em vez da grade')
+    parser.add_argument('--max-frames', type=int, default=100)
+    parser.add_argument('--min-iou', type=float, default=0.3)
+    parser.add_argument('--min-precision', type=float, default=0.0,
+                        help='Descartar configurações com precisão abaixo disso')
+    parser.add_argument('--target-recall', type=float, default=None,
+                        help='Escolher a mais rápida com recall >= alvo')
+    parser.add_argument('--profile', default=None,
+                        help=f'Gravar o perfil escolhido neste JSON (aplicado com {PROFILE_ENV}=arquivo)')
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    parser.add_argument('--engine', default=DETECTION_ENGINE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--full-frame', action='store_true',
+                        help='Buscar no frame inteiro em vez da ROI padrão')
+    args = parser.parse_args(argv)
+
+    samples = load_labelled_set(args.dataset, args.max_frames)
+    if not samples:
+        print("⚠️ Nenhum frame rotulado encontrado!")
+        return
+
+    candidates = candidate_params(SEARCH_SPACE, args.random, args.seed)
+    print(f"🎞️ {len(samples)} frames rotulados | 🔧 {len(candidates)} configurações")
+
+    results = []
+    for i, params in enumerate(candidates, 1):
+        result = evaluate(params, samples, args.templates, args.min_iou, args.engine,
+                          args.full_frame)
+        results.append(result)
+        print(f"  [{i}/{len(candidates)}] {result['mean_ms']:.1f}ms | P {result['precision']:.0%} "
+              f"| R {result['recall']:.0%} | {_format_params(params)}")
+
+    front = pareto_front(results, args.min_precision)
+
+    print(f"\n🏆 Fronteira de Pareto (latência × recall, precisão ≥ {args.min_precision:.0%}):")
+    for r in front:
+        print(f"  {r['mean_ms']:>6.1f}ms (p95 {r['p95_ms']:.1f}) | P {r['precision']:.0%} "
+              f"| R {r['recall']:.0%} | {_format_params(r['params'])}")
+
+    chosen = choose(front, args.target_recall)
+    if chosen is None:
+        print("⚠️ Nenhuma configuração atende à precisão mínima")
+        return
+
+    if args.profile is None:
+        print(f"\n🎯 Escolhida: {_format_params(chosen['params'])} (--profile arquivo.json para gravar)")
+        return
+
+    write_profile(args.profile, chosen)
+    print(f"\n💾 Perfil gravado em {args.profile}: {_format_params(chosen['params'])}")
+    print(f"   Para usar: {PROFILE_ENV}={args.profile} python main_refactored.py")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""
+Benchmark dos motores de detecção sobre a mesma gravação
+
+Uso:
+    python -m src.benchmark gameplay.mp4 --engines template cascade
+    python -m src.benchmark gameplay.mp4 --engines template orb  (orb: experimental)
+    python -m src.benchmark prints/ --max-frames 100
+    python -m src.benchmark gameplay.mp4 --engines template gradient --lighting noite
+    python -m src.benchmark gameplay.mp4 --variance-prefilter
+    python -m src.benchmark gameplay.mp4 --binary-prefilter
+    python -m src.benchmark gameplay.mp4 --sparse-prefilter
+
+Os frames são carregados uma vez na memória, então todos os motores
+processam exatamente as mesmas imagens e o tempo de decodificação não conta.
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from src.config import *
+from src.scan import iter_frames, is_recording
+
+
+# Pré-filtros de janela comparáveis com o caminho exato → (flag do config, estatística de rejeição)
+PREFILTERS = {
+    'variance': ('USE_VARIANCE_PREFILTER', 'variance_pruned'),
+    'binary': ('USE_BINARY_PREFILTER', 'binary_rejected'),
+    'sparse': ('USE_SPARSE_PREFILTER', 'sparse_rejected'),
+}
+
+# Iluminação simulada: (ganho, gamma, ganho por canal RGB)
+LIGHTING = {
+    'noite': (0.5, 1.4, (0.55, 0.65, 1.0)),
+    'entardecer': (0.75, 1.1, (1.0, 0.8, 0.6)),
+}
+
+
+def relight(frame, preset):
+    """
+    Aplica uma iluminação de LIGHTING a um frame RGB, BGRA (gravação .ring) ou cinza
+
+    O ganho por canal vale só para a cor: em BGRA vai invertido nos três primeiros
+    canais (alfa intacto); em cinza vira a média ponderada pela luminância.
+    """
+    gain, gamma, tint = LIGHTING[preset]
+    tint = np.array(tint, dtype=np.float32)
+    adjusted = (frame.astype(np.float32) / 255) ** gamma * gain
+
+    if frame.ndim == 2:
+        adjusted *= float(tint @ np.float32([0.299, 0.587, 0.114]))
+    elif frame.shape[2] == 4:
+        adjusted[..., :3] *= tint[::-1]
+        adjusted[..., 3] = frame[..., 3] / 255
+    else:
+        adjusted *= tint
+    return (np.clip(adjusted, 0, 1) * 255).astype(np.uint8)
+
+
+def load_frames(source, max_frames, every=1):
+    """Carrega até max_frames frames RGB da fonte"""
+    frames = []
+    for _, _, frame_rgb, _ in iter_frames(source, 0, every):
+        frames.append(frame_rgb)
+        if len(frames) >= max_frames:
+            break
+    return frames
+
+
+def _centers(detections, min_confidence):
+    return [
+        (d['x'] + d['w'] / 2, d['y'] + d['h'] / 2)
+        for d in detections if d['confidence'] >= min_confidence
+    ]
+
+
+def match_rate(reference, candidate, min_confidence=DISPLAY_THRESHOLD):
+    """
+    Fração das detecções de referência (>= min_confidence) reencontradas pelo candidato
+    (centro a menos de DUPLICATE_DISTANCE px)
+    """
+    found = 0
+    total = 0
+    for ref_frame, cand_frame in zip(reference, candidate):
+        cand_centers = _centers(cand_frame, min_confidence)
+        for rx, ry in _centers(ref_frame, min_confidence):
+            total += 1
+            if any(abs(rx - cx) < DUPLICATE_DISTANCE and abs(ry - cy) < DUPLICATE_DISTANCE
+                   for cx, cy in cand_centers):
+                found += 1
+    return found / total if total else None
+
+
+def run_detector(detector, frames, custom_roi=None, deadline_ms=None, stats=None):
+    """
+    Roda o detector em todos os frames e mede o tempo de cada um (ms)
+
+    Se `stats` for uma lista, recebe uma cópia de detector.stats de cada frame.
+    """
+    # Aquecimento (alocação de buffers, threads do pool)
+    detector.detect(frames[0], custom_roi=custom_roi)
+
+    times = []
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        deadline = start + deadline_ms / 1000 if deadline_ms else None
+        results.append(detector.detect(frame, custom_roi=custom_roi, deadline=deadline))
+        times.append((time.perf_counter() - start) * 1000)
+        if stats is not None:
+            stats.append(dict(detector.stats))
+
+    return results, np.array(times)
+
+
+def summarize(name, times, results):
+    """Resumo de latência e volume de detecções de uma rodada"""
+    return {
+        'name': name,
+        'mean_ms': float(times.mean()),
+        'p95_ms': float(np.percentile(times, 95)),
+        'max_ms': float(times.max()),
+        'fps': 1000.0 / times.mean() if times.mean() > 0 else 0,
+        'jitter_ms': float(times.std()),
+        'incomplete': sum(1 for r in results if not getattr(r, 'complete', True)),
+        'detections': sum(len(r) for r in results),
+        'display': sum(1 for r in results for d in r if d['confidence'] >= DISPLAY_THRESHOLD)
+    }
+
+
+def print_table(rows):
+    print(f"\n{'Motor':<16}{'média':>9}{'p95':>9}{'máx':>9}{'desvio':>9}{'FPS':>8}"
+          f"{'det.':>7}{'80%+':>7}{'recall':>8}{'parciais':>10}")
+    for row in rows:
+        recall = row.get('recall')
+        recall_text = f"{recall:.0%}" if recall is not None else '-'
+        print(
+            f"{row['name']:<16}{row['mean_ms']:>7.1f}ms{row['p95_ms']:>7.1f}ms{row['max_ms']:>7.1f}ms"
+            f"{row['jitter_ms']:>7.1f}ms{row['fps']:>8.1f}{row['detections']:>7}{row['display']:>7}"
+            f"{recall_text:>8}{row['incomplete']:>10}"
+        )
+
+
+def benchmark_engines(frames, engines, custom_roi=None, templates_folder=SAVE_FOLDER, deadline_ms=None,
+                      reference_frames=None):
+    """
+    Compara motores nos mesmos frames
+
+    O primeiro motor da lista é a referência para o recall das detecções 80%+.
+    Com deadline_ms, cada motor roda de novo com prazo por frame (linha "motor@Nms").
+    Com reference_frames (ex.: os frames antes de relight), a referência é o
+    primeiro motor nesses frames e todos os motores são medidos contra ela.
+    """
+    from src.detector import TreeDetector
+    from src.engines import create_engine
+
+    rows = []
+    reference = None
+
+    if reference_frames is not None:
+        detector = TreeDetector(save_folder=templates_folder, verbose=False,
+                                engine=create_engine(engines[0], experimental=True))
+        try:
+            reference, times = run_detector(detector, reference_frames, custom_roi)
+        finally:
+            detector.cleanup()
+        rows.append(summarize(f"{engines[0]} (orig.)", times, reference))
+
+    runs = [(name, None) for name in engines]
+    if deadline_ms:
+        runs += [(name, deadline_ms) for name in engines]
+
+    for name, deadline in runs:
+        detector = TreeDetector(save_folder=templates_folder, verbose=False,
+                                engine=create_engine(name, experimental=True))
+        try:
+            results, times = run_detector(detector, frames, custom_roi, deadline)
+        finally:
+            detector.cleanup()
+
+        row = summarize(f"{name}@{deadline:g}ms" if deadline else name, times, results)
+        if reference is None:
+            reference = results
+        else:
+            row['recall'] = match_rate(reference, results)
+        rows.append(row)
+
+    print_table(rows)
+    return rows
+
+
+def benchmark_prefilter(frames, engine='template', custom_roi=None, templates_folder=SAVE_FOLDER, prefilter='binary'):
+    """
+    Caminho exato x pré-filtro de janelas (textura, binário ou pontos esparsos) com o mesmo motor
+
+    Rejeição = janelas descartadas antes do matchTemplate; falsa rejeição =
+    detecções do caminho exato que o pré-filtro perdeu (por faixa de confiança).
+    """
+    from src.autotune import config_overrides
+    from src.detector import TreeDetector
+
+    flag, rejected_key = PREFILTERS[prefilter]
+
+    runs = {}
+    for enabled in (False, True):
+        with config_overrides({flag: enabled}):
+            detector = TreeDetector(save_folder=templates_folder, verbose=False, engine=engine)
+            frame_stats = []
+            try:
+                results, times = run_detector(detector, frames, custom_roi, stats=frame_stats)
+            finally:
+                detector.cleanup()
+        runs[enabled] = (results, times, frame_stats)
+
+    exact, exact_times, _ = runs[False]
+    filtered, filtered_times, frame_stats = runs[True]
+
+    rejected = np.mean([st.get(rejected_key, 0.0) for st in frame_stats])
+    prefilter_ms = np.mean([st.get(f'{prefilter}_ms', 0.0) for st in frame_stats])
+    verified = np.mean([st.get(f'{prefilter}_verified', 0) for st in frame_stats])
+
+    if prefilter == 'variance':
+        description = f"de textura ({engine}, variância ≥ {VARIANCE_FLOOR})"
+    elif prefilter == 'binary':
+        description = f"binário ({engine}, descritor {BINARY_GRID}x{BINARY_GRID}, distância ≤ {BINARY_MAX_DISTANCE})"
+    else:
+        description = f"esparso ({engine}, {SPARSE_POINTS} pontos, correlação ≥ {SPARSE_MIN_CORRELATION})"
+    print(f"\n🔬 Pré-filtro {description}")
+    print(f"   exato    {exact_times.mean():>7.1f}ms (p95 {np.percentile(exact_times, 95):.1f}ms)")
+    print(f"   {prefilter:<8} {filtered_times.mean():>7.1f}ms (p95 {np.percentile(filtered_times, 95):.1f}ms) "
+          f"→ {exact_times.mean() / max(filtered_times.mean(), 1e-6):.2f}x | pré-filtro {prefilter_ms:.1f}ms/frame")
+    print(f"   janelas rejeitadas: {rejected:.1%} | verificadas por frame: {verified:,.0f}")
+
+    false_rejection = {}
+    for threshold in (SIMILARITY_THRESHOLD, DISPLAY_THRESHOLD):
+        kept = match_rate(exact, filtered, threshold)
+        false_rejection[threshold] = None if kept is None else 1.0 - kept
+        text = '-' if kept is None else f"{1.0 - kept:.1%}"
+        print(f"   falsa rejeição (≥{threshold:.0%}): {text}")
+
+    return {
+        'exact_ms': float(exact_times.mean()),
+        'filtered_ms': float(filtered_times.mean()),
+        'prefilter_ms': float(prefilter_ms),
+        'rejected': float(rejected),
+        'false_rejection': false_rejection
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.benchmark',
+        description='Compara motores de detecção na mesma gravação'
+    )
+    parser.add_argument('source', help='Arquivo de vídeo, pasta com imagens ou synthetic:LxA:árvores:frames')
+    parser.add_argument('--engines', nargs='+', default=['template', 'cascade'],
+                        help='Motores a comparar (o primeiro é a referência; aceita os experimentais, ex.: orb)')
+    parser.add_argument('--max-frames', type=int, default=200)
+    parser.add_argument('--every', type=int, default=1, help='Usar 1 a cada N frames')
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    parser.add_argument('--deadline', type=float, default=None, metavar='MS',
+                        help='Rodar também com prazo por frame (detecção anytime)')
+    parser.add_argument('--lighting', choices=sorted(LIGHTING), default=None,
+                        help='Medir os motores com iluminação simulada (referência: frames originais)')
+    parser.add_argument('--full-frame', action='store_true', help='Buscar no frame inteiro')
+    parser.add_argument('--variance-prefilter', action='store_const', const='variance', dest='prefilter',
+                        help='Comparar o primeiro motor com e sem o pré-filtro de textura')
+    parser.add_argument('--binary-prefilter', action='store_const', const='binary', dest='prefilter',
+                        help='Comparar o primeiro motor com e sem o pré-filtro binário')
+    parser.add_argument('--sparse-prefilter', action='store_const', const='sparse', dest='prefilter',
+                        help='Comparar o primeiro motor com e sem o pré-filtro de pontos esparsos')
+    args = parser.parse_args(argv)
+
+    frames = load_frames(args.source, args.max_frames, args.every)
+    if not frames:
+        print("⚠️ Nenhum frame lido da fonte!")
+        return
+
+    reference_frames = None
+    if args.lighting:
+        reference_frames = frames
+        frames = [relight(frame, args.lighting) for frame in frames]
+
+    # Gravações já são o recorte da ROI: buscar no frame inteiro (como o replay)
+    full_frame = args.full_frame or is_recording(args.source)
+    custom_roi = (0, 0, frames[0].shape[1], frames[0].shape[0]) if full_frame else None
+
+    print(f"🎞️ {len(frames)} frames de {args.source}" + (f" | iluminação: {args.lighting}" if args.lighting else ''))
+    if args.prefilter:
+        benchmark_prefilter(frames, args.engines[0], custom_roi, args.templates, args.prefilter)
+        return
+    benchmark_engines(frames, args.engines, custom_roi, args.templates, args.deadline, reference_frames)
+
+
+if __name__ == '__main__':
+    main()
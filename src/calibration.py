@@ -0,0 +1,91 @@
+"""
+Calibração automática da escala (zoom do jogo)
+
+O zoom fica estável por longos períodos: em vez de testar várias escalas
+todo frame, o detector varre CALIBRATION_SCALES só de vez em quando,
+estima a escala atual pelos melhores matches e trava nela.
+"""
+
+from collections import deque
+
+import numpy as np
+
+from src.config import *
+
+
+class ScaleCalibrator:
+    """Decide quando recalibrar e estima a escala a partir das detecções"""
+
+    def __init__(self, initial_scale=None):
+        self.locked_scale = initial_scale
+        self.frames_since_calibration = 0
+        self.calibrations = 0
+        self.recent_confidence = deque(maxlen=CALIBRATION_WINDOW)
+
+    def needs_calibration(self):
+        """Calibrar se não há escala travada, periodicamente ou quando a confiança cai"""
+        if self.locked_scale is None:
+            return self.frames_since_calibration >= CALIBRATION_COOLDOWN or self.calibrations == 0
+
+        if self.frames_since_calibration >= CALIBRATION_INTERVAL:
+            return True
+
+        if (self.frames_since_calibration >= CALIBRATION_COOLDOWN
+                and len(self.recent_confidence) == self.recent_confidence.maxlen
+                and np.mean(self.recent_confidence) < RECALIBRATE_CONFIDENCE):
+            return True
+
+        return False
+
+    def observe(self, best_confidence):
+        """Registra a melhor confiança do mapa de scores de um frame normal (escala travada)"""
+        self.frames_since_calibration += 1
+        self.recent_confidence.append(max(0.0, best_confidence))
+
+    def calibrate(self, detections):
+        """
+        Estima a escala pelas detecções de um frame de calibração (todas as escalas)
+
+        As detecções já vêm sem duplicatas dentro de cada escala (uma por árvore):
+        sem isso os pixels vizinhos de um mesmo pico enchem o top-K sozinhos.
+        Cada escala recebe a soma das suas CALIBRATION_TOP_K melhores confianças;
+        a vencedora precisa de CALIBRATION_MIN_DETECTIONS árvores distintas e é
+        refinada por interpolação parabólica com as vizinhas.
+        Retorna a nova escala travada (ou a anterior se nada confiável foi visto).
+        """
+        self.frames_since_calibration = 0
+        self.calibrations += 1
+        self.recent_confidence.clear()
+
+        scales = sorted(CALIBRATION_SCALES)
+        scores = np.zeros(len(scales))
+        counts = np.zeros(len(scales), dtype=int)
+
+        for i, scale in enumerate(scales):
+            confidences = sorted(
+                (d['confidence'] for d in detections
+                 if d.get('scale') == scale and d['confidence'] >= CALIBRATION_MIN_CONFIDENCE),
+                reverse=True
+            )
+            scores[i] = sum(confidences[:CALIBRATION_TOP_K])
+            counts[i] = len(confidences)
+
+        if not scores.any():
+            return self.locked_scale
+
+        best = int(np.argmax(scores))
+        if counts[best] < CALIBRATION_MIN_DETECTIONS:
+            return self.locked_scale
+        estimate = scales[best]
+
+        # Refinamento parabólico entre as escalas vizinhas
+        if 0 < best < len(scales) - 1:
+            left, center, right = scores[best - 1], scores[best], scores[best + 1]
+            denominator = left - 2 * center + right
+            if denominator < 0:
+                offset = 0.5 * (left - right) / denominator
+                step = (scales[best + 1] - scales[best - 1]) / 2
+                estimate = scales[best] + offset * step
+
+        self.locked_scale = round(float(estimate), 3)
+        return self.locked_scale
@@ -5,10 +5,67 @@ Configurações do sistema de detecção de árvores PXG
 # DETECÇÃO
 SIMILARITY_THRESHOLD = 0.52  # Mais sensível para compensar otimizações
 DISPLAY_THRESHOLD = 0.80  # Mostrar apenas detecções com 80%+ de confiança
+SCORE_TIERS = [0.6, 0.7, 0.8, 0.9]  # Faixas de confiança contadas no mapa de scores (estatística)
 SCALES = [1.0]  # APENAS escala original = 3x mais rápido!
 MIN_TEMPLATE_SIZE = 10
 DUPLICATE_DISTANCE = 50  # Distância mínima entre detecções
-PLAY_SOUND_ON_DETECTION = True  # Tocar som quando detectar
+PLAY_SOUND_ON_DETECTION = True  # Tocar som quando uma árvore aparecer
+DETECTION_ENGINE = 'template'  # 'template' (multi-escala), 'cascade' (2 estágios) ou 'gradient'
+
+# MOTOR EM CASCATA (DETECTION_ENGINE = 'cascade')
+CASCADE_STAGE1_FACTOR = 0.5  # Resolução do estágio 1 (relativa à imagem de matching)
+CASCADE_STAGE1_TEMPLATES = 3  # Templates representativos usados no estágio 1
+CASCADE_STAGE1_THRESHOLD = 0.45  # Threshold baixo: o estágio 2 confirma
+CASCADE_MAX_CANDIDATES = 20  # Candidatos verificados por frame
+CASCADE_SEARCH_MARGIN = 6  # Folga (px) em volta de cada candidato no estágio 2
+CASCADE_MIN_SIZE = 6  # Tamanho mínimo do template reduzido
+
+# CALIBRAÇÃO AUTOMÁTICA DE ZOOM - varre várias escalas só de vez em quando e trava na melhor
+AUTO_SCALE = False  # Ativar calibração (substitui SCALES pela escala travada)
+CALIBRATION_SCALES = [0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.25, 1.4, 1.6]  # Faixa varrida na calibração
+CALIBRATION_INTERVAL = 350  # Recalibrar a cada N frames (~10s a 35 FPS)
+CALIBRATION_COOLDOWN = 35  # Mínimo de frames entre calibrações
+CALIBRATION_WINDOW = 30  # Frames usados para medir a confiança recente
+CALIBRATION_MIN_CONFIDENCE = 0.70  # Só matches acima disso votam na escala
+CALIBRATION_TOP_K = 5  # Melhores matches por escala somados no voto
+CALIBRATION_MIN_DETECTIONS = 2  # Árvores distintas mínimas na escala vencedora para travar
+RECALIBRATE_CONFIDENCE = 0.60  # Confiança média recente abaixo disso → recalibrar
+
+# MOTOR ORB (experimental, só no benchmark: --engines template orb)
+ORB_FEATURES = 1500  # Máximo de keypoints por frame
+ORB_LEVELS = 6  # Níveis da pirâmide (tolerância a zoom)
+ORB_PATCH_SIZE = 7  # Patch bem menor que o padrão (31): árvores de ~40px têm pouco miolo
+ORB_FAST_THRESHOLD = 5  # Baixo para achar cantos nas copas de pouco contraste
+ORB_RATIO = 0.8  # Ratio test de Lowe
+ORB_MIN_MATCHES = 6  # Matches mínimos para aceitar uma ocorrência
+ORB_MIN_TEMPLATE_KEYPOINTS = 20  # Templates com menos keypoints vão por template matching
+ORB_RANSAC_THRESHOLD = 4.0  # Erro de reprojeção (px)
+ORB_REFINE_MARGIN = 4  # Verificação procura o melhor encaixe até N px em volta da posição do RANSAC
+ORB_MAX_INSTANCES = 10  # Ocorrências do mesmo template por frame
+
+# MOTOR DE GRADIENTES (DETECTION_ENGINE = 'gradient') - orientação de bordas, estilo LINE-MOD
+GRADIENT_BINS = 8  # Faixas de orientação em 0-180° (máx. 8: bitmask de 1 byte)
+GRADIENT_SPREAD = 4  # Espalhamento (px): tolerância a deformação e passo da busca
+GRADIENT_FEATURES = 64  # Pontos de borda por template (por escala)
+GRADIENT_MIN_FEATURES = 8  # Variantes com menos pontos são ignoradas
+GRADIENT_MIN_MAGNITUDE = 2.5  # Gradiente mínimo no frame, em desvios-padrão da imagem
+GRADIENT_TEMPLATE_MAGNITUDE = 4.0  # Gradiente mínimo dos pontos do template (idem)
+
+# EVENTOS DE DETECÇÃO (som, log, callbacks) - uma thread despachante, sem thread por beep
+EVENT_APPEAR_FRAMES = 2  # Frames seguidos para considerar que a árvore "apareceu"
+EVENT_LOST_FRAMES = 10  # Frames seguidos sem ver a árvore para considerar que "sumiu"
+EVENT_RATE_LIMIT = 10  # Máximo de eventos por segundo (excesso é descartado)
+EVENT_QUEUE_SIZE = 100  # Tamanho máximo da fila do despachante
+EVENT_SOUND_MIN_INTERVAL = 0.5  # Intervalo mínimo entre beeps (s)
+LOG_DETECTION_EVENTS = False  # Imprimir eventos no console
+
+# LOG DE DETECÇÕES (SQLite WAL, gravação em lote numa thread separada)
+DETECTION_LOG_ENABLED = False  # Gravar todas as sessões de detecção
+DETECTION_LOG_FILE = 'detections.db'
+DETECTION_LOG_MIN_CONFIDENCE = DISPLAY_THRESHOLD  # Confiança mínima gravada
+DETECTION_LOG_BATCH_SIZE = 100  # Frames por commit
+DETECTION_LOG_FLUSH_INTERVAL = 1.0  # Commit pelo menos a cada N segundos
+DETECTION_LOG_MAX_PENDING = 2000  # Frames na fila antes de descartar (~1 min a 35 FPS)
 
 # PERFORMANCE - CONFIGURAÇÃO ULTRA RÁPIDA 🚀
 FPS_TARGET = 35  # FPS aumentado para máxima fluidez
@@ -19,6 +76,95 @@ DOWNSAMPLE_FACTOR = 0.75  # Reduz resolução em 25% para processar mais rápido
 USE_THREADING = True  # Processar templates em paralelo
 MAX_WORKERS = 6  # Mais threads para processamento paralelo
 
+# PRÉ-FILTRO DE FOLHAGEM (HSV) - pula água, caminhos e UI antes do matching
+USE_FOLIAGE_PREFILTER = False  # Ativar máscara de cor antes do matching
+FOLIAGE_HSV_RANGES = [  # Faixas (H, S, V) do OpenCV: H vai de 0 a 179
+    ((30, 40, 30), (90, 255, 255)),  # Verdes (copa das árvores)
+]
+FOLIAGE_MASK_SCALE = 0.25  # Máscara calculada em 1/4 da resolução (barato)
+FOLIAGE_MIN_AREA = 20  # Ignorar manchas verdes menores que isso (pixels da máscara)
+
+# PRÉ-FILTRO DE TEXTURA (variância por filtro de caixa) - pula céu, água e chão liso
+USE_VARIANCE_PREFILTER = False  # Descartar janelas lisas antes do matching
+VARIANCE_FLOOR = 25.0  # Variância mínima da janela (desvio padrão ~5 tons de cinza)
+VARIANCE_SIZE_STEP = 8  # Templates com tamanho parecido (passo em px) compartilham o mapa
+VARIANCE_DOWNSAMPLE = 1  # >1: mapas em 1/N da resolução (N² vezes mais baratos, piso reduzido; aproximado)
+VARIANCE_TILE = 192  # Só o filtro de textura ligado: blocos maiores (áreas lisas são contínuas)
+
+# PRÉ-FILTRO BINÁRIO - padrão de sinais (célula mais clara que a média) + distância de Hamming
+USE_BINARY_PREFILTER = False  # Só janelas perto do descritor do template vão para o matchTemplate
+BINARY_GRID = 6  # Células por lado do descritor (6 → 36 bits)
+BINARY_STRIDE = 8  # Passo (px) das janelas avaliadas, limitado à célula (≥ célula = uma fase só); as do meio usam a menor distância vizinha
+BINARY_MAX_DISTANCE = 7  # Bits diferentes aceitos (de BINARY_GRID²)
+
+# PRÉ-FILTRO DE PONTOS ESPARSOS - poucos pixels característicos por template (tronco, bordas da copa)
+USE_SPARSE_PREFILTER = False  # Correlação só nesses pontos decide quais janelas vão para o matchTemplate
+SPARSE_POINTS = 24  # Pontos por template
+SPARSE_STRIDE = 3  # Passo (px) das janelas avaliadas; as do meio usam a maior correlação vizinha
+SPARSE_BLUR = 5  # Suavização (px) antes de amostrar: tolera deslocamentos de 1-2 px entre as avaliadas
+SPARSE_MIN_CORRELATION = 0.55  # Correlação mínima nos pontos para a janela ser verificada
+
+PREFILTER_TILE = 96  # Janelas aprovadas (textura/binário/esparso) são verificadas em blocos de até 96 x 96 posições
+PREFILTER_MAX_TILED_AREA = 0.8  # Blocos somando mais que isso da região: matching da região inteira com máscara
+
+# CONTABILIDADE POR TEMPLATE (python -m src.template_report)
+TEMPLATE_STATS_MIN_CONFIDENCE = DISPLAY_THRESHOLD  # Só detecções a partir daqui contam como acerto
+
+# FUSÃO DOS MAPAS DE SCORE - um mapa máximo por frame, picos extraídos uma vez só
+USE_SCORE_FUSION = False  # Em vez de extrair candidatos de cada template/escala separadamente
+
+# ROI ADAPTATIVA (mapa de calor das detecções) - busca só onde árvores têm aparecido
+ADAPTIVE_ROI = False  # Substitui a ROI central fixa (a ROI customizada vira o limite da exploração)
+HEATMAP_CELL = 32  # Tamanho da célula do mapa de calor (px da tela)
+HEATMAP_DECAY = 0.9  # Fração do calor mantida a cada frame
+HEATMAP_MIN_HEAT = 0.5  # Calor mínimo para a célula entrar na ROI
+ADAPTIVE_ROI_MARGIN = 96  # Margem em volta das células quentes (px) - cobre o movimento da câmera
+ADAPTIVE_ROI_MAX_REGIONS = 4  # Máximo de regiões por frame (as mais próximas são unidas)
+ADAPTIVE_ROI_EXPLORE_EVERY = 15  # Varrer a tela inteira a cada N frames para achar regiões novas
+
+# DETECÇÃO COM PRAZO (anytime) - o que não couber no prazo fica para o próximo frame
+USE_DEADLINE = False  # Overlay passa um prazo para detect()
+DEADLINE_BUDGET_MS = 25  # Orçamento de detecção por frame (ms) - abaixo de DETECTION_DELAY
+DEADLINE_BANDS = 3  # Faixas horizontais por template (jobs = templates x faixas)
+DEADLINE_SMOOTHING = 0.2  # Peso da última medição nas médias de custo/valor dos jobs
+
+# GRAVAÇÃO DE SESSÃO (python -m src.recorder) - frames da ROI num arquivo anel pré-alocado
+RECORDING_ENABLED = False  # Gravar os frames que o detector vê
+RECORDING_FILE = 'session.ring'
+RECORDING_FORMAT = 'gray'  # 'gray' (1 byte/pixel) ou 'bgra' (4 bytes/pixel, mantém a cor)
+RECORDING_CAPACITY = 600  # Frames no anel (~17s a 35 FPS; ~1.2 GB em cinza com slot 1920x1080)
+RECORDING_MAX_PENDING = 8  # Frames na fila antes de descartar
+
+# TEMPLATES CAPTURADOS
+TEMPLATE_SAVE_MAX_PENDING = 16  # PNGs na fila de gravação (add_template só espera se encher)
+
+# VÁRIOS CLIENTES (python -m src.multiclient)
+MULTI_CLIENT_REPORT_EVERY = 5.0  # Segundos entre as estatísticas por cliente
+
+# RITMO POR ATIVIDADE (tela parada → captura/detecção em repouso)
+ACTIVITY_MONITOR = False
+ACTIVITY_SAMPLE_STEP = 8  # Amostra 1 pixel a cada N (nas duas direções) para medir a mudança
+ACTIVITY_PIXEL_DELTA = 12  # Diferença (0-255) para um pixel amostrado contar como mudado
+ACTIVITY_MIN_CHANGED = 0.002  # Fração de pixels mudados que conta como movimento
+ACTIVITY_IDLE_AFTER = 3.0  # Segundos parada antes de entrar em repouso
+ACTIVITY_IDLE_FPS = 4  # Ritmo de captura em repouso (latência máx. para acordar: 1/N s)
+
+# CACHE DE CENAS - rota de farm repetida: cena já vista devolve o resultado guardado (src/scenecache.py)
+SCENE_CACHE = False
+SCENE_CACHE_MAX_ENTRIES = 64  # Cenas guardadas (LRU)
+SCENE_CACHE_MAX_MB = 8.0  # Limite de memória (miniaturas + detecções)
+SCENE_CACHE_TTL = 60.0  # Segundos até uma cena guardada vencer (árvores renascem)
+SCENE_CACHE_THUMB_WIDTH = 160  # Largura (px) da miniatura em cinza usada para hash e verificação
+SCENE_CACHE_MAX_DISTANCE = 12  # Bits diferentes aceitos no hash perceptual (de 64); deslocamentos mudam alguns bits
+SCENE_CACHE_CANDIDATES = 3  # Entradas mais próximas verificadas na miniatura por frame
+SCENE_CACHE_MAX_SHIFT = 0.05  # Deslocamento máximo aceito (fração da ROI); as caixas são transladadas
+SCENE_CACHE_MIN_RESPONSE = 0.3  # Confiança mínima da correlação de fase que mede o deslocamento
+SCENE_CACHE_MAX_DIFF = 10.0  # Maior diferença local (tons de cinza) entre as cenas alinhadas
+
+# SCANNER OFFLINE (python -m src.scan)
+SCAN_MAX_IN_FLIGHT = 2  # Frames em trânsito por worker (limita memória)
+SCAN_CHECKPOINT_EVERY = 100  # Salvar progresso a cada N frames
+
 # PASTAS
 SAVE_FOLDER = 'tree_training_data'
 CONFIG_FILE = 'roi_config.json'  # Arquivo para salvar ROI customizada
@@ -43,3 +189,39 @@ HOTKEY_CAPTURE = 'subtract'  # NUMPAD [-] - Capturar template de árvore
 HOTKEY_DETECT = 'add'        # NUMPAD [+] - Ativar/Pausar detecção
 HOTKEY_SET_ROI = 'end'       # END - Definir área ROI customizada
 HOTKEY_QUIT = '*'            # NUMPAD [*] - Sair
+
+
+# PERFIL DE CONFIGURAÇÃO (gerado pelo autotuner: python -m src.autotune ... --profile perfil.json)
+# Só é aplicado quando pedido: PXG_PROFILE=perfil.json python main_refactored.py
+PROFILE_ENV = 'PXG_PROFILE'
+
+
+def _load_profile(path=None):
+    """Aplica um perfil JSON {NOME: valor} sobre as configurações deste módulo (padrão: $PXG_PROFILE)"""
+    import json
+    import os
+
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path:
+        return
+
+    if not os.path.exists(path):
+        print(f"⚠️ Perfil {path} não encontrado ({PROFILE_ENV}), usando os valores padrão")
+        return
+
+    try:
+        with open(path, 'r') as f:
+            profile = json.load(f)
+    except Exception as e:
+        print(f"⚠️ Erro ao carregar perfil {path}: {e}")
+        return
+
+    for name, value in profile.get('config', profile).items():
+        if name.isupper() and name in globals():
+            globals()[name] = value
+
+    global DETECTION_DELAY
+    DETECTION_DELAY = 1.0 / FPS_TARGET
+
+
+_load_profile()
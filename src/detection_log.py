@@ -0,0 +1,348 @@
+"""
+Log persistente de detecções (SQLite em modo WAL)
+
+- log_frame() só enfileira (não bloqueia o detection_loop)
+- Uma thread escritora grava em lotes (DETECTION_LOG_BATCH_SIZE frames por commit)
+- Fila limitada: se o disco não acompanhar, frames são descartados e contados
+
+Consultas:
+    python -m src.detection_log summary detections.db
+    python -m src.detection_log bench   # overhead de escrita a 35 FPS
+"""
+
+import argparse
+import os
+import pathlib
+import queue
+import sqlite3
+import tempfile
+import threading
+import time
+
+from src.config import *
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS frames (
+    session_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    roi_x1 INTEGER, roi_y1 INTEGER, roi_x2 INTEGER, roi_y2 INTEGER,
+    detections INTEGER NOT NULL,
+    frame_ms REAL,
+    PRIMARY KEY (session_id, frame)
+);
+CREATE TABLE IF NOT EXISTS detections (
+    session_id INTEGER NOT NULL,
+    frame INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    x INTEGER NOT NULL, y INTEGER NOT NULL, w INTEGER NOT NULL, h INTEGER NOT NULL,
+    confidence REAL NOT NULL,
+    template TEXT,
+    scale REAL
+);
+"""
+
+DETECTION_COLUMNS = '(session_id, frame, ts, x, y, w, h, confidence, template, scale)'
+
+
+def _detection_columns(conn):
+    return {row[1] for row in conn.execute('PRAGMA table_info(detections)')}
+
+
+def connect(path):
+    """Abre (ou cria) o banco para escrita em modo WAL (leitores não bloqueiam o escritor)"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript(SCHEMA)
+
+    # Bancos antigos guardavam só o índice do template (template_id)
+    if 'template' not in _detection_columns(conn):
+        conn.execute('ALTER TABLE detections ADD COLUMN template TEXT')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_detections_template ON detections (template)')
+    conn.commit()
+    return conn
+
+
+def connect_readonly(path):
+    """Abre um banco existente só para leitura (consultas não criam arquivo nem schema)"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Log de detecções não encontrado: {path}")
+    return sqlite3.connect(pathlib.Path(path).absolute().as_uri() + '?mode=ro', uri=True)
+
+
+def _template_name(detection, templates):
+    """Nome do arquivo do template da detecção (o índice muda quando templates entram ou saem)"""
+    idx = detection.get('template_id')
+    if templates is None or idx is None or not 0 <= idx < len(templates):
+        return None
+    return os.path.basename(templates[idx]['path'])
+
+
+class DetectionLog:
+    """Log append-only alimentado por uma thread escritora com commits em lote"""
+
+    def __init__(self, path=DETECTION_LOG_FILE, batch_size=DETECTION_LOG_BATCH_SIZE,
+                 flush_interval=DETECTION_LOG_FLUSH_INTERVAL, max_pending=DETECTION_LOG_MAX_PENDING):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_pending)
+
+        self.session_id = None
+        self.frame_counter = 0
+        self._thread = None
+        self._ready = threading.Event()
+
+        self.logged = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.commits = 0
+        self.commit_ms = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._writer_loop, name='detection-log', daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout=5.0)
+
+    def stop(self, timeout=5.0):
+        """Grava o que falta e encerra a thread escritora (nunca trava se ela morreu)"""
+        thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ Log de detecções não esvaziou em {timeout:.0f}s, {self.queue.qsize()} frames descartados")
+            return
+        thread.join(timeout)
+
+    def log_frame(self, detections, roi=None, timestamp=None, frame_ms=None, templates=None):
+        """
+        Enfileira um frame (não bloqueia; descarta se a fila estiver cheia)
+
+        templates: conjunto usado na detecção, para gravar o nome do arquivo de cada template
+        """
+        record = (
+            self.frame_counter,
+            timestamp if timestamp is not None else time.time(),
+            tuple(roi) if roi else (None, None, None, None),
+            [(d['x'], d['y'], d['w'], d['h'], d['confidence'], _template_name(d, templates), d.get('scale'))
+             for d in detections],
+            frame_ms
+        )
+        self.frame_counter += 1
+
+        try:
+            self.queue.put_nowait(record)
+            self.logged += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer_loop(self):
+        try:
+            conn = connect(self.path)
+            with conn:
+                cursor = conn.execute('INSERT INTO sessions (started_at) VALUES (?)', (time.time(),))
+        except sqlite3.Error as e:
+            print(f"❌ Log de detecções desativado ({self.path}): {e}")
+            self._ready.set()
+            return
+        self.session_id = cursor.lastrowid
+        self._ready.set()
+
+        running = True
+        while running:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            # Juntar até batch_size frames ou até o intervalo de flush
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if record is None:
+                    running = False
+                    break
+                batch.append(record)
+
+            if batch:
+                try:
+                    self._write_batch(conn, batch)
+                except sqlite3.Error as e:
+                    # Lote perdido, mas a thread continua esvaziando a fila
+                    self.errors += 1
+                    self.dropped += len(batch)
+                    print(f"❌ Erro ao gravar log de detecções: {e}")
+
+        conn.close()
+
+    def _write_batch(self, conn, batch):
+        start = time.perf_counter()
+
+        frame_rows = []
+        detection_rows = []
+        for frame, ts, roi, detections, frame_ms in batch:
+            frame_rows.append((self.session_id, frame, ts, *roi, len(detections), frame_ms))
+            for x, y, w, h, confidence, template, scale in detections:
+                detection_rows.append((self.session_id, frame, ts, x, y, w, h,
+                                       float(confidence), template, scale))
+
+        with conn:
+            conn.executemany('INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', frame_rows)
+            conn.executemany(f'INSERT INTO detections {DETECTION_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             detection_rows)
+
+        self.written += len(batch)
+        self.commits += 1
+        self.commit_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        return {
+            'pending': self.queue.qsize(),
+            'logged': self.logged,
+            'written': self.written,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'commits': self.commits,
+            'avg_commit_ms': self.commit_ms / self.commits if self.commits else 0.0
+        }
+
+
+def hits_per_template(path, min_confidence=0.0, session_id=None):
+    """Detecções por template: [(arquivo do template, hits, confiança média, melhor confiança)]"""
+    conn = connect_readonly(path)
+    try:
+        # Bancos antigos sem a coluna template só têm o índice
+        column = 'template' if 'template' in _detection_columns(conn) else 'template_id'
+        query = (f'SELECT {column}, COUNT(*), AVG(confidence), MAX(confidence) '
+                 'FROM detections WHERE confidence >= ?')
+        params = [min_confidence]
+        if session_id is not None:
+            query += ' AND session_id = ?'
+            params.append(session_id)
+        query += f' GROUP BY {column} ORDER BY COUNT(*) DESC'
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+
+def hits_per_region(path, cell_size=100, min_confidence=0.0, session_id=None):
+    """Detecções por célula da tela (pelo centro da caixa): [(cx, cy, hits)] com cx/cy em px"""
+    conn = connect_readonly(path)
+    try:
+        query = ('SELECT (x + w / 2) / ? AS gx, (y + h / 2) / ? AS gy, COUNT(*) '
+                 'FROM detections WHERE confidence >= ?')
+        params = [cell_size, cell_size, min_confidence]
+        if session_id is not None:
+            query += ' AND session_id = ?'
+            params.append(session_id)
+        query += ' GROUP BY gx, gy ORDER BY COUNT(*) DESC'
+        return [(gx * cell_size, gy * cell_size, hits) for gx, gy, hits in conn.execute(query, params)]
+    finally:
+        conn.close()
+
+
+def measure_overhead(fps=FPS_TARGET, seconds=5.0, detections_per_frame=5, path=None):
+    """
+    Simula o detection_loop a `fps` quadros/s e mede o custo de log_frame()
+    na thread chamadora (o que o detection_loop realmente paga)
+    """
+    cleanup = path is None
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+
+    log = DetectionLog(path)
+    log.start()
+
+    detections = [
+        {'x': 100 + i * 60, 'y': 200, 'w': 48, 'h': 56, 'confidence': 0.85, 'template_id': i, 'scale': 1.0}
+        for i in range(detections_per_frame)
+    ]
+    templates = [{'path': f'tree_{i}.png'} for i in range(detections_per_frame)]
+
+    call_times = []
+    frames = int(fps * seconds)
+    period = 1.0 / fps
+    next_frame = time.perf_counter()
+
+    for _ in range(frames):
+        start = time.perf_counter()
+        log.log_frame(detections, roi=(0, 0, 1920, 1080), frame_ms=period * 1000, templates=templates)
+        call_times.append((time.perf_counter() - start) * 1e6)
+
+        next_frame += period
+        time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    log.stop()
+    stats = log.stats()
+
+    if cleanup:
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    call_times.sort()
+    result = {
+        'frames': frames,
+        'mean_us': sum(call_times) / len(call_times),
+        'p99_us': call_times[int(len(call_times) * 0.99) - 1],
+        'frame_budget_pct': (sum(call_times) / len(call_times)) / (period * 1e6) * 100,
+        **stats
+    }
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.detection_log',
+                                     description='Consultas e benchmark do log de detecções')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    summary = sub.add_parser('summary', help='Detecções por template e por região')
+    summary.add_argument('path', nargs='?', default=DETECTION_LOG_FILE)
+    summary.add_argument('--min-confidence', type=float, default=DISPLAY_THRESHOLD)
+    summary.add_argument('--cell', type=int, default=100, help='Tamanho da célula (px)')
+    summary.add_argument('--top', type=int, default=10)
+
+    bench = sub.add_parser('bench', help='Overhead de log_frame() a FPS_TARGET')
+    bench.add_argument('--fps', type=float, default=FPS_TARGET)
+    bench.add_argument('--seconds', type=float, default=5.0)
+    bench.add_argument('--detections', type=int, default=5)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'summary':
+        if not os.path.exists(args.path):
+            print(f"⚠️ Log de detecções não encontrado: {args.path}")
+            return
+
+        print(f"\n🌳 Detecções por template (≥{args.min_confidence:.0%}):")
+        for template, hits, avg_conf, best in hits_per_template(args.path, args.min_confidence)[:args.top]:
+            print(f"  {template}: {hits} hits | média {avg_conf:.0%} | melhor {best:.0%}")
+
+        print(f"\n🗺️ Regiões com mais detecções (células {args.cell}px):")
+        for x, y, hits in hits_per_region(args.path, args.cell, args.min_confidence)[:args.top]:
+            print(f"  ({x}, {y}): {hits} hits")
+    else:
+        result = measure_overhead(args.fps, args.seconds, args.detections)
+        print(f"\n📝 {result['frames']} frames a {args.fps:.0f} FPS")
+        print(f"⏱️ log_frame(): média {result['mean_us']:.1f}µs | p99 {result['p99_us']:.1f}µs "
+              f"({result['frame_budget_pct']:.2f}% do tempo de frame)")
+        print(f"💾 {result['written']} gravados em {result['commits']} commits "
+              f"(média {result['avg_commit_ms']:.1f}ms) | descartados {result['dropped']}")
+
+
+if __name__ == '__main__':
+    main()
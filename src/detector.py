@@ -4,59 +4,214 @@ Motor de detecção de árvores - VERSÃO OTIMIZADA
 
 import cv2
 import numpy as np
-from PIL import Image
 import os
+import copy
 import json
+import time
+import threading
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from src.config import *
+from src.anytime import DeadlineScheduler, Detections
+from src.calibration import ScaleCalibrator
+from src.engines import DetectionEngine, create_engine
+from src.heatmap import AdaptiveROI
+from src.prefilter import (foliage_regions, variance_inputs, window_variance, expand_map,
+                           intersect_regions, sign_descriptor, sign_descriptor_maps, hamming_distance_map,
+                           valid_boxes, sparse_points, sparse_phases, sparse_correlation)
+from src.scenecache import SceneCache, exposed_regions
+from src.templates import TemplateBank
+
+
+def _empty_template_stats():
+    """Contadores de custo x benefício de um template"""
+    return {'match_ms': 0.0, 'calls': 0, 'hits': 0, 'confidence_sum': 0.0, 'best': 0.0, 'unique': 0}
 
 
 class TreeDetector:
     """Motor de detecção de árvores com otimizações para movimento"""
 
-    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD):
-        self.templates = []
+    def __init__(self, similarity_threshold=SIMILARITY_THRESHOLD, save_folder=SAVE_FOLDER,
+                 use_threading=USE_THREADING, verbose=True, engine=DETECTION_ENGINE):
+        # Conjunto imutável e versionado: cada frame usa o que estava publicado
+        # quando começou; mudanças publicam um conjunto novo (copy-on-write).
+        # PNGs de templates capturados são gravados numa thread do banco
+        self.bank = TemplateBank()
+
+        # Detectores criados por stream() compartilham banco, motor e pool com este
+        self.shared = False
+
         self.similarity_threshold = similarity_threshold
-        self.save_folder = SAVE_FOLDER
+        self.save_folder = save_folder
+        self.use_threading = use_threading
+        self.verbose = verbose
+
+        # Estatísticas do último frame processado
+        self.stats = {}
+
+        # Thresholds dos consumidores (display, log, tracking...): só detecções
+        # que algum consumidor pediu viram dicts; o resto fica como estatística
+        self.consumer_thresholds = {}
+        self._ms_per_pixel = None  # Custo médio de matching (estimativa do pré-filtro)
+
+        # Motor de detecção plugável (template matching, cascata, ...): nome ou instância pronta
+        self.engine = engine if isinstance(engine, DetectionEngine) else create_engine(engine)
+        self.engine.verbose = verbose
+
+        # Calibração de zoom: varre várias escalas de vez em quando e trava na melhor
+        self.calibrator = ScaleCalibrator() if AUTO_SCALE else None
+
+        # ROI adaptativa: mapa de calor das detecções decide onde buscar
+        self.adaptive_roi = AdaptiveROI() if ADAPTIVE_ROI else None
+
+        # Cache de cenas: tela já vista (rota de farm repetida) devolve o resultado guardado
+        self.scene_cache = SceneCache() if SCENE_CACHE else None
+
+        # Contabilidade por template (custo x benefício): frames contados e
+        # templates que acharam cada detecção do último frame
+        self.accounted_frames = 0
+        self.last_support = []
+
+        # Gravador de sessão (src.recorder), ligado pelo overlay
+        self.recorder = None
+
+        # Jobs (template, faixa) para detecção com prazo; o que sobra fica para o próximo frame
+        self.scheduler = DeadlineScheduler()
 
         if not os.path.exists(self.save_folder):
             os.makedirs(self.save_folder)
 
         # Thread pool para processamento paralelo
-        if USE_THREADING:
+        if self.use_threading:
             self.executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
         else:
             self.executor = None
 
         self.load_templates()
 
+    @property
+    def templates(self):
+        """Conjunto de templates publicado agora (TemplateSet imutável)"""
+        return self.bank.current
+
+    def _publish_templates(self, update):
+        """Publica um novo conjunto de templates: update(lista atual) → nova lista"""
+        return self.bank.publish(update)
+
+    def stream(self):
+        """
+        Detector leve para outro cliente/janela (src.multiclient)
+
+        Compartilha banco de templates, motor, pool de threads e calibração de
+        escala (os clientes rodam no mesmo zoom); ROI adaptativa, cache de cenas,
+        jobs com prazo, thresholds de consumidores e estatísticas são próprios de
+        cada stream.
+        Os frames dos streams não podem rodar ao mesmo tempo (o motor é compartilhado).
+        """
+        stream = copy.copy(self)
+        stream.shared = True
+        stream.stats = {}
+        stream.consumer_thresholds = dict(self.consumer_thresholds)
+        stream._ms_per_pixel = None
+        stream.adaptive_roi = AdaptiveROI() if ADAPTIVE_ROI else None
+        stream.scene_cache = SceneCache() if SCENE_CACHE else None
+        stream.accounted_frames = 0
+        stream.last_support = []
+        stream.recorder = None
+        stream.scheduler = DeadlineScheduler()
+        return stream
+
     def add_template(self, image_pil):
-        """Adiciona um novo exemplo de árvore"""
+        """Adiciona um novo exemplo de árvore (o PNG é gravado em segundo plano)"""
         img_array = np.array(image_pil)
         img_gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
 
-        # Salvar arquivo
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
         filename = f"{self.save_folder}/tree_{timestamp}.png"
-        image_pil.save(filename)
 
-        # Pré-processar e cachear escalas
-        scaled_templates = self._preprocess_template(img_gray)
+        # Montado sob o lock de publicação para não perder uma escala travada ao mesmo tempo
+        templates = self._publish_templates(lambda current: current + [self._build_template(img_gray, filename)])
+        self.bank.persistence.save(image_pil, filename)
+
+        print(f"✅ Template #{len(templates)} adicionado: {img_gray.shape} (versão {templates.version})")
+
+    def _build_template(self, img_gray, path):
+        """Monta o dict do template com escalas cacheadas e dados do motor"""
+        scales = SCALES
+        if self.calibrator and self.calibrator.locked_scale is not None:
+            scales = [self.calibrator.locked_scale]
 
-        self.templates.append({
+        template_data = {
             'image': img_gray,
-            'scaled': scaled_templates,
+            'scaled': self._preprocess_template(img_gray, scales),  # Pré-processar e cachear escalas
             'size': img_gray.shape,
-            'path': filename
-        })
+            'path': path,
+            'stats': _empty_template_stats()
+        }
+
+        # Variantes para os frames de calibração de escala
+        if self.calibrator:
+            template_data['calibration'] = self._preprocess_template(img_gray, CALIBRATION_SCALES)
+
+        return self._prepare_template(template_data)
 
-        print(f"✅ Template #{len(self.templates)} adicionado: {img_gray.shape}")
+    def _prepare_template(self, template_data):
+        """
+        Monta os dados derivados de um dict novo, antes de publicar
 
-    def _preprocess_template(self, template):
+        Descritores binários (pré-filtro de Hamming) e pontos esparsos saem no
+        tamanho exato de matching de cada variante; depois vêm os dados do motor.
+        Publicado, o dict é só leitura (threads e versões antigas o compartilham).
+        """
+        scale_back = 1.0 / DOWNSAMPLE_FACTOR if DOWNSAMPLE_FACTOR < 1.0 else 1.0
+        binary, sparse = {}, {}
+        if USE_BINARY_PREFILTER or USE_SPARSE_PREFILTER:
+            for variants in ('scaled', 'calibration'):
+                for resized_template in template_data.get(variants, {}).values():
+                    template_to_match = self._template_to_match(resized_template, scale_back)
+                    if template_to_match is None:
+                        continue
+                    th, tw = template_to_match.shape
+                    if USE_BINARY_PREFILTER:
+                        binary[(tw, th)] = sign_descriptor(template_to_match, BINARY_GRID)
+                    if USE_SPARSE_PREFILTER:
+                        sparse[(tw, th)] = self._template_sparse_points(template_to_match)
+
+        template_data['binary'] = binary
+        template_data['sparse'] = sparse
+        self.engine.prepare_template(template_data)
+        return template_data
+
+    def set_engine(self, name):
+        """Troca o motor de detecção e pré-processa os templates para ele"""
+        engine = create_engine(name)
+        engine.verbose = self.verbose
+
+        def prepare(current):
+            prepared = []
+            for template_data in current:
+                template_data = dict(template_data)
+                engine.prepare_template(template_data)
+                prepared.append(template_data)
+            return prepared
+
+        self._publish_templates(prepare)
+        self.engine = engine
+
+    def _lock_scale(self, scale):
+        """Reconstrói as variantes dos templates para uma única escala travada"""
+        self._publish_templates(lambda current: [
+            self._prepare_template(dict(template_data, scaled=self._preprocess_template(template_data['image'], [scale])))
+            for template_data in current
+        ])
+
+        if self.verbose:
+            print(f"🔭 Escala travada em {scale:.2f}x")
+
+    def _preprocess_template(self, template, scales=None):
         """Pré-processa template em múltiplas escalas (CACHE)"""
         scaled = {}
-        for scale in SCALES:
+        for scale in scales or SCALES:
             w = int(template.shape[1] * scale)
             h = int(template.shape[0] * scale)
 
@@ -87,31 +242,138 @@ class TreeDetector:
 
         return (x1, y1, x2, y2)
 
-    def detect(self, screenshot_pil, custom_roi=None):
+    def set_consumer_threshold(self, name, threshold):
+        """Registra (ou atualiza) o threshold mínimo de um consumidor das detecções"""
+        self.consumer_thresholds[name] = threshold
+
+    def remove_consumer(self, name):
+        """Remove um consumidor registrado"""
+        self.consumer_thresholds.pop(name, None)
+
+    def materialize_threshold(self, thresholds=None):
+        """
+        Confiança mínima para uma detecção virar dict: o menor threshold pedido
+        pelos consumidores (nunca abaixo de similarity_threshold). Sem consumidores,
+        materializa tudo acima de similarity_threshold.
+        """
+        consumers = dict(self.consumer_thresholds)
+        if thresholds:
+            consumers.update(thresholds)
+
+        if not consumers:
+            return self.similarity_threshold
+        return max(self.similarity_threshold, min(consumers.values()))
+
+    def _account_templates(self, templates, detections, support):
+        """Atribui as detecções finais (≥ TEMPLATE_STATS_MIN_CONFIDENCE) ao template vencedor"""
+        self.accounted_frames += 1
+
+        for det, found_by in zip(detections, support):
+            if det['confidence'] < TEMPLATE_STATS_MIN_CONFIDENCE:
+                continue
+            template_stats = templates[det['template_id']]['stats']
+            template_stats['hits'] += 1
+            template_stats['confidence_sum'] += det['confidence']
+            template_stats['best'] = max(template_stats['best'], det['confidence'])
+            if len(found_by) == 1:
+                template_stats['unique'] += 1
+
+    def template_stats(self):
+        """
+        Custo x benefício de cada template desde o início (ou do último reset)
+
+        Únicos = detecções que nenhum outro template encontrou. Com a fusão de
+        mapas (USE_SCORE_FUSION) só o vencedor de cada pixel sobrevive, então
+        "único" fica superestimado.
+        """
+        frames = max(self.accounted_frames, 1)
+        rows = []
+        for idx, template_data in enumerate(self.templates):
+            stats = template_data['stats']
+            hits = stats['hits']
+            rows.append({
+                'template_id': idx,
+                'path': template_data['path'],
+                'size': template_data['size'],
+                'ms_per_frame': stats['match_ms'] / frames,
+                'match_ms': stats['match_ms'],
+                'hits': hits,
+                'best': stats['best'],
+                'mean': stats['confidence_sum'] / hits if hits else 0.0,
+                'unique': stats['unique'],
+                'hits_per_ms': hits / stats['match_ms'] if stats['match_ms'] > 0 else 0.0
+            })
+        return rows
+
+    def reset_template_stats(self):
+        self.accounted_frames = 0
+        # Os contadores são compartilhados entre versões do conjunto: zerar no lugar
+        for template_data in self.templates:
+            template_data['stats'].update(_empty_template_stats())
+
+    def score_stats(self):
+        """Estatísticas das faixas de confiança do último frame (inclui o que não foi materializado)"""
+        return {
+            'max_score': self.stats.get('max_score'),
+            'tiers': self.stats.get('tiers', {}),
+            'candidates_raw': self.stats.get('candidates_raw', 0),
+            'candidates_materialized': self.stats.get('candidates_materialized', 0)
+        }
+
+    def detect(self, screenshot_pil, custom_roi=None, thresholds=None, deadline=None):
         """
         Detecta árvores na screenshot - VERSÃO ULTRA OTIMIZADA
+
+        deadline: instante (time.perf_counter()) para devolver o que já foi feito;
+        o resultado é uma lista Detections com .complete = False se sobrou trabalho
         - ROI para processar só área central ou customizada
+        - Pré-filtro de folhagem (opcional) para pular água, caminhos e UI
         - Threading para processar templates em paralelo
         - Cache de templates preprocessados
+        - Só materializa detecções que algum consumidor pediu (thresholds)
         - NMS eficiente
         """
-        if not self.templates:
-            return []
+        self.stats = {}
+
+        # Snapshot do conjunto de templates para o frame inteiro
+        templates = self.templates
+        if not templates:
+            return Detections()
+        self.stats['templates_version'] = templates.version
+
+        detect_start = time.perf_counter()
 
-        # Converter screenshot
-        screen_array = np.array(screenshot_pil)
-        screen_gray = cv2.cvtColor(screen_array, cv2.COLOR_RGB2GRAY)
+        # Converter screenshot (PIL RGB, ou array RGB / cinza / BGRA sem cópia)
+        screen_array, color_order = self._frame_array(screenshot_pil)
+
+        # Aplicar ROI (adaptativa, customizada ou automática) antes de converter, ainda em cor
+        adaptive_regions = None
+        if self.adaptive_roi is not None:
+            base = custom_roi if USE_CUSTOM_ROI and custom_roi else None
+            roi, adaptive_regions = self.adaptive_roi.plan(screen_array.shape, base)
+        else:
+            roi = self._get_roi(screen_array.shape, custom_roi)
 
-        # Aplicar ROI (customizada ou automática)
-        roi = self._get_roi(screen_gray.shape, custom_roi)
         if roi:
             x1, y1, x2, y2 = roi
-            screen_roi = screen_gray[y1:y2, x1:x2]
+            roi_rgb = screen_array[y1:y2, x1:x2]
             offset_x, offset_y = x1, y1
         else:
-            screen_roi = screen_gray
+            roi_rgb = screen_array
             offset_x, offset_y = 0, 0
 
+        self.stats['roi'] = roi or (0, 0, screen_array.shape[1], screen_array.shape[0])
+
+        # Gravação de sessão: só enfileira o recorte, a conversão é na thread do gravador
+        if self.recorder is not None:
+            self.recorder.record(roi_rgb, self.stats['roi'], color_order)
+
+        if color_order == 'gray':
+            screen_roi = roi_rgb
+        else:
+            code = cv2.COLOR_RGB2GRAY if color_order == 'rgb' else cv2.COLOR_BGRA2GRAY
+            screen_roi = cv2.cvtColor(roi_rgb, code)
+
         # Downsample se configurado
         if DOWNSAMPLE_FACTOR < 1.0:
             new_w = int(screen_roi.shape[1] * DOWNSAMPLE_FACTOR)
@@ -121,33 +383,413 @@ class TreeDetector:
         else:
             scale_back = 1.0
 
-        # Detectar usando threading ou sequencial
-        if USE_THREADING and self.executor:
-            detections = self._detect_parallel(screen_roi, offset_x, offset_y, scale_back)
+        ctx = {
+            'screen': screen_roi,
+            'templates': templates,
+            'offset_x': offset_x,
+            'offset_y': offset_y,
+            'scale_back': scale_back,
+            'regions': None,
+            'window_maps': {},
+            'variants': 'scaled',
+            'materialize': self.materialize_threshold(thresholds),
+            'lock': threading.Lock(),
+            'fusion': None
+        }
+
+        # Fusão dos mapas de score (mapa máximo + índice da variante vencedora)
+        if USE_SCORE_FUSION:
+            ctx['fusion'] = {'score': None, 'index': None, 'ids': {}, 'variants': [], 'ms': 0.0}
+
+        # Faixas de confiança contadas no mapa de scores (sem criar dicts)
+        tiers = sorted({self.similarity_threshold, ctx['materialize']}
+                       | {t for t in SCORE_TIERS if t > self.similarity_threshold})
+        ctx['tiers'] = tiers
+        ctx['scores'] = {'tiers': [0] * len(tiers), 'max': -1.0}
+
+        # Frame de calibração: testar todas as escalas de CALIBRATION_SCALES
+        calibrating = (self.calibrator is not None and self.engine.name == 'template'
+                       and self.calibrator.needs_calibration())
+        if calibrating:
+            ctx['variants'] = 'calibration'
+            ctx['materialize'] = min(ctx['materialize'], max(self.similarity_threshold,
+                                                             CALIBRATION_MIN_CONFIDENCE))
+
+        # Cache de cenas: cena já vista no mesmo contexto devolve o resultado guardado, sem matching
+        scene = shifted = None
+        if self.scene_cache is not None and not calibrating:
+            scene = {
+                'thumb': self.scene_cache.thumbnail(screen_roi),
+                'context': (self.stats['roi'], tuple(adaptive_regions or ()), templates.version,
+                            self.engine.name, self.calibrator.locked_scale if self.calibrator else None,
+                            self.similarity_threshold)
+            }
+            cached = self.scene_cache.lookup(scene['thumb'], scene['context'], self.stats['roi'], ctx['materialize'])
+            self.stats['scene_cache_hit'] = cached is not None
+            if cached is not None:
+                shifted, shift = cached
+                exposed = exposed_regions(self.stats['roi'], shift,
+                                          self._scene_margin(templates, screen_roi, scene['thumb'], scale_back))
+                if not exposed:
+                    return self._scene_hit(shifted, detect_start)
+
+                # Cena deslocada: só as faixas que entraram pela borda passam pelo matching
+                ctx['regions'] = self._to_match_regions(exposed, offset_x, offset_y, screen_roi.shape)
+                scene = None  # Resultado parcial não entra no cache
+
+        # ROI adaptativa com várias regiões: convertê-las para a imagem de matching
+        if adaptive_regions is not None:
+            regions = self._to_match_regions(adaptive_regions, offset_x, offset_y, screen_roi.shape)
+            ctx['regions'] = regions if ctx['regions'] is None else intersect_regions(ctx['regions'], regions)
+
+        # Pré-filtro de folhagem: restringe o matching às regiões verdes (precisa de cor)
+        if USE_FOLIAGE_PREFILTER and color_order != 'gray':
+            if color_order == 'bgra':
+                roi_rgb = cv2.cvtColor(roi_rgb, cv2.COLOR_BGRA2RGB)
+            regions = self._foliage_regions(roi_rgb, screen_roi.shape, templates, ctx['variants'], scale_back)
+            ctx['regions'] = regions if ctx['regions'] is None else intersect_regions(ctx['regions'], regions)
+
+        # Pré-filtro binário: descritores do frame calculados sob demanda, por tamanho de célula
+        ctx['binary'] = None
+        if USE_BINARY_PREFILTER and not calibrating:
+            ctx['binary_maps'] = {}
+            ctx['binary'] = {'windows': 0, 'rejected': 0, 'verified': 0, 'ms': 0.0}
+
+        # Pontos esparsos: imagem suavizada e separada em fases uma vez por frame
+        ctx['sparse'] = None
+        if USE_SPARSE_PREFILTER and not calibrating:
+            sparse_start = time.perf_counter()
+            ctx['sparse_phases'] = sparse_phases(cv2.blur(screen_roi, (SPARSE_BLUR, SPARSE_BLUR)), SPARSE_STRIDE)
+            ctx['sparse'] = {'windows': 0, 'rejected': 0, 'verified': 0,
+                             'ms': (time.perf_counter() - sparse_start) * 1000}
+
+        # Pré-filtro de textura: imagem e quadrado em float32 uma vez por frame
+        if USE_VARIANCE_PREFILTER:
+            variance_start = time.perf_counter()
+            ctx['variance_inputs'] = variance_inputs(screen_roi, VARIANCE_DOWNSAMPLE)
+            ctx['variance_maps'] = {}
+            ctx['variance'] = {'windows': 0, 'rejected': 0, 'verified': 0,
+                               'ms': (time.perf_counter() - variance_start) * 1000}
+
+        match_start = time.perf_counter()
+
+        # Detectar com o motor ativo (template matching usa threading ou sequencial);
+        # com prazo, template matching roda job a job (calibração sempre roda inteira)
+        complete = True
+        post_start = None
+        if deadline is not None and self.engine.name == 'template' and not calibrating:
+            detections, complete, job_stats = self.scheduler.run(self, ctx, deadline)
+            self.stats.update(job_stats)
+            post_start = time.perf_counter()
         else:
-            detections = self._detect_sequential(screen_roi, offset_x, offset_y, scale_back)
+            detections = self.engine.detect(self, ctx)
+        self.stats['complete'] = complete
+
+        if ctx['fusion'] is not None:
+            fused = self._fusion_peaks(ctx)
+            detections.extend(fused)
+            if 'cascade_verified' in self.stats:
+                self.stats['cascade_verified'] = len(fused)
+
+        match_ms = (time.perf_counter() - match_start) * 1000
+        self.stats['match_ms'] = match_ms
+
+        # Motores que não usam _match_template (ORB) só conhecem o que materializaram
+        scores = ctx['scores']
+        best_score = max(scores['max'], max((d['confidence'] for d in detections), default=-1.0))
+        self.stats['materialize_threshold'] = ctx['materialize']
+        self.stats['candidates_raw'] = max(scores['tiers'][0], len(detections))
+        self.stats['candidates_materialized'] = len(detections)
+        self.stats['tiers'] = dict(zip(ctx['tiers'], scores['tiers']))
+        self.stats['max_score'] = best_score
+
+        if calibrating:
+            previous = self.calibrator.locked_scale
+            scale = self.calibrator.calibrate(self._calibration_votes(detections))
+            if scale is not None and scale != previous:
+                self._lock_scale(scale)
+        elif self.calibrator is not None:
+            self.calibrator.observe(best_score)
+
+        if self.calibrator is not None:
+            self.stats['scale'] = self.calibrator.locked_scale
+            self.stats['calibrating'] = calibrating
+
+        if 'foliage_masked' in self.stats:
+            self._update_foliage_savings(screen_roi.shape, match_ms)
+
+        if USE_VARIANCE_PREFILTER:
+            counters = ctx['variance']
+            self.stats['variance_ms'] = counters['ms']
+            self.stats['variance_pruned'] = counters['rejected'] / max(counters['windows'], 1)
+            self.stats['variance_verified'] = counters['verified']
+            self.stats['variance_speedup'] = counters['windows'] / max(counters['verified'], 1)
+
+        if ctx['binary'] is not None:
+            counters = ctx['binary']
+            self.stats['binary_ms'] = counters['ms']
+            self.stats['binary_rejected'] = counters['rejected'] / max(counters['windows'], 1)
+            self.stats['binary_verified'] = counters['verified']
+
+        if ctx['sparse'] is not None:
+            counters = ctx['sparse']
+            self.stats['sparse_ms'] = counters['ms']
+            self.stats['sparse_rejected'] = counters['rejected'] / max(counters['windows'], 1)
+            self.stats['sparse_verified'] = counters['verified']
+
+        # NMS para remover duplicatas (guardando quais templates acharam cada árvore)
+        support = []
+        detections = self._non_maximum_suppression(detections, support)
+        self._account_templates(templates, detections, support)
+
+        # Acerto deslocado do cache: detecções guardadas + o que entrou pelas faixas novas
+        if shifted is not None:
+            support = []
+            detections = self._non_maximum_suppression(shifted + detections, support)
+        self.last_support = support
+
+        if self.adaptive_roi is not None:
+            self.adaptive_roi.update(detections)
+            adaptive = self.adaptive_roi.stats()
+            self.stats['adaptive_regions'] = adaptive['regions']
+            self.stats['adaptive_exploring'] = adaptive['exploring']
+            self.stats['adaptive_pixels'] = adaptive['pixel_fraction']
+            self.stats['adaptive_avg_pixels'] = adaptive['avg_pixel_fraction']
+            self.stats['adaptive_missed'] = adaptive['missed_rate']
+
+        self.stats['detect_ms'] = (time.perf_counter() - detect_start) * 1000
+
+        # Só resultados completos entram no cache (com prazo estourado faltou trabalho)
+        if scene is not None and complete:
+            self.scene_cache.store(scene['thumb'], scene['context'], ctx['materialize'], detections,
+                                   self.stats['detect_ms'])
+
+        # Pós-processamento (fusão, NMS, estatísticas) sai do prazo dos jobs nos próximos frames
+        if post_start is not None:
+            self.scheduler.observe_post((time.perf_counter() - post_start) * 1000)
+
+        return Detections(detections, complete)
+
+    def _calibration_votes(self, detections):
+        """Detecções da calibração sem duplicatas dentro de cada escala (NMS por escala)"""
+        by_scale = {}
+        for det in detections:
+            if det['confidence'] >= CALIBRATION_MIN_CONFIDENCE:
+                by_scale.setdefault(det.get('scale'), []).append(det)
+        return [det for group in by_scale.values() for det in self._non_maximum_suppression(group)]
 
-        # NMS para remover duplicatas
-        detections = self._non_maximum_suppression(detections)
+    def _scene_margin(self, templates, screen_roi, thumb, scale_back):
+        """Margem (px da tela) das faixas novas: maior template + um pixel da miniatura (erro do deslocamento)"""
+        sizes = [t.shape[:2] for template_data in templates for t in template_data['scaled'].values()]
+        error = int(np.ceil(screen_roi.shape[1] * scale_back / thumb.shape[1]))
+        return (max((w for _, w in sizes), default=0) + error,
+                max((h for h, _ in sizes), default=0) + error)
 
-        return detections
+    def _scene_hit(self, detections, detect_start):
+        """Resultado vindo do cache de cenas: só atualiza a ROI adaptativa e as estatísticas"""
+        self.stats['complete'] = True
+
+        if self.adaptive_roi is not None:
+            self.adaptive_roi.update(detections)
+
+        self.last_support = []
+        self.stats['detect_ms'] = (time.perf_counter() - detect_start) * 1000
+        return Detections(detections, True)
+
+    def _frame_array(self, frame):
+        """
+        Frame como array + ordem de cor ('rgb', 'gray' ou 'bgra')
+
+        Imagens PIL são RGB (RGBA é convertida); arrays de 4 canais são BGRA,
+        o formato das bibliotecas de captura e das gravações de sessão.
+        """
+        if isinstance(frame, np.ndarray):
+            if frame.ndim == 2:
+                return frame, 'gray'
+            return frame, 'bgra' if frame.shape[2] == 4 else 'rgb'
+
+        if frame.mode not in ('RGB', 'L'):
+            frame = frame.convert('RGB')
+        return np.asarray(frame), 'gray' if frame.mode == 'L' else 'rgb'
+
+    def _to_match_regions(self, regions, offset_x, offset_y, match_shape):
+        """Retângulos (x1, y1, x2, y2) da tela → regiões (x, y, w, h) na imagem de matching"""
+        match_h, match_w = match_shape[:2]
+        factor = DOWNSAMPLE_FACTOR if DOWNSAMPLE_FACTOR < 1.0 else 1.0
+
+        converted = []
+        for x1, y1, x2, y2 in regions:
+            mx1 = max(0, int((x1 - offset_x) * factor))
+            my1 = max(0, int((y1 - offset_y) * factor))
+            mx2 = min(match_w, int(np.ceil((x2 - offset_x) * factor)))
+            my2 = min(match_h, int(np.ceil((y2 - offset_y) * factor)))
+            if mx2 > mx1 and my2 > my1:
+                converted.append((mx1, my1, mx2 - mx1, my2 - my1))
+        return converted
+
+    def _foliage_regions(self, roi_rgb, match_shape, templates, variants, scale_back):
+        """Calcula regiões candidatas (coordenadas da imagem de matching) pela máscara de folhagem"""
+        start = time.perf_counter()
+
+        # Maior variante testada neste frame (escala travada ou de calibração), na resolução de matching
+        sizes = [t.shape[:2] for template_data in templates for t in template_data[variants].values()]
+        max_w = int(np.ceil(max((w for _, w in sizes), default=0) / scale_back))
+        max_h = int(np.ceil(max((h for h, _ in sizes), default=0) / scale_back))
+
+        regions, masked_fraction = foliage_regions(
+            roi_rgb,
+            match_shape,
+            (max_w, max_h),
+            FOLIAGE_HSV_RANGES,
+            FOLIAGE_MASK_SCALE,
+            FOLIAGE_MIN_AREA
+        )
+
+        self.stats['foliage_ms'] = (time.perf_counter() - start) * 1000
+        self.stats['foliage_masked'] = masked_fraction
+        self.stats['foliage_regions'] = len(regions)
+
+        return regions
+
+    def _update_foliage_savings(self, match_shape, match_ms):
+        """Estima o tempo economizado pelo pré-filtro (custo por pixel medido nos frames anteriores)"""
+        total_pixels = match_shape[0] * match_shape[1]
+        processed_pixels = total_pixels * (1.0 - self.stats['foliage_masked'])
+
+        if processed_pixels > 0 and match_ms > 0:
+            ms_per_pixel = match_ms / processed_pixels
+            if self._ms_per_pixel is None:
+                self._ms_per_pixel = ms_per_pixel
+            else:
+                self._ms_per_pixel = 0.9 * self._ms_per_pixel + 0.1 * ms_per_pixel
+
+        if self._ms_per_pixel is None:
+            self.stats['foliage_saved_ms'] = 0.0
+            return
+
+        masked_pixels = total_pixels - processed_pixels
+        saved = self._ms_per_pixel * masked_pixels - self.stats['foliage_ms']
+        self.stats['foliage_saved_ms'] = saved
+
+    def _variance_valid(self, ctx, tw, th):
+        """
+        Posições de janela (tw x th) com textura suficiente na imagem de matching
+
+        Mapas de variância são compartilhados por templates de tamanho parecido:
+        o tamanho é arredondado para baixo (VARIANCE_SIZE_STEP) e a janela menor
+        fica centralizada dentro da janela do template. Com VARIANCE_DOWNSAMPLE > 1
+        o mapa é calculado na imagem reduzida e expandido de volta, de forma
+        conservadora: médias de blocos perdem a variância dentro de cada bloco,
+        então o piso cai por factor², e cada posição aceita se qualquer uma das
+        duas janelas reduzidas vizinhas aceitar.
+        """
+        valid = ctx['variance_maps'].get((tw, th))
+        if valid is not None:
+            return valid
+
+        start = time.perf_counter()
+        factor = VARIANCE_DOWNSAMPLE
+        bw = max(factor, tw // VARIANCE_SIZE_STEP * VARIANCE_SIZE_STEP)
+        bh = max(factor, th // VARIANCE_SIZE_STEP * VARIANCE_SIZE_STEP)
+
+        # Calculado fora do lock (threads com outro tamanho não esperam)
+        textured = ctx['variance_maps'].get(('bucket', bw, bh))
+        if textured is None:
+            screen_h, screen_w = ctx['screen'].shape
+            variance = window_variance(ctx['variance_inputs'], bw // factor, bh // factor)
+            textured = variance >= VARIANCE_FLOOR / (factor * factor)
+            if factor > 1:
+                # Janela cheia em x*factor + k fica entre as janelas reduzidas x e x + 1
+                textured = cv2.dilate(textured.view(np.uint8), np.ones((2, 2), np.uint8), anchor=(0, 0)).view(bool)
+            textured = expand_map(textured, factor, (screen_h - bh + 1, screen_w - bw + 1))
+            with ctx['lock']:
+                textured = ctx['variance_maps'].setdefault(('bucket', bw, bh), textured)
+
+        screen_h, screen_w = ctx['screen'].shape
+        mx, my = (tw - bw) // 2, (th - bh) // 2
+        valid = textured[my:my + screen_h - th + 1, mx:mx + screen_w - tw + 1]
+
+        with ctx['lock']:
+            valid = ctx['variance_maps'].setdefault((tw, th), valid)
+            ctx['variance']['ms'] += (time.perf_counter() - start) * 1000
+        return valid
+
+    def _binary_bits(self, template_data, template_to_match):
+        """Descritor binário do template no tamanho de matching (montado ao publicar; só leitura aqui)"""
+        th, tw = template_to_match.shape
+        bits = template_data.get('binary', {}).get((tw, th))
+        if bits is None:
+            bits = sign_descriptor(template_to_match, BINARY_GRID)
+        return bits
+
+    def _binary_distance(self, ctx, template_data, template_to_match):
+        """
+        Distância de Hamming de cada janela (tw x th) ao descritor do template
 
-    def _detect_parallel(self, screen_roi, offset_x, offset_y, scale_back):
+        Os descritores do frame são compartilhados por templates com o mesmo
+        tamanho de célula (tw // BINARY_GRID, th // BINARY_GRID); a área do
+        descritor fica centralizada na janela do template.
+        """
+        th, tw = template_to_match.shape
+        grid = BINARY_GRID
+        cw, ch = tw // grid, th // grid
+        if cw < 1 or ch < 1:
+            return None
+
+        start = time.perf_counter()
+        maps = ctx['binary_maps'].get((cw, ch))
+        if maps is None:
+            # Calculado fora do lock (threads com outro tamanho de célula não esperam)
+            maps = sign_descriptor_maps(ctx['screen'], cw, ch, grid, BINARY_STRIDE)
+            with ctx['lock']:
+                maps = ctx['binary_maps'].setdefault((cw, ch), maps)
+
+        screen_h, screen_w = ctx['screen'].shape
+        dw, dh = cw * grid, ch * grid
+        distance = hamming_distance_map(maps, (screen_h - dh + 1, screen_w - dw + 1), cw, ch,
+                                        self._binary_bits(template_data, template_to_match), BINARY_STRIDE)
+
+        ox, oy = (tw - dw) // 2, (th - dh) // 2
+        distance = distance[oy:oy + screen_h - th + 1, ox:ox + screen_w - tw + 1]
+
+        with ctx['lock']:
+            ctx['binary']['ms'] += (time.perf_counter() - start) * 1000
+        return distance
+
+    def _template_sparse_points(self, template_to_match):
+        """Pontos característicos do template no tamanho de matching"""
+        return sparse_points(cv2.blur(template_to_match, (SPARSE_BLUR, SPARSE_BLUR)), SPARSE_POINTS)
+
+    def _sparse_points(self, template_data, template_to_match):
+        """Pontos característicos do template no tamanho de matching (montados ao publicar; só leitura aqui)"""
+        th, tw = template_to_match.shape
+        points = template_data.get('sparse', {}).get((tw, th))
+        if points is None:
+            points = self._template_sparse_points(template_to_match)
+        return points
+
+    def _sparse_valid(self, ctx, template_data, template_to_match):
+        """Janelas (tw x th) cujos pontos esparsos correlacionam com os do template"""
+        th, tw = template_to_match.shape
+        screen_h, screen_w = ctx['screen'].shape
+
+        start = time.perf_counter()
+        corr = sparse_correlation(ctx['sparse_phases'], self._sparse_points(template_data, template_to_match),
+                                  (screen_h - th + 1, screen_w - tw + 1), SPARSE_STRIDE)
+        valid = corr >= SPARSE_MIN_CORRELATION
+
+        with ctx['lock']:
+            ctx['sparse']['ms'] += (time.perf_counter() - start) * 1000
+        return valid
+
+    def _detect_parallel(self, ctx):
         """Detecta usando múltiplas threads"""
         detections = []
         futures = []
 
         # Submeter cada template para uma thread
-        for idx, template_data in enumerate(self.templates):
-            future = self.executor.submit(
-                self._match_template,
-                screen_roi,
-                template_data,
-                idx,
-                offset_x,
-                offset_y,
-                scale_back
-            )
+        for idx, template_data in enumerate(ctx['templates']):
+            future = self.executor.submit(self._match_template, ctx, template_data, idx)
             futures.append(future)
 
         # Coletar resultados
@@ -156,29 +798,63 @@ class TreeDetector:
 
         return detections
 
-    def _detect_sequential(self, screen_roi, offset_x, offset_y, scale_back):
+    def _detect_sequential(self, ctx):
         """Detecta sequencialmente (fallback)"""
         detections = []
 
-        for idx, template_data in enumerate(self.templates):
-            matches = self._match_template(
-                screen_roi,
-                template_data,
-                idx,
-                offset_x,
-                offset_y,
-                scale_back
-            )
-            detections.extend(matches)
+        for idx, template_data in enumerate(ctx['templates']):
+            detections.extend(self._match_template(ctx, template_data, idx))
 
         return detections
 
-    def _match_template(self, screen_roi, template_data, idx, offset_x, offset_y, scale_back):
+    def _window_maps(self, ctx, template_data, idx, scale, template_to_match):
+        """
+        Janelas aprovadas pelos pré-filtros ativos: [(nome, mapa booleano)]
+
+        Guardadas no ctx por (template, escala): as faixas do modo com prazo
+        reaproveitam o mesmo mapa.
+        """
+        window_maps = ctx['window_maps'].get((idx, scale))
+        if window_maps is not None:
+            return window_maps
+
+        th, tw = template_to_match.shape
+        window_maps = []
+        if USE_VARIANCE_PREFILTER:
+            window_maps.append(('variance', self._variance_valid(ctx, tw, th)))
+        if ctx.get('binary') is not None:
+            distance = self._binary_distance(ctx, template_data, template_to_match)
+            if distance is not None:
+                window_maps.append(('binary', distance <= BINARY_MAX_DISTANCE))
+        if ctx.get('sparse') is not None:
+            window_maps.append(('sparse', self._sparse_valid(ctx, template_data, template_to_match)))
+
+        ctx['window_maps'][(idx, scale)] = window_maps
+        return window_maps
+
+    def _prepare_window_maps(self, ctx, idx, scale):
+        """Monta os mapas dos pré-filtros de uma variante antes do matching (o modo com prazo mede à parte)"""
+        template_data = ctx['templates'][idx]
+        template_to_match = self._template_to_match(template_data[ctx['variants']][scale], ctx['scale_back'])
+        screen_h, screen_w = ctx['screen'].shape
+        if template_to_match is None or template_to_match.shape[0] > screen_h or template_to_match.shape[1] > screen_w:
+            ctx['window_maps'][(idx, scale)] = []
+            return
+        self._window_maps(ctx, template_data, idx, scale, template_to_match)
+
+    def _match_template(self, ctx, template_data, idx):
         """Faz template matching para um template específico"""
+        start = time.perf_counter()
         detections = []
 
+        screen_roi = ctx['screen']
+        scale_back = ctx['scale_back']
+        regions = ctx['regions']
+        if regions is None:
+            regions = [(0, 0, screen_roi.shape[1], screen_roi.shape[0])]
+
         # Usar templates pré-processados (cache)
-        for scale, resized_template in template_data['scaled'].items():
+        for scale, resized_template in template_data[ctx['variants']].items():
             w, h = resized_template.shape[1], resized_template.shape[0]
 
             # Verificar se template cabe na ROI
@@ -186,44 +862,175 @@ class TreeDetector:
                 continue
 
             # Aplicar downsample no template se necessário
-            if scale_back != 1.0:
-                w_scaled = int(w * (1.0 / scale_back))
-                h_scaled = int(h * (1.0 / scale_back))
-                if w_scaled < MIN_TEMPLATE_SIZE or h_scaled < MIN_TEMPLATE_SIZE:
+            template_to_match = self._template_to_match(resized_template, scale_back)
+            if template_to_match is None:
+                continue
+
+            tw, th = template_to_match.shape[1], template_to_match.shape[0]
+
+            # Pré-filtros de janela: só as aprovadas (textura, descritor binário, pontos esparsos)
+            # vão para o matching
+            window_maps = self._window_maps(ctx, template_data, idx, scale, template_to_match)
+
+            tile = VARIANCE_TILE if [name for name, _ in window_maps] == ['variance'] else PREFILTER_TILE
+
+            for rx, ry, rw, rh in regions:
+                # Região pequena demais para este template
+                if tw > rw or th > rh:
                     continue
-                template_to_match = cv2.resize(resized_template, (w_scaled, h_scaled))
-            else:
-                template_to_match = resized_template
 
-            # Template matching
-            result = cv2.matchTemplate(screen_roi, template_to_match, cv2.TM_CCOEFF_NORMED)
+                boxes = [(rx, ry, rw, rh, None)]
+
+                # Matching só nos blocos com janelas aprovadas: áreas podadas nunca são correlacionadas
+                if window_maps:
+                    approved = None
+                    for name, window_map in window_maps:
+                        passed = window_map[ry:ry + rh - th + 1, rx:rx + rw - tw + 1]
+                        with ctx['lock']:
+                            counters = ctx[name]
+                            counters['windows'] += passed.size
+                            counters['rejected'] += passed.size - int(np.count_nonzero(passed))
+                        approved = passed if approved is None else approved & passed
+
+                    boxes = [
+                        (rx + bx1, ry + by1, bx2 - bx1 + tw - 1, by2 - by1 + th - 1, approved[by1:by2, bx1:bx2])
+                        for bx1, by1, bx2, by2 in valid_boxes(approved, tile)
+                    ]
+
+                    # Blocos cobrindo quase a região inteira: uma correlação só (DFT) sai mais barato
+                    if sum(bw * bh for _, _, bw, bh, _ in boxes) > PREFILTER_MAX_TILED_AREA * rw * rh:
+                        boxes = [(rx, ry, rw, rh, approved)]
+
+                for bx, by, bw, bh, valid in boxes:
+                    # Template matching
+                    region = screen_roi[by:by + bh, bx:bx + bw]
+                    result = cv2.matchTemplate(region, template_to_match, cv2.TM_CCOEFF_NORMED)
+
+                    if valid is not None:
+                        result[~valid] = -1.0
+
+                    # Contar faixas de confiança no próprio mapa (barato, sem dicts)
+                    tier_counts = [int(np.count_nonzero(result >= tier)) for tier in ctx['tiers']]
+                    best = float(result.max())
+
+                    with ctx['lock']:
+                        scores = ctx['scores']
+                        scores['tiers'] = [a + b for a, b in zip(scores['tiers'], tier_counts)]
+                        scores['max'] = max(scores['max'], best)
+                        for name, _ in window_maps:
+                            ctx[name]['verified'] += result.size
+
+                    # Fusão: o mapa entra no mapa máximo do frame; os picos saem uma vez só no final
+                    if ctx['fusion'] is not None:
+                        self._fuse_scores(ctx, result, bx, by, tw, th, idx, scale)
+                        continue
+
+                    # Materializar só o que algum consumidor pediu
+                    locations = np.where(result >= ctx['materialize'])
+
+                    for pt in zip(*locations[::-1]):
+                        x, y = pt
+                        detections.append(self._make_detection(ctx, x + bx, y + by, tw, th, result[y, x], idx, scale))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with ctx['lock']:
+            template_stats = template_data['stats']
+            template_stats['match_ms'] += elapsed_ms
+            template_stats['calls'] += 1
+
+        return detections
+
+    def _template_to_match(self, resized_template, scale_back):
+        """Template no tamanho da imagem de matching (downsample), ou None se ficar pequeno demais"""
+        if scale_back == 1.0:
+            return resized_template
+
+        w_scaled = int(resized_template.shape[1] * (1.0 / scale_back))
+        h_scaled = int(resized_template.shape[0] * (1.0 / scale_back))
+        if w_scaled < MIN_TEMPLATE_SIZE or h_scaled < MIN_TEMPLATE_SIZE:
+            return None
+        return cv2.resize(resized_template, (w_scaled, h_scaled))
+
+    def _make_detection(self, ctx, x, y, tw, th, confidence, idx, scale):
+        """Dict da detecção a partir da janela (x, y, tw, th) na imagem de matching"""
+        scale_back = ctx['scale_back']
+
+        # Ajustar coordenadas (ROI + downsample)
+        return {
+            'x': int(x * scale_back) + ctx['offset_x'],
+            'y': int(y * scale_back) + ctx['offset_y'],
+            'w': int(tw * scale_back),
+            'h': int(th * scale_back),
+            'confidence': float(confidence),
+            'template_id': idx,
+            'scale': scale
+        }
+
+    def _fuse_scores(self, ctx, result, rx, ry, tw, th, idx, scale):
+        """
+        Combina um mapa de scores no mapa máximo do frame, ancorado no centro da janela
 
-            # Encontrar matches acima do threshold
-            locations = np.where(result >= self.similarity_threshold)
+        Templates de tamanhos diferentes ficam alinhados pelo centro da caixa; o
+        mapa de índices guarda qual variante (template, escala) venceu em cada pixel.
+        """
+        fusion = ctx['fusion']
+
+        with ctx['lock']:
+            start = time.perf_counter()
+
+            if fusion['score'] is None:
+                fusion['score'] = np.full(ctx['screen'].shape, -1.0, dtype=np.float32)
+                fusion['index'] = np.zeros(ctx['screen'].shape, dtype=np.int32)
+
+            key = (idx, scale, tw, th)
+            variant = fusion['ids'].get(key)
+            if variant is None:
+                variant = fusion['ids'][key] = len(fusion['variants'])
+                fusion['variants'].append(key)
+
+            cx, cy = rx + tw // 2, ry + th // 2
+            rh, rw = result.shape
+            score = fusion['score'][cy:cy + rh, cx:cx + rw]
+            better = result > score
+            np.copyto(score, result, where=better)
+            fusion['index'][cy:cy + rh, cx:cx + rw][better] = variant
+
+            fusion['ms'] += (time.perf_counter() - start) * 1000
+
+    def _fusion_peaks(self, ctx):
+        """Extrai os picos do mapa fundido (máximos locais na vizinhança de DUPLICATE_DISTANCE)"""
+        fusion = ctx['fusion']
+        if fusion['score'] is None:
+            return []
 
-            for pt in zip(*locations[::-1]):
-                x, y = pt
-                confidence = result[y, x]
+        start = time.perf_counter()
+        score = fusion['score']
 
-                # Ajustar coordenadas (ROI + downsample)
-                final_x = int(x * scale_back) + offset_x
-                final_y = int(y * scale_back) + offset_y
-                final_w = int(w * scale_back)
-                final_h = int(h * scale_back)
+        radius = max(1, int(DUPLICATE_DISTANCE / ctx['scale_back']))
+        kernel = np.ones((2 * radius - 1, 2 * radius - 1), dtype=np.uint8)
+        local_max = cv2.dilate(score, kernel)
 
-                detections.append({
-                    'x': final_x,
-                    'y': final_y,
-                    'w': final_w,
-                    'h': final_h,
-                    'confidence': float(confidence),
-                    'template_id': idx
-                })
+        ys, xs = np.nonzero((score >= ctx['materialize']) & (score >= local_max))
 
+        detections = []
+        for x, y in zip(xs, ys):
+            idx, scale, tw, th = fusion['variants'][fusion['index'][y, x]]
+            detections.append(self._make_detection(
+                ctx, x - tw // 2, y - th // 2, tw, th, score[y, x], idx, scale
+            ))
+
+        self.stats['fusion_ms'] = fusion['ms']
+        self.stats['fusion_peak_ms'] = (time.perf_counter() - start) * 1000
+        self.stats['fusion_peaks'] = len(detections)
         return detections
 
-    def _non_maximum_suppression(self, detections):
-        """Remove detecções duplicadas de forma eficiente"""
+    def _non_maximum_suppression(self, detections, support=None):
+        """
+        Remove detecções duplicadas de forma eficiente
+
+        Se `support` for uma lista, recebe para cada detecção mantida o conjunto
+        de templates que também a encontraram (usado na contabilidade por template).
+        """
         if not detections:
             return []
 
@@ -231,20 +1038,26 @@ class TreeDetector:
         detections.sort(key=lambda x: x['confidence'], reverse=True)
 
         kept = []
+        kept_support = []
 
         for det in detections:
             # Verificar se está muito próximo de alguma detecção já mantida
             is_duplicate = False
-            for kept_det in kept:
+            for i, kept_det in enumerate(kept):
                 dx = abs(det['x'] - kept_det['x'])
                 dy = abs(det['y'] - kept_det['y'])
 
                 if dx < DUPLICATE_DISTANCE and dy < DUPLICATE_DISTANCE:
                     is_duplicate = True
+                    kept_support[i].add(det['template_id'])
                     break
 
             if not is_duplicate:
                 kept.append(det)
+                kept_support.append({det['template_id']})
+
+        if support is not None:
+            support.extend(kept_support)
 
         return kept
 
@@ -260,39 +1073,39 @@ class TreeDetector:
             print("⚠️ Nenhuma imagem .png encontrada!")
             return
 
-        print(f"\n🔍 Carregando templates de: {self.save_folder}")
+        if self.verbose:
+            print(f"\n🔍 Carregando templates de: {self.save_folder}")
 
+        loaded = []
         for filename in sorted(files):
             filepath = os.path.join(self.save_folder, filename)
             try:
-                img = Image.open(filepath)
-                img_array = np.array(img)
+                # cv2.imdecode em vez de cv2.imread: aceita caminhos com acentos no Windows
+                img_bgr = cv2.imdecode(np.fromfile(filepath, dtype=np.uint8), cv2.IMREAD_COLOR)
+                if img_bgr is None:
+                    raise ValueError("imagem inválida")
 
                 # Converter para grayscale
-                if len(img_array.shape) == 3:
-                    img_gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-                else:
-                    img_gray = img_array
-
-                # Pré-processar
-                scaled_templates = self._preprocess_template(img_gray)
+                img_gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
 
-                self.templates.append({
-                    'image': img_gray,
-                    'scaled': scaled_templates,
-                    'size': img_gray.shape,
-                    'path': filepath
-                })
+                loaded.append(self._build_template(img_gray, filepath))
 
-                print(f"  ✅ {filename} → {img_gray.shape}")
+                if self.verbose:
+                    print(f"  ✅ {filename} → {img_gray.shape}")
 
             except Exception as e:
                 print(f"  ❌ Erro em {filename}: {e}")
 
+        self._publish_templates(lambda current: current + loaded)
+
+        if not self.verbose:
+            return
+
         print(f"\n📚 TOTAL: {len(self.templates)} templates carregados!")
         print(f"🎯 Threshold: {self.similarity_threshold}")
-        print(f"⚡ Threading: {'ATIVO' if USE_THREADING else 'DESATIVADO'}")
-        print(f"🎯 ROI: {'ATIVO' if USE_ROI else 'DESATIVADO'}")
+        print(f"⚡ Threading: {'ATIVO' if self.use_threading else 'DESATIVADO'}")
+        print(f"🎯 ROI: {'ADAPTATIVA' if ADAPTIVE_ROI else 'ATIVO' if USE_ROI else 'DESATIVADO'}")
+        print(f"🧠 Motor: {self.engine.name}")
         print(f"🚀 FPS Target: {FPS_TARGET}")
 
     def save_config(self):
@@ -301,14 +1114,20 @@ class TreeDetector:
             'num_templates': len(self.templates),
             'threshold': self.similarity_threshold,
             'scales': SCALES,
+            'locked_scale': self.calibrator.locked_scale if self.calibrator else None,
             'fps_target': FPS_TARGET,
             'use_roi': USE_ROI,
-            'use_threading': USE_THREADING
+            'use_threading': self.use_threading,
+            'engine': self.engine.name
         }
         with open(f"{self.save_folder}/config.json", 'w') as f:
             json.dump(config, f, indent=2)
 
     def cleanup(self):
         """Limpa recursos"""
+        # Streams não são donos do pool nem do banco
+        if self.shared:
+            return
         if self.executor:
             self.executor.shutdown(wait=False)
+        self.bank.close()
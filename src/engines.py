@@ -0,0 +1,566 @@
+"""
+Motores de detecção plugáveis do TreeDetector
+
+- 'template': template matching multi-escala (TM_CCOEFF_NORMED) - padrão
+- 'cascade': estágio barato em baixa resolução + verificação completa só na vizinhança
+- 'gradient': orientações de gradiente quantizadas e espalhadas (estilo LINE-MOD),
+  tolerante a iluminação (dia/noite) e pequenas deformações
+
+Experimental (só para comparação no benchmark, fora de DETECTION_ENGINE):
+- 'orb': keypoints ORB + verificação geométrica. Árvores de ~40px têm poucos
+  keypoints: em cena sintética 960x540 acha 37% das árvores (template: 100%)
+  e leva o dobro do tempo
+"""
+
+import time
+
+import cv2
+import numpy as np
+
+from src.config import *
+from src.prefilter import intersect_regions
+
+
+def _scale_back():
+    """Fator da imagem de matching de volta para a tela (mesma conta do TreeDetector.detect)"""
+    return 1.0 / DOWNSAMPLE_FACTOR if DOWNSAMPLE_FACTOR < 1.0 else 1.0
+
+
+class DetectionEngine:
+    """Interface dos motores de detecção"""
+
+    name = 'base'
+    verbose = True  # Avisos ao pré-processar templates (o detector passa o verbose dele)
+
+    def prepare_template(self, template_data):
+        """
+        Pré-processa um template ao carregar/adicionar (guarda dados no próprio dict)
+
+        Chamado num dict novo, antes de publicar; em detect() os dicts dos
+        templates são só leitura.
+        """
+
+    def detect(self, detector, ctx):
+        """Retorna detecções candidatas (antes do NMS) para o frame em ctx"""
+        raise NotImplementedError
+
+
+class TemplateMatchingEngine(DetectionEngine):
+    """Template matching por força bruta em cada escala de SCALES"""
+
+    name = 'template'
+
+    def detect(self, detector, ctx):
+        if detector.use_threading and detector.executor:
+            return detector._detect_parallel(ctx)
+        return detector._detect_sequential(ctx)
+
+
+class OrbEngine(DetectionEngine):
+    """
+    Detecção por keypoints ORB
+
+    - Descritores dos templates calculados uma vez no carregamento
+    - Uma extração de descritores por frame (restrita às regiões do pré-filtro)
+    - Matching Hamming + ratio test + transformação similar por RANSAC
+    - Confiança = correlação normalizada do recorte retificado com o template,
+      na mesma escala do motor de template matching (compatível com os thresholds)
+    - Templates com menos de ORB_MIN_TEMPLATE_KEYPOINTS keypoints (pequenos ou
+      lisos demais) vão por template matching, para não sumirem do resultado
+    """
+
+    name = 'orb'
+
+    def __init__(self):
+        self.orb = cv2.ORB_create(
+            nfeatures=ORB_FEATURES,
+            scaleFactor=1.2,
+            nlevels=ORB_LEVELS,
+            edgeThreshold=ORB_PATCH_SIZE,
+            patchSize=ORB_PATCH_SIZE,
+            fastThreshold=ORB_FAST_THRESHOLD
+        )
+        self.matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+
+    def prepare_template(self, template_data):
+        keypoints, descriptors = self.orb.detectAndCompute(template_data['image'], None)
+
+        if descriptors is None or len(keypoints) < ORB_MIN_TEMPLATE_KEYPOINTS:
+            if self.verbose:
+                print(f"⚠️ ORB: {template_data['path']} tem {len(keypoints)} keypoints "
+                      f"(mín. {ORB_MIN_TEMPLATE_KEYPOINTS}), usando template matching nele")
+            template_data['orb'] = None
+            return
+
+        points = np.float32([kp.pt for kp in keypoints])
+        template_data['orb'] = (points, descriptors)
+
+    def detect(self, detector, ctx):
+        screen = ctx['screen']
+
+        # Máscara com as regiões do pré-filtro de folhagem (se houver)
+        mask = None
+        if ctx['regions'] is not None:
+            mask = np.zeros(screen.shape, dtype=np.uint8)
+            for rx, ry, rw, rh in ctx['regions']:
+                mask[ry:ry + rh, rx:rx + rw] = 255
+
+        detections = []
+
+        # Templates sem keypoints suficientes: template matching normal
+        fallback = [idx for idx, template_data in enumerate(ctx['templates']) if template_data.get('orb') is None]
+        for idx in fallback:
+            detections.extend(detector._match_template(ctx, ctx['templates'][idx], idx))
+        detector.stats['orb_fallback'] = len(fallback)
+
+        frame_keypoints, frame_descriptors = self.orb.detectAndCompute(screen, mask)
+        if frame_descriptors is None or len(frame_keypoints) < ORB_MIN_MATCHES:
+            return detections
+
+        frame_points = np.float32([kp.pt for kp in frame_keypoints])
+
+        for idx, template_data in enumerate(ctx['templates']):
+            if template_data.get('orb') is None:
+                continue
+            detections.extend(self._match(
+                detector, ctx, template_data, idx, frame_points, frame_descriptors
+            ))
+
+        return detections
+
+    def _match(self, detector, ctx, template_data, idx, frame_points, frame_descriptors):
+        """Encontra até ORB_MAX_INSTANCES ocorrências de um template no frame"""
+        template_points, template_descriptors = template_data['orb']
+
+        # Frame → template: cada ocorrência no frame casa sozinha (no sentido contrário, várias
+        # árvores iguais empatam e o ratio test descarta todas)
+        pairs = self.matcher.knnMatch(frame_descriptors, template_descriptors, k=2)
+        good = [p[0] for p in pairs if len(p) == 2 and p[0].distance < ORB_RATIO * p[1].distance]
+
+        detections = []
+        for _ in range(ORB_MAX_INSTANCES):
+            if len(good) < ORB_MIN_MATCHES:
+                break
+
+            src = template_points[[m.trainIdx for m in good]]
+            dst = frame_points[[m.queryIdx for m in good]]
+
+            # Verificação geométrica: translação + rotação + escala uniforme
+            transform, inliers = cv2.estimateAffinePartial2D(
+                src, dst, method=cv2.RANSAC, ransacReprojThreshold=ORB_RANSAC_THRESHOLD
+            )
+            if transform is None:
+                break
+
+            inliers = inliers.ravel().astype(bool)
+            if inliers.sum() < ORB_MIN_MATCHES:
+                break
+
+            detection = self._verify(detector, ctx, template_data, idx, transform)
+            if detection:
+                detections.append(detection)
+
+            # Remover os inliers e procurar outra ocorrência do mesmo template
+            good = [m for m, is_inlier in zip(good, inliers) if not is_inlier]
+
+        return detections
+
+    def _verify(self, detector, ctx, template_data, idx, transform):
+        """
+        Retifica a área encontrada e mede a correlação com o template
+
+        Com poucos keypoints por árvore a posição do RANSAC erra alguns px: a
+        área retificada ganha ORB_REFINE_MARGIN px de cada lado e vale o melhor
+        encaixe do template dentro dela.
+        """
+        template = template_data['image']
+        th, tw = template.shape
+        screen = ctx['screen']
+
+        scale = float(np.hypot(transform[0, 0], transform[1, 0]))
+        if scale <= 0:
+            return None
+
+        # Trazer a área do frame (com margem) para o sistema de coordenadas do template
+        margin = ORB_REFINE_MARGIN
+        shifted = transform.copy()
+        shifted[:, 2] -= transform[:, :2] @ np.float64([margin, margin])
+        rectified = cv2.warpAffine(
+            screen, shifted, (tw + 2 * margin, th + 2 * margin),
+            flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP
+        )
+        result = cv2.matchTemplate(rectified, template, cv2.TM_CCOEFF_NORMED)
+        _, confidence, _, (bx, by) = cv2.minMaxLoc(result)
+
+        if confidence < ctx['materialize']:
+            return None
+
+        # Transformação com a origem no melhor encaixe
+        transform = transform.copy()
+        transform[:, 2] += transform[:, :2] @ np.float64([bx - margin, by - margin])
+
+        corners = np.float32([[0, 0], [tw, 0], [0, th], [tw, th]])
+        projected = corners @ transform[:, :2].T + transform[:, 2]
+        x1, y1 = np.floor(projected.min(axis=0)).astype(int)
+        x2, y2 = np.ceil(projected.max(axis=0)).astype(int)
+
+        if x1 < 0 or y1 < 0 or x2 > screen.shape[1] or y2 > screen.shape[0]:
+            return None
+
+        scale_back = ctx['scale_back']
+        return {
+            'x': int(x1 * scale_back) + ctx['offset_x'],
+            'y': int(y1 * scale_back) + ctx['offset_y'],
+            'w': int((x2 - x1) * scale_back),
+            'h': int((y2 - y1) * scale_back),
+            'confidence': confidence,
+            'template_id': idx,
+            'scale': scale * scale_back  # Escala do template na tela (sem o DOWNSAMPLE_FACTOR)
+        }
+
+
+class CascadeEngine(DetectionEngine):
+    """
+    Cascata em dois estágios
+
+    1. Proposta: poucos templates representativos em resolução reduzida
+       (CASCADE_STAGE1_FACTOR) com threshold baixo
+    2. Verificação: todos os templates, na resolução normal, apenas na
+       vizinhança de cada candidato (reaproveita o _match_template do detector)
+    """
+
+    name = 'cascade'
+
+    def __init__(self):
+        self._representatives = []
+        self._representatives_key = None
+
+    def _select_representatives(self, templates):
+        """
+        Escolhe CASCADE_STAGE1_TEMPLATES templates que cobrem o conjunto:
+        começa pelo mais parecido com todos (medoide) e adiciona sempre o
+        template menos parecido com os já escolhidos
+        """
+        key = tuple(t['path'] for t in templates)
+        if key == self._representatives_key:
+            return self._representatives
+
+        count = min(CASCADE_STAGE1_TEMPLATES, len(templates))
+        thumbs = []
+        for template_data in templates:
+            thumb = cv2.resize(template_data['image'], (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+            thumb = (thumb - thumb.mean()) / (thumb.std() + 1e-6)
+            thumbs.append(thumb.ravel())
+
+        thumbs = np.array(thumbs)
+        similarity = thumbs @ thumbs.T / thumbs.shape[1]
+
+        selected = [int(np.argmax(similarity.mean(axis=1)))]
+        while len(selected) < count:
+            coverage = similarity[:, selected].max(axis=1)
+            coverage[selected] = np.inf
+            selected.append(int(np.argmin(coverage)))
+
+        self._representatives = selected
+        self._representatives_key = key
+        return selected
+
+    def prepare_template(self, template_data):
+        template_data['cascade'] = self._build_stage1(template_data, CASCADE_STAGE1_FACTOR / _scale_back())
+
+    def _stage1_variants(self, template_data, factor):
+        """Variantes reduzidas do template para o estágio 1 (montadas ao publicar; só leitura aqui)"""
+        key = (tuple(template_data['scaled']), factor)
+        cached = template_data.get('cascade')
+        if cached and cached[0] == key:
+            return cached[1]
+        return self._build_stage1(template_data, factor)[1]
+
+    def _build_stage1(self, template_data, factor):
+        """(chave, variantes reduzidas) de cada escala de 'scaled'"""
+        variants = []
+        for resized_template in template_data['scaled'].values():
+            w = int(resized_template.shape[1] * factor)
+            h = int(resized_template.shape[0] * factor)
+            if w >= CASCADE_MIN_SIZE and h >= CASCADE_MIN_SIZE:
+                variants.append(cv2.resize(resized_template, (w, h), interpolation=cv2.INTER_AREA))
+
+        return (tuple(template_data['scaled']), factor), variants
+
+    def _propose(self, detector, ctx):
+        """Estágio 1: retorna centros candidatos (coordenadas da imagem de matching)"""
+        screen = ctx['screen']
+        factor = CASCADE_STAGE1_FACTOR
+        small = cv2.resize(screen, (int(screen.shape[1] * factor), int(screen.shape[0] * factor)),
+                           interpolation=cv2.INTER_AREA)
+
+        # Tamanho dos templates na imagem de matching = tamanho em escala * DOWNSAMPLE_FACTOR
+        variant_factor = factor / ctx['scale_back']
+
+        candidates = []
+        templates = ctx['templates']
+        for idx in self._select_representatives(templates):
+            for variant in self._stage1_variants(templates[idx], variant_factor):
+                h, w = variant.shape
+                if w > small.shape[1] or h > small.shape[0]:
+                    continue
+
+                result = cv2.matchTemplate(small, variant, cv2.TM_CCOEFF_NORMED)
+                ys, xs = np.where(result >= CASCADE_STAGE1_THRESHOLD)
+                for x, y in zip(xs, ys):
+                    candidates.append((float(result[y, x]), (x + w / 2) / factor, (y + h / 2) / factor))
+
+        # Centros fora das regiões pedidas (folhagem / ROI adaptativa) não ocupam vagas
+        allowed = ctx['regions']
+        if allowed is not None:
+            candidates = [c for c in candidates
+                          if any(rx <= c[1] < rx + rw and ry <= c[2] < ry + rh for rx, ry, rw, rh in allowed)]
+
+        # Manter os melhores candidatos, um por vizinhança
+        candidates.sort(reverse=True)
+        radius = DUPLICATE_DISTANCE / ctx['scale_back'] / 2
+        kept = []
+        for confidence, cx, cy in candidates:
+            if all(abs(cx - kx) >= radius or abs(cy - ky) >= radius for kx, ky in kept):
+                kept.append((cx, cy))
+                if len(kept) >= CASCADE_MAX_CANDIDATES:
+                    break
+
+        return kept
+
+    def detect(self, detector, ctx):
+        screen = ctx['screen']
+
+        stage1_start = time.perf_counter()
+        centers = self._propose(detector, ctx)
+        stage1_ms = (time.perf_counter() - stage1_start) * 1000
+
+        stage2_start = time.perf_counter()
+        detections = []
+        if centers:
+            # Vizinhança que comporta o maior template centralizado no candidato
+            max_w = max(max(v.shape[1] for v in t['scaled'].values()) for t in ctx['templates'] if t['scaled'])
+            max_h = max(max(v.shape[0] for v in t['scaled'].values()) for t in ctx['templates'] if t['scaled'])
+            half_w = int(max_w / ctx['scale_back'] / 2) + CASCADE_SEARCH_MARGIN
+            half_h = int(max_h / ctx['scale_back'] / 2) + CASCADE_SEARCH_MARGIN
+
+            regions = []
+            for cx, cy in centers:
+                x1 = max(0, int(cx) - half_w)
+                y1 = max(0, int(cy) - half_h)
+                x2 = min(screen.shape[1], int(cx) + half_w)
+                y2 = min(screen.shape[0], int(cy) + half_h)
+                regions.append((x1, y1, x2 - x1, y2 - y1))
+
+            # Verificar só a parte da vizinhança que também está nas regiões pedidas
+            if ctx['regions'] is not None:
+                regions = intersect_regions(regions, ctx['regions'])
+
+            stage2_ctx = dict(ctx, regions=regions)
+            if detector.use_threading and detector.executor:
+                detections = detector._detect_parallel(stage2_ctx)
+            else:
+                detections = detector._detect_sequential(stage2_ctx)
+
+        stage2_ms = (time.perf_counter() - stage2_start) * 1000
+
+        detector.stats['cascade_stage1_ms'] = stage1_ms
+        detector.stats['cascade_stage2_ms'] = stage2_ms
+        detector.stats['cascade_candidates'] = len(centers)
+        detector.stats['cascade_verified'] = len(detections)
+
+        return detections
+
+
+def _quantized_orientations(image):
+    """
+    Orientação do gradiente em GRADIENT_BINS faixas de 0-180° (sem sinal: claro→escuro
+    e escuro→claro são iguais) e magnitude em desvios-padrão da imagem
+
+    A iluminação (dia/noite) muda o contraste, não a orientação; dividir pelo
+    desvio-padrão deixa os thresholds de magnitude independentes do contraste.
+    """
+    blurred = cv2.GaussianBlur(image, (3, 3), 0)
+    gx = cv2.Sobel(blurred, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(blurred, cv2.CV_32F, 0, 1, ksize=3)
+    magnitude, angle = cv2.cartToPolar(gx, gy)
+    magnitude *= 1.0 / max(float(cv2.meanStdDev(image)[1][0, 0]), 1.0)
+    bins = (angle * (GRADIENT_BINS / np.pi)).astype(np.int32) % GRADIENT_BINS
+    return bins.astype(np.uint8), magnitude
+
+
+def _response_lut():
+    """LUT[orientação, máscara de orientações] = similaridade (4 = igual, 1 = vizinha, 0 = resto)"""
+    lut = np.zeros((GRADIENT_BINS, 1 << GRADIENT_BINS), dtype=np.uint8)
+    for orientation in range(GRADIENT_BINS):
+        for mask in range(1, 1 << GRADIENT_BINS):
+            best = 0
+            for b in range(GRADIENT_BINS):
+                if mask & (1 << b):
+                    distance = min((orientation - b) % GRADIENT_BINS, (b - orientation) % GRADIENT_BINS)
+                    best = max(best, 4 if distance == 0 else 1 if distance == 1 else 0)
+            lut[orientation, mask] = best
+    return lut
+
+
+class GradientEngine(DetectionEngine):
+    """
+    Matching por orientação de gradiente (LINE-MOD simplificado)
+
+    - Template: até GRADIENT_FEATURES pontos de borda forte e espalhados, cada um
+      com a orientação quantizada (calculado no carregamento, por escala)
+    - Frame: orientações quantizadas → espalhadas em GRADIENT_SPREAD x GRADIENT_SPREAD
+      (bitmask por pixel) → um mapa de resposta por orientação via LUT, uma vez por frame
+    - Score = soma das respostas nos pontos do template / máximo possível, avaliado
+      só a cada GRADIENT_SPREAD pixels (o espalhamento cobre os intermediários)
+
+    A confiança (fração dos pontos com orientação igual) usa os mesmos thresholds
+    dos outros motores.
+    """
+
+    name = 'gradient'
+
+    def __init__(self):
+        self.lut = _response_lut()
+
+    def prepare_template(self, template_data):
+        template_data['gradient'] = self._build_features(template_data, 1.0 / _scale_back())
+
+    def _extract(self, template):
+        """Pontos (dx, dy, orientação) de borda forte, espaçados pelo menos GRADIENT_SPREAD / 2"""
+        bins, magnitude = _quantized_orientations(template)
+        h, w = template.shape
+
+        ys, xs = np.where(magnitude >= GRADIENT_TEMPLATE_MAGNITUDE)
+        order = np.argsort(magnitude[ys, xs])[::-1]
+
+        min_distance = max(1, GRADIENT_SPREAD // 2)
+        taken = np.zeros((h // min_distance + 1, w // min_distance + 1), dtype=bool)
+        features = []
+        for i in order:
+            x, y = int(xs[i]), int(ys[i])
+            cell = (y // min_distance, x // min_distance)
+            if taken[cell]:
+                continue
+            taken[cell] = True
+            features.append((x, y, int(bins[y, x])))
+            if len(features) >= GRADIENT_FEATURES:
+                break
+
+        return np.array(features, dtype=np.int32).reshape(-1, 3)
+
+    def _features(self, template_data, factor):
+        """Pontos de cada escala de 'scaled' na resolução de matching (montados ao publicar; só leitura aqui)"""
+        key = (tuple(template_data['scaled']), factor)
+        cached = template_data.get('gradient')
+        if cached and cached[0] == key:
+            return cached[1]
+        return self._build_features(template_data, factor)[1]
+
+    def _build_features(self, template_data, factor):
+        """(chave, pontos por escala) de 'scaled' na resolução de matching"""
+        variants = {}
+        for scale, resized_template in template_data['scaled'].items():
+            w = int(resized_template.shape[1] * factor)
+            h = int(resized_template.shape[0] * factor)
+            if w < MIN_TEMPLATE_SIZE or h < MIN_TEMPLATE_SIZE:
+                continue
+            template = cv2.resize(resized_template, (w, h)) if factor != 1.0 else resized_template
+            features = self._extract(template)
+            if len(features) >= GRADIENT_MIN_FEATURES:
+                variants[scale] = (features, w, h)
+
+        return (tuple(template_data['scaled']), factor), variants
+
+    def _response_maps(self, screen):
+        """Mapas de resposta (GRADIENT_BINS x H x W, uint8) do frame inteiro"""
+        bins, magnitude = _quantized_orientations(screen)
+        bitmask = np.where(magnitude >= GRADIENT_MIN_MAGNITUDE, np.left_shift(1, bins), 0).astype(np.uint8)
+
+        # Espalhar: cada pixel recebe as orientações da janela T x T à sua direita/abaixo
+        spread = bitmask.copy()
+        h, w = bitmask.shape
+        for dy in range(GRADIENT_SPREAD):
+            for dx in range(GRADIENT_SPREAD):
+                if dx or dy:
+                    spread[:h - dy, :w - dx] |= bitmask[dy:, dx:]
+
+        return np.stack([self.lut[o][spread] for o in range(GRADIENT_BINS)])
+
+    def _match(self, detector, ctx, template_data, idx, factor):
+        start = time.perf_counter()
+        responses = ctx['gradient_responses']
+        screen_h, screen_w = ctx['screen'].shape
+        regions = ctx['regions'] or [(0, 0, screen_w, screen_h)]
+        step = GRADIENT_SPREAD
+
+        detections = []
+        for scale, (features, tw, th) in self._features(template_data, factor).items():
+            max_score = 4.0 * len(features)
+            threshold = ctx['materialize'] * max_score
+
+            for rx, ry, rw, rh in regions:
+                nx = (rw - tw) // step + 1
+                ny = (rh - th) // step + 1
+                if nx <= 0 or ny <= 0:
+                    continue
+
+                # Score só na grade de passo T (memória "linearizada" do LINE-MOD)
+                score = np.zeros((ny, nx), dtype=np.uint16)
+                for fx, fy, orientation in features:
+                    x0, y0 = rx + fx, ry + fy
+                    score += responses[orientation, y0:y0 + ny * step:step, x0:x0 + nx * step:step]
+
+                # Picos locais acima do threshold de materialização
+                peaks = (score >= threshold) & (score == cv2.dilate(score, np.ones((3, 3), np.uint8)))
+                for gy, gx in zip(*np.nonzero(peaks)):
+                    detections.append(detector._make_detection(
+                        ctx, rx + gx * step, ry + gy * step, tw, th, score[gy, gx] / max_score, idx, scale
+                    ))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with ctx['lock']:
+            template_data['stats']['match_ms'] += elapsed_ms
+            template_data['stats']['calls'] += 1
+        return detections
+
+    def detect(self, detector, ctx):
+        response_start = time.perf_counter()
+        ctx['gradient_responses'] = self._response_maps(ctx['screen'])
+        detector.stats['gradient_response_ms'] = (time.perf_counter() - response_start) * 1000
+
+        # Pontos dos templates na resolução de matching (a escala do template já vem de 'scaled')
+        factor = 1.0 / ctx['scale_back']
+        templates = ctx['templates']
+        if detector.use_threading and detector.executor:
+            futures = [detector.executor.submit(self._match, detector, ctx, t, idx, factor)
+                       for idx, t in enumerate(templates)]
+            return [det for future in futures for det in future.result()]
+
+        detections = []
+        for idx, template_data in enumerate(templates):
+            detections.extend(self._match(detector, ctx, template_data, idx, factor))
+        return detections
+
+
+ENGINES = {
+    TemplateMatchingEngine.name: TemplateMatchingEngine,
+    CascadeEngine.name: CascadeEngine,
+    GradientEngine.name: GradientEngine,
+}
+
+# Motores que só o benchmark cria (recall muito abaixo do template matching)
+EXPERIMENTAL_ENGINES = {
+    OrbEngine.name: OrbEngine,
+}
+
+
+def create_engine(name, experimental=False):
+    """Cria um motor de detecção pelo nome (experimental=True aceita também os experimentais)"""
+    if name in ENGINES:
+        return ENGINES[name]()
+    if name in EXPERIMENTAL_ENGINES:
+        if experimental:
+            return EXPERIMENTAL_ENGINES[name]()
+        raise ValueError(f"Motor '{name}' é experimental: só no benchmark (opções: {', '.join(ENGINES)})")
+    raise ValueError(f"Motor de detecção desconhecido: {name} (opções: {', '.join(ENGINES)})")
@@ -0,0 +1,191 @@
+"""
+Barramento de eventos de detecção
+
+A thread de detecção publica as detecções de cada frame; o barramento
+transforma isso em eventos de borda ("árvore apareceu", "árvore sumiu")
+com debounce e limite de taxa, e uma única thread despachante entrega
+os eventos aos assinantes (som, log, callbacks).
+"""
+
+import queue
+import threading
+import time
+
+from src.config import *
+from src.tracking import Tracker
+
+TREE_APPEARED = 'tree_appeared'
+TREE_LOST = 'tree_lost'
+
+
+class DetectionEventBus:
+    """Gera eventos de borda por árvore e despacha numa thread de longa duração"""
+
+    def __init__(self, appear_frames=EVENT_APPEAR_FRAMES, lost_frames=EVENT_LOST_FRAMES,
+                 max_events_per_second=EVENT_RATE_LIMIT, queue_size=EVENT_QUEUE_SIZE):
+        self.appear_frames = appear_frames
+        self.tracker = Tracker(max_misses=lost_frames, prefix='tree')
+        self.announced = set()  # tracks que já emitiram TREE_APPEARED
+
+        # Limite de taxa (token bucket)
+        self.max_events_per_second = max_events_per_second
+        self._tokens = float(max_events_per_second)
+        self._last_refill = time.monotonic()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.subscribers = []  # (handler, tipos ou None)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+        self.emitted = 0
+        self.delivered = 0
+        self.dropped = 0  # fila cheia ou acima do limite de taxa
+        self.errors = 0
+
+    def subscribe(self, handler, kinds=None):
+        """
+        Registra um assinante: callable(event) ou objeto com handle(event)
+
+        kinds limita os tipos de evento recebidos (None = todos)
+        """
+        handle = getattr(handler, 'handle', handler)
+        with self._lock:
+            self.subscribers.append((handle, set(kinds) if kinds else None))
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._dispatch_loop, name='event-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._running = False
+        try:
+            self.queue.put_nowait(None)  # acordar o despachante
+        except queue.Full:
+            pass
+        if self._thread:
+            self._thread.join(timeout)
+
+    def reset(self):
+        """Esquece as árvores rastreadas (ex.: ao pausar a detecção)"""
+        self.tracker.reset()
+        self.announced.clear()
+
+    def publish_frame(self, detections, timestamp=None):
+        """Atualiza o estado com as detecções do frame e emite eventos de borda"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        assigned, removed = self.tracker.update(detections)
+
+        for track_id, det in assigned:
+            track = self.tracker.tracks[track_id]
+            if track_id not in self.announced and track['hits'] >= self.appear_frames:
+                self.announced.add(track_id)
+                self._emit({'type': TREE_APPEARED, 'track_id': track_id,
+                            'detection': det, 'time': timestamp})
+
+        for track_id, track in removed:
+            if track_id in self.announced:
+                self.announced.discard(track_id)
+                self._emit({'type': TREE_LOST, 'track_id': track_id,
+                            'detection': track['det'], 'time': timestamp})
+
+    def _take_token(self):
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.max_events_per_second),
+            self._tokens + (now - self._last_refill) * self.max_events_per_second
+        )
+        self._last_refill = now
+        if self._tokens < 1.0:
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def _emit(self, event):
+        """Enfileira sem bloquear a thread de detecção (descarta se não couber)"""
+        if not self._take_token():
+            self.dropped += 1
+            return
+        try:
+            self.queue.put_nowait(event)
+            self.emitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _dispatch_loop(self):
+        while self._running:
+            event = self.queue.get()
+            if event is None:
+                continue
+
+            with self._lock:
+                subscribers = list(self.subscribers)
+
+            for handle, kinds in subscribers:
+                if kinds is not None and event['type'] not in kinds:
+                    continue
+                try:
+                    handle(event)
+                    self.delivered += 1
+                except Exception as e:
+                    self.errors += 1
+                    print(f"⚠️ Erro no assinante de eventos: {e}")
+
+    def stats(self):
+        return {
+            'queue_depth': self.queue.qsize(),
+            'emitted': self.emitted,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'tracked': len(self.tracker.tracks)
+        }
+
+
+class SoundSubscriber:
+    """
+    Beep quando uma árvore aparece (com intervalo mínimo entre beeps)
+
+    Usa winsound no Windows; em outros sistemas cai para o sino do terminal
+    ou fica mudo (fallback='silent').
+    """
+
+    def __init__(self, frequency=1000, duration_ms=100, min_interval=EVENT_SOUND_MIN_INTERVAL,
+                 fallback='bell'):
+        self.frequency = frequency
+        self.duration_ms = duration_ms
+        self.min_interval = min_interval
+        self.fallback = fallback
+        self._last_beep = 0.0
+
+        try:
+            import winsound
+            self._beep = lambda: winsound.Beep(self.frequency, self.duration_ms)
+        except ImportError:
+            self._beep = self._fallback_beep
+
+    def _fallback_beep(self):
+        if self.fallback == 'bell':
+            print('\a', end='', flush=True)
+
+    def handle(self, event):
+        now = time.monotonic()
+        if now - self._last_beep < self.min_interval:
+            return
+        self._last_beep = now
+        self._beep()
+
+
+class LogSubscriber:
+    """Imprime os eventos no console"""
+
+    def handle(self, event):
+        det = event['detection']
+        if event['type'] == TREE_APPEARED:
+            print(f"🌳 Árvore {event['track_id']} apareceu em ({det['x']}, {det['y']}) "
+                  f"- {det['confidence']:.0%}")
+        elif event['type'] == TREE_LOST:
+            print(f"💨 Árvore {event['track_id']} sumiu")
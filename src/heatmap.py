@@ -0,0 +1,170 @@
+"""
+ROI adaptativa guiada por mapa de calor das detecções
+
+Cada detecção aquece as células da tela que a caixa cobre; o calor decai a
+cada frame. As células quentes (dilatadas por uma margem para acompanhar o
+movimento) viram até ADAPTIVE_ROI_MAX_REGIONS regiões de busca. De tempos em
+tempos (ou quando não há nada quente) o frame inteiro é varrido para
+descobrir árvores novas - e esses frames medem quantas detecções as regiões
+adaptativas teriam perdido.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+
+def _merge_closest(boxes, max_boxes):
+    """Une os pares de caixas (x1, y1, x2, y2) que menos aumentam a área até sobrar max_boxes"""
+    boxes = list(boxes)
+    while len(boxes) > max_boxes:
+        best = None
+        for i in range(len(boxes)):
+            for j in range(i + 1, len(boxes)):
+                a, b = boxes[i], boxes[j]
+                union = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                growth = (_area(union) - _area(a) - _area(b))
+                if best is None or growth < best[0]:
+                    best = (growth, i, j, union)
+        _, i, j, union = best
+        boxes = [box for k, box in enumerate(boxes) if k not in (i, j)] + [union]
+    return boxes
+
+
+def _area(box):
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _contains(box, det):
+    """Detecção inteira dentro da caixa (x1, y1, x2, y2)?"""
+    return (det['x'] >= box[0] and det['y'] >= box[1]
+            and det['x'] + det['w'] <= box[2] and det['y'] + det['h'] <= box[3])
+
+
+class AdaptiveROI:
+    """Mapa de calor com decaimento + planejamento das regiões de busca de cada frame"""
+
+    def __init__(self, cell=HEATMAP_CELL, decay=HEATMAP_DECAY, min_heat=HEATMAP_MIN_HEAT,
+                 margin=ADAPTIVE_ROI_MARGIN, max_regions=ADAPTIVE_ROI_MAX_REGIONS,
+                 explore_every=ADAPTIVE_ROI_EXPLORE_EVERY):
+        self.cell = cell
+        self.decay = decay
+        self.min_heat = min_heat
+        self.margin = margin
+        self.max_regions = max_regions
+        self.explore_every = explore_every
+
+        self.heat = None
+        self.frames_since_explore = 0
+
+        # Plano do frame atual
+        self.exploring = True
+        self.regions = []  # Regiões quentes (x1, y1, x2, y2) em coordenadas da tela
+
+        # Contadores para o relatório
+        self.frames = 0
+        self.explorations = 0
+        self.pixels_processed = 0
+        self.pixels_base = 0
+        self.last_pixel_fraction = 1.0
+        self.explore_detections = 0
+        self.missed = 0
+
+    def reset(self):
+        """Esquece o mapa de calor (ex.: troca de mapa ou resolução)"""
+        self.heat = None
+        self.frames_since_explore = 0
+
+    def _hot_regions(self, base):
+        """Regiões quentes, com margem e cortadas à base"""
+        if self.heat is None:
+            return []
+
+        mask = (self.heat >= self.min_heat).astype(np.uint8)
+        if not mask.any():
+            return []
+
+        grow = math.ceil(self.margin / self.cell)
+        if grow > 0:
+            mask = cv2.dilate(mask, np.ones((2 * grow + 1, 2 * grow + 1), np.uint8))
+
+        count, _, cells, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        bx1, by1, bx2, by2 = base
+        boxes = []
+        for cx, cy, cw, ch, _ in cells[1:count]:
+            box = (max(bx1, int(cx) * self.cell), max(by1, int(cy) * self.cell),
+                   min(bx2, int(cx + cw) * self.cell), min(by2, int(cy + ch) * self.cell))
+            if box[2] > box[0] and box[3] > box[1]:
+                boxes.append(box)
+
+        return _merge_closest(boxes, self.max_regions)
+
+    def plan(self, screen_shape, base=None):
+        """
+        Decide a busca do frame: retorna (recorte, regiões)
+
+        recorte = retângulo (x1, y1, x2, y2) a recortar da tela; regiões = lista de
+        retângulos dentro dele, ou None para varrer o recorte inteiro (exploração)
+        """
+        h, w = screen_shape[:2]
+        base = tuple(base) if base else (0, 0, w, h)
+
+        grid_shape = (math.ceil(h / self.cell), math.ceil(w / self.cell))
+        if self.heat is None or self.heat.shape != grid_shape:
+            self.heat = np.zeros(grid_shape, dtype=np.float32)
+
+        self.regions = self._hot_regions(base)
+        self.exploring = not self.regions or self.frames_since_explore >= self.explore_every
+
+        base_area = _area(base)
+        processed = base_area if self.exploring else sum(_area(r) for r in self.regions)
+
+        self.frames += 1
+        self.pixels_base += base_area
+        self.pixels_processed += processed
+        self.last_pixel_fraction = processed / base_area if base_area else 1.0
+
+        if self.exploring:
+            self.explorations += 1
+            self.frames_since_explore = 0
+            return base, None
+
+        self.frames_since_explore += 1
+        crop = (min(r[0] for r in self.regions), min(r[1] for r in self.regions),
+                max(r[2] for r in self.regions), max(r[3] for r in self.regions))
+        return crop, list(self.regions)
+
+    def update(self, detections):
+        """Aquece as células das detecções do frame (e mede perdas nos frames de exploração)"""
+        if self.heat is None:
+            return
+
+        self.heat *= self.decay
+
+        rows, cols = self.heat.shape
+        for det in detections:
+            x1 = max(0, det['x'] // self.cell)
+            y1 = max(0, det['y'] // self.cell)
+            x2 = min(cols, (det['x'] + det['w'] - 1) // self.cell + 1)
+            y2 = min(rows, (det['y'] + det['h'] - 1) // self.cell + 1)
+            self.heat[y1:y2, x1:x2] += det['confidence']
+
+        # Exploração com regiões quentes: o que elas teriam deixado escapar?
+        if self.exploring and self.regions:
+            self.explore_detections += len(detections)
+            self.missed += sum(1 for det in detections
+                               if not any(_contains(box, det) for box in self.regions))
+
+    def stats(self):
+        return {
+            'regions': 0 if self.exploring else len(self.regions),
+            'exploring': self.exploring,
+            'pixel_fraction': self.last_pixel_fraction,
+            'avg_pixel_fraction': self.pixels_processed / self.pixels_base if self.pixels_base else 1.0,
+            'explorations': self.explorations,
+            'missed_rate': self.missed / self.explore_detections if self.explore_detections else 0.0
+        }
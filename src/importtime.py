@@ -0,0 +1,95 @@
+"""
+Benchmark de tempo de importação (cold start) baseado em `python -X importtime`
+
+Cada alvo é importado num processo novo; o relatório mostra o tempo total de
+importação, o tempo de parede do processo e os módulos mais pesados.
+
+Uso:
+    python -m src.importtime                       # núcleo vs. overlay (o antigo `import src`)
+    python -m src.importtime src.detector src.scan --top 15
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+# `import src` antes carregava o overlay inteiro (tkinter, keyboard, PIL, winsound)
+DEFAULT_TARGETS = ['src', 'src.detector', 'src.overlay']
+
+
+def parse_importtime(stderr):
+    """Linhas do -X importtime → [(módulo, profundidade, self_us, cumulativo_us)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3:
+            continue
+        name = fields[2][1:]  # Depois do espaço, a indentação indica quem importou quem
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(fields[0]), int(fields[1])))
+    return entries
+
+
+def measure(target, python=sys.executable):
+    """Importa `target` num interpretador novo e mede"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {target}'],
+        capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    entries = parse_importtime(proc.stderr)
+    error = None
+    if proc.returncode != 0:
+        lines = [line for line in proc.stderr.splitlines() if not line.startswith('import time:')]
+        error = lines[-1] if lines else f"código {proc.returncode}"
+
+    return {
+        'target': target,
+        'wall_ms': wall_ms,
+        'import_ms': sum(self_us for _, _, self_us, _ in entries) / 1000,
+        'modules': len(entries),
+        'entries': entries,
+        'error': error
+    }
+
+
+def heaviest(entries, target, top):
+    """Módulos importados diretamente (profundidade 0 ou 1) com maior tempo cumulativo, sem o próprio alvo"""
+    modules = {}
+    for name, depth, _, cumulative in entries:
+        if depth <= 1 and name != target:
+            modules[name] = max(modules.get(name, 0), cumulative)
+    return sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.importtime',
+                                     description='Tempo de importação a frio dos módulos do pacote')
+    parser.add_argument('targets', nargs='*', default=DEFAULT_TARGETS)
+    parser.add_argument('--top', type=int, default=8, help='Módulos mais pesados por alvo')
+    parser.add_argument('--runs', type=int, default=3, help='Repetições (mostra a mediana)')
+    args = parser.parse_args(argv)
+
+    results = []
+    for target in args.targets:
+        runs = sorted((measure(target) for _ in range(args.runs)), key=lambda r: r['wall_ms'])
+        results.append(runs[len(runs) // 2])
+
+    print(f"\n{'Alvo':<20}{'import':>10}{'processo':>11}{'módulos':>9}")
+    for r in results:
+        status = f"  ❌ {r['error']}" if r['error'] else ''
+        print(f"{r['target']:<20}{r['import_ms']:>8.1f}ms{r['wall_ms']:>9.1f}ms{r['modules']:>9}{status}")
+
+    for r in results:
+        print(f"\n📦 {r['target']} - mais pesados:")
+        for name, cumulative in heaviest(r['entries'], r['target'], args.top):
+            print(f"  {cumulative / 1000:>7.1f}ms  {name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+Vários clientes do jogo num processo só
+
+Um único runtime atende N regiões da tela (uma por janela do jogo) ou
+gravações: banco de templates, motor e pool de threads são compartilhados
+(TreeDetector.stream()); cada cliente tem seu FPS alvo, ROI adaptativa, jobs
+com prazo e estatísticas.
+
+Escalonamento justo: o próximo frame é sempre do cliente com o prazo mais
+antigo (EDF, prazo = último prazo + 1/FPS alvo). Com CPU sobrando todos
+atingem o alvo; sem, a divisão é max-min: quem pede menos que a parte justa
+recebe o que pediu e os outros dividem o resto por igual. O atraso acumulado
+vira frames pulados (não uma fila crescente).
+
+Uso:
+    python -m src.multiclient --client esq=0,0,960,1040 --client dir=960,0,1920,1040@20
+    python -m src.multiclient --client a=gameplay.mp4 --client b=synthetic:960x540:8:300 --duration 20
+"""
+
+import argparse
+import re
+import threading
+import time
+from collections import deque
+
+from src.config import *
+
+REGION_PATTERN = re.compile(r'^\d+,\d+,\d+,\d+$')
+
+
+def screen_source(bbox):
+    """Captura uma região (x1, y1, x2, y2) da tela a cada chamada"""
+    from PIL import ImageGrab
+
+    def grab():
+        return ImageGrab.grab(bbox=bbox)
+    return grab
+
+
+def file_source(path, every=1):
+    """
+    Frames de vídeo, pasta, gravação .ring ou synthetic:... (None quando acabar)
+
+    O primeiro frame é lido já aqui: read.shape é o tamanho dele (None se a fonte estiver vazia).
+    read.roi é a ROI na tela do último frame lido quando ele já é esse recorte (gravação .ring).
+    """
+    from src.scan import iter_frames
+
+    frames = iter_frames(path, 0, every)
+    first = next(frames, None)
+    pending = [first] if first is not None else []
+
+    def read():
+        item = pending.pop() if pending else next(frames, None)
+        if item is None:
+            return None
+        read.roi = item[3]
+        return item[2]
+
+    read.shape = pending[0][2].shape if pending else None
+    read.roi = pending[0][3] if pending else None
+    return read
+
+
+class Client:
+    """Um cliente (janela/região ou gravação) atendido pelo runtime"""
+
+    def __init__(self, name, source, detector, fps=FPS_TARGET, offset=(0, 0), custom_roi=None, on_result=None):
+        self.name = name
+        self.source = source
+        self.detector = detector
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.offset = offset
+        self.custom_roi = custom_roi
+        self.on_result = on_result
+
+        self.active = True
+        self.next_due = time.perf_counter()
+
+        self.frames = 0
+        self.skipped = 0  # Frames que o cliente perdeu por falta de CPU
+        self.busy_ms = 0.0
+        self.capture_ms = 0.0
+        self.detect_ms = 0.0
+        self.last_detections = 0
+        self.frame_starts = deque(maxlen=int(fps * 2) + 2)
+
+    def stats(self):
+        window = self.frame_starts
+        span = window[-1] - window[0] if len(window) > 1 else 0.0
+        return {
+            'name': self.name,
+            'target_fps': self.fps,
+            'fps': (len(window) - 1) / span if span > 0 else 0.0,
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'avg_capture_ms': self.capture_ms / self.frames if self.frames else 0.0,
+            'avg_detect_ms': self.detect_ms / self.frames if self.frames else 0.0,
+            'busy_ms': self.busy_ms,
+            'detections': self.last_detections,
+            'active': self.active
+        }
+
+
+class MultiClientRuntime:
+    """Escalona os frames de vários clientes sobre um TreeDetector compartilhado"""
+
+    def __init__(self, detector):
+        self.detector = detector
+        self.clients = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self.running = False
+        self.started_at = None
+
+    def add_client(self, name, source, fps=FPS_TARGET, offset=(0, 0), custom_roi=None, on_result=None):
+        """Registra um cliente; source() devolve o próximo frame (ou None quando acabar)"""
+        client = Client(name, source, self.detector.stream(), fps, offset, custom_roi, on_result)
+        with self._lock:
+            self.clients.append(client)
+        return client
+
+    def remove_client(self, name):
+        with self._lock:
+            self.clients = [c for c in self.clients if c.name != name]
+
+    def _next_client(self, now):
+        """Cliente ativo com o prazo mais antigo (None se não sobrou nenhum)"""
+        with self._lock:
+            active = [c for c in self.clients if c.active]
+        if not active:
+            return None
+        return min(active, key=lambda c: c.next_due)
+
+    def step(self):
+        """
+        Processa um frame do próximo cliente (espera até o prazo dele)
+
+        Retorna False quando não há mais clientes ativos.
+        """
+        client = self._next_client(time.perf_counter())
+        if client is None:
+            return False
+
+        wait = client.next_due - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+
+        start = time.perf_counter()
+
+        # Atrasado mais de um período: pula os frames perdidos em vez de acumular
+        lag = start - client.next_due
+        if lag > client.period:
+            missed = int(lag / client.period)
+            client.skipped += missed
+            client.next_due += missed * client.period
+        client.next_due += client.period
+
+        frame = client.source()
+        if frame is None:
+            client.active = False
+            return True
+        captured = time.perf_counter()
+
+        deadline = captured + DEADLINE_BUDGET_MS / 1000 if USE_DEADLINE else None
+        roi = getattr(client.source, 'roi', None)
+        if roi is not None:
+            # Frame gravado já é o recorte da ROI: busca nele inteiro e soma a origem dela
+            from src.scan import detect_frame
+            detections = detect_frame(client.detector, frame, roi, deadline=deadline)
+        else:
+            detections = client.detector.detect(frame, custom_roi=client.custom_roi, deadline=deadline)
+        done = time.perf_counter()
+
+        # Detecções em coordenadas da tela
+        if client.offset != (0, 0):
+            for det in detections:
+                det['x'] += client.offset[0]
+                det['y'] += client.offset[1]
+
+        client.frames += 1
+        client.capture_ms += (captured - start) * 1000
+        client.detect_ms += (done - captured) * 1000
+        client.busy_ms += (done - start) * 1000
+        client.last_detections = len(detections)
+        client.frame_starts.append(start)
+
+        if client.on_result:
+            client.on_result(client, detections)
+        return True
+
+    def run(self, duration=None, report_every=None):
+        """Roda até todos os clientes acabarem, `duration` segundos ou stop()"""
+        self.running = True
+        self.started_at = time.perf_counter()
+        last_report = self.started_at
+
+        while self.running and self.step():
+            now = time.perf_counter()
+            if duration is not None and now - self.started_at >= duration:
+                break
+            if report_every and now - last_report >= report_every:
+                last_report = now
+                print_stats(self.stats(), now - self.started_at)
+
+        self.running = False
+
+    def start(self, **kwargs):
+        """Roda em uma thread própria"""
+        self._thread = threading.Thread(target=self.run, kwargs=kwargs, name='multiclient', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def stats(self):
+        with self._lock:
+            return [c.stats() for c in self.clients]
+
+
+def print_stats(rows, elapsed):
+    total_busy = sum(r['busy_ms'] for r in rows)
+    print(f"\n⏱️ {elapsed:.1f}s | CPU do runtime ocupada {total_busy / max(elapsed * 1000, 1e-6):.0%}")
+    print(f"{'cliente':<12}{'alvo':>6}{'FPS':>7}{'frames':>8}{'pulados':>9}"
+          f"{'captura':>9}{'detecção':>10}{'parcela':>9}{'árvores':>9}")
+    for r in rows:
+        share = r['busy_ms'] / total_busy if total_busy else 0.0
+        status = '' if r['active'] else '  (fim)'
+        print(f"{r['name'][:11]:<12}{r['target_fps']:>6.0f}{r['fps']:>7.1f}{r['frames']:>8}{r['skipped']:>9}"
+              f"{r['avg_capture_ms']:>7.1f}ms{r['avg_detect_ms']:>8.1f}ms{share:>9.0%}{r['detections']:>9}{status}")
+
+
+def parse_client(spec):
+    """'nome=ORIGEM[@fps]' → (nome, origem, fps); ORIGEM = x1,y1,x2,y2 da tela ou arquivo/synthetic:..."""
+    name, sep, source = spec.partition('=')
+    if not sep or not name or not source:
+        raise argparse.ArgumentTypeError(f"Cliente inválido: {spec} (use nome=ORIGEM[@fps])")
+
+    fps = FPS_TARGET
+    head, sep, tail = source.rpartition('@')
+    if sep and re.fullmatch(r'\d+(\.\d+)?', tail):
+        source, fps = head, float(tail)
+
+    return name, source, fps
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.multiclient',
+                                     description='Detecção para vários clientes do jogo num processo só')
+    parser.add_argument('--client', action='append', type=parse_client, required=True, metavar='NOME=ORIGEM[@FPS]',
+                        help='Região da tela (x1,y1,x2,y2) ou vídeo/pasta/.ring/synthetic:...; repetir por cliente')
+    parser.add_argument('--duration', type=float, default=None, help='Segundos (padrão: até as fontes acabarem)')
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    parser.add_argument('--engine', default=DETECTION_ENGINE)
+    parser.add_argument('--full-frame', action='store_true', help='Buscar na região/frame inteiro')
+    parser.add_argument('--report-every', type=float, default=MULTI_CLIENT_REPORT_EVERY,
+                        help='Intervalo (s) das estatísticas por cliente')
+    args = parser.parse_args(argv)
+
+    from src.detector import TreeDetector
+
+    detector = TreeDetector(save_folder=args.templates, verbose=False, engine=args.engine)
+    if not detector.templates:
+        print("⚠️ Nenhum template carregado!")
+        detector.cleanup()
+        return
+
+    runtime = MultiClientRuntime(detector)
+    for name, source, fps in args.client:
+        if REGION_PATTERN.match(source):
+            x1, y1, x2, y2 = (int(v) for v in source.split(','))
+            custom_roi = (0, 0, x2 - x1, y2 - y1) if args.full_frame else None
+            runtime.add_client(name, screen_source((x1, y1, x2, y2)), fps, offset=(x1, y1), custom_roi=custom_roi)
+        else:
+            read = file_source(source)
+            if read.shape is None:
+                print(f"⚠️ {name}: nenhum frame em {source}")
+                continue
+            custom_roi = (0, 0, read.shape[1], read.shape[0]) if args.full_frame else None
+            runtime.add_client(name, read, fps, custom_roi=custom_roi)
+
+    print(f"🖥️ {len(runtime.clients)} clientes | 📚 {len(detector.templates)} templates e "
+          f"{MAX_WORKERS if detector.executor else 1} workers compartilhados")
+
+    try:
+        runtime.run(args.duration, args.report_every)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detector.cleanup()
+
+    print_stats(runtime.stats(), time.perf_counter() - runtime.started_at)
+
+
+if __name__ == '__main__':
+    main()
@@ -10,8 +10,12 @@ import threading
 import time
 import json
 import os
-import winsound  # Para tocar som no Windows
 from src.config import *
+from src.detection_log import DetectionLog
+from src.recorder import SessionRecorder
+from src.activity import ActivityMonitor
+from src.events import DetectionEventBus, SoundSubscriber, LogSubscriber, TREE_APPEARED
+from src.renderer import DetectionRenderer
 
 
 class OverlayWindow:
@@ -19,6 +23,8 @@ class OverlayWindow:
 
     def __init__(self, detector):
         self.detector = detector
+        # O overlay só desenha 80%+: o detector não precisa materializar menos que isso
+        self.detector.set_consumer_threshold('display', DISPLAY_THRESHOLD)
 
         self.mode = 'idle'
         self.capturing = False
@@ -52,6 +58,40 @@ class OverlayWindow:
         )
         self.canvas.pack()
 
+        # Eventos de detecção (som/log) despachados por uma única thread
+        self.events = DetectionEventBus()
+        if PLAY_SOUND_ON_DETECTION:
+            self.events.subscribe(SoundSubscriber(), kinds=[TREE_APPEARED])
+        if LOG_DETECTION_EVENTS:
+            self.events.subscribe(LogSubscriber())
+        self.events.start()
+
+        # Log persistente de detecções (thread escritora própria)
+        self.detection_log = None
+        if DETECTION_LOG_ENABLED:
+            self.detector.set_consumer_threshold('log', DETECTION_LOG_MIN_CONFIDENCE)
+            self.detection_log = DetectionLog()
+            self.detection_log.start()
+
+        # Gravação de sessão (frames da ROI, thread gravadora própria)
+        self.recorder = None
+        if RECORDING_ENABLED:
+            self.recorder = SessionRecorder(width=screen_width, height=screen_height)
+            self.recorder.start()
+            self.detector.recorder = self.recorder
+
+        # Ritmo por atividade: tela parada → captura lenta e sem detecção
+        self.activity = ActivityMonitor() if ACTIVITY_MONITOR else None
+        self._screen_shape = (screen_height, screen_width)  # winfo só pode ser chamado na thread do Tk
+
+        # Renderização incremental (pool de itens por detecção)
+        self.renderer = DetectionRenderer(self.canvas)
+
+        # Resultado mais recente da thread de detecção (só o último é desenhado)
+        self._pending_lock = threading.Lock()
+        self._pending_detections = None
+        self._render_scheduled = False
+
         # Mouse events
         self.canvas.bind('<Button-1>', self.on_click)
         self.canvas.bind('<B1-Motion>', self.on_drag)
@@ -158,11 +198,11 @@ class OverlayWindow:
             self.detecting = False  # Pausa detecção
 
             # Limpar todos os quadros (detecções, ROI, etc)
-            self.canvas.delete('detection')
             self.canvas.delete('roi')
 
             self.root.attributes('-transparentcolor', '')
             self.canvas.delete('all')
+            self.renderer.reset()
 
             # Recriar textos
             self.status_text = self.canvas.create_text(
@@ -188,11 +228,11 @@ class OverlayWindow:
             self.detecting = False  # Pausa detecção
 
             # Limpar todos os quadros (detecções, ROI, etc)
-            self.canvas.delete('detection')
             self.canvas.delete('roi')
 
             self.root.attributes('-transparentcolor', '')
             self.canvas.delete('all')
+            self.renderer.reset()
 
             # Recriar textos
             self.status_text = self.canvas.create_text(
@@ -246,7 +286,8 @@ class OverlayWindow:
             print("⏸️ Detecção PAUSADA")
             print(f"   Total detectado: {self.total_detections}")
             print(f"   FPS médio: {self._get_avg_fps():.1f}")
-            self.canvas.delete('detection')
+            self.renderer.clear()
+            self.events.reset()
             self.canvas.delete('roi')
 
     def _draw_roi_indicator(self):
@@ -386,9 +427,36 @@ class OverlayWindow:
                 # Capturar tela
                 screenshot = ImageGrab.grab()
 
+                # Tela parada: só mede a mudança, o último resultado continua valendo
+                if self.activity and not self.activity.observe(screenshot, loop_start, self._activity_roi()):
+                    elapsed = time.time() - loop_start
+                    self.activity.account(elapsed)
+                    time.sleep(max(0, self.activity.frame_delay() - elapsed))
+                    continue
+
                 # Detectar (processamento paralelo acontece aqui)
-                # Passa custom_roi se existir
-                detections = self.detector.detect(screenshot, custom_roi=self.custom_roi)
+                # Passa custom_roi se existir; com prazo, o que não couber fica para o próximo frame
+                deadline = time.perf_counter() + DEADLINE_BUDGET_MS / 1000 if USE_DEADLINE else None
+                detections = self.detector.detect(screenshot, custom_roi=self.custom_roi, deadline=deadline)
+
+                # Log de detecções (só enfileira; a gravação é em outra thread)
+                if self.detection_log:
+                    # template_id indexa o conjunto usado no detect (ignora se houve reload no meio)
+                    templates = self.detector.templates
+                    if templates.version != self.detector.stats.get('templates_version'):
+                        templates = None
+                    self.detection_log.log_frame(
+                        [d for d in detections if d['confidence'] >= DETECTION_LOG_MIN_CONFIDENCE],
+                        roi=self.detector.stats.get('roi'),
+                        timestamp=loop_start,
+                        frame_ms=self.detector.stats.get('detect_ms'),
+                        templates=templates
+                    )
+
+                # Eventos de borda (árvore apareceu/sumiu) - som e log saem daqui
+                self.events.publish_frame(
+                    [d for d in detections if d['confidence'] >= DISPLAY_THRESHOLD]
+                )
 
                 # Calcular FPS
                 elapsed = time.time() - loop_start
@@ -399,11 +467,15 @@ class OverlayWindow:
                 if len(self.frame_times) > 100:
                     self.frame_times.pop(0)
 
-                # Atualizar UI
-                self.root.after(0, self.draw_detections, detections)
+                # Atualizar UI (coalescido: só o resultado mais recente é desenhado)
+                self._submit_detections(detections)
 
-                # Delay otimizado
-                sleep_time = max(0, DETECTION_DELAY - elapsed)
+                # Delay otimizado (ritmo de repouso quando a tela está parada)
+                frame_delay = DETECTION_DELAY
+                if self.activity:
+                    self.activity.account(elapsed)
+                    frame_delay = self.activity.frame_delay()
+                sleep_time = max(0, frame_delay - elapsed)
                 if sleep_time > 0:
                     time.sleep(sleep_time)
 
@@ -413,67 +485,149 @@ class OverlayWindow:
                 traceback.print_exc()
                 time.sleep(0.5)
 
+    def _activity_roi(self):
+        """Área comparada pelo monitor de atividade: a ROI customizada ou a automática"""
+        if self.custom_roi:
+            return self.custom_roi
+        return self.detector._get_roi(self._screen_shape)
+
+    def _submit_detections(self, detections):
+        """
+        Entrega um resultado da thread de detecção para o Tk
+
+        Se o Tk ainda não desenhou o anterior, ele é substituído: a fila de
+        eventos nunca acumula frames atrasados.
+        """
+        with self._pending_lock:
+            self._pending_detections = detections
+            if self._render_scheduled:
+                return
+            self._render_scheduled = True
+
+        self.root.after(0, self._flush_detections)
+
+    def _flush_detections(self):
+        """Desenha o resultado pendente mais recente (roda na thread do Tk)"""
+        with self._pending_lock:
+            detections = self._pending_detections
+            self._pending_detections = None
+            self._render_scheduled = False
+
+        if detections is None or not self.detecting:
+            return
+
+        self.draw_detections(detections)
+
     def draw_detections(self, detections):
         """Desenha retângulos nas detecções (apenas 80%+ confiança)"""
-        self.canvas.delete('detection')
-
         # Filtrar apenas detecções com 80%+ de confiança
         high_confidence_detections = [d for d in detections if d['confidence'] >= DISPLAY_THRESHOLD]
 
-        # Tocar som se encontrou algo com alta confiança
-        if high_confidence_detections and PLAY_SOUND_ON_DETECTION:
-            try:
-                # Beep curto: frequência 1000Hz, duração 100ms
-                threading.Thread(target=lambda: winsound.Beep(1000, 100), daemon=True).start()
-            except:
-                pass  # Ignora erro se não conseguir tocar som
-
-        for det in high_confidence_detections:
-            x, y, w, h = det['x'], det['y'], det['w'], det['h']
-            conf = det['confidence']
-
-            # Retângulo preenchido semi-transparente (fundo)
-            # Nota: Canvas não suporta alpha em fill, então desenhamos só outline grosso
-
-            # Retângulo externo (grosso e forte)
-            self.canvas.create_rectangle(
-                x, y, x + w, y + h,
-                outline=DETECTION_COLOR, width=DETECTION_WIDTH, tags='detection'
+        # Move/esconde só o que mudou desde o frame anterior
+        self.renderer.render(high_confidence_detections)
+
+        # Atualizar contadores (contar só as de alta confiança)
+        if high_confidence_detections:
+            self.detection_count = len(high_confidence_detections)
+            self.total_detections += len(high_confidence_detections)
+
+        # Atualizar stats
+        avg_fps = self._get_avg_fps()
+        stats_lines = [
+            f"FPS: {self.fps:.1f} (avg: {avg_fps:.1f})",
+            f"Detecções 80%+: {self.detection_count}",
+            f"Total sessão: {self.total_detections}",
+            f"Render: {self.renderer.last_render_ms:.1f}ms (avg: {self.renderer.avg_render_ms():.1f})"
+        ]
+        stats_lines.extend(self._detector_stats_lines())
+        self.canvas.itemconfig(self.stats_text, text="\n".join(stats_lines))
+
+    def _detector_stats_lines(self):
+        """Linhas extras com estatísticas do último frame do detector"""
+        stats = self.detector.stats
+        lines = []
+
+        event_stats = self.events.stats()
+        if event_stats['queue_depth'] or event_stats['dropped']:
+            lines.append(f"Eventos: fila {event_stats['queue_depth']} | descartados {event_stats['dropped']}")
+
+        if 'candidates_raw' in stats:
+            lines.append(
+                f"Candidatos: {stats['candidates_raw']} ≥{self.detector.similarity_threshold:.2f} → "
+                f"{stats['candidates_materialized']} materializados"
             )
 
-            # Retângulo interno para dar efeito de destaque
-            self.canvas.create_rectangle(
-                x + 2, y + 2, x + w - 2, y + h - 2,
-                outline=DETECTION_COLOR, width=2, tags='detection'
+        if 'fusion_ms' in stats:
+            lines.append(
+                f"Fusão: {stats['fusion_ms']:.1f}ms + picos {stats['fusion_peak_ms']:.1f}ms "
+                f"→ {stats['fusion_peaks']} candidatos"
             )
 
-            # Label com confiança (mais visível)
-            # Fundo do texto
-            self.canvas.create_rectangle(
-                x, y - 25, x + 100, y - 5,
-                fill='black', outline='', tags='detection'
+        if 'foliage_masked' in stats:
+            lines.append(
+                f"Folhagem: {stats['foliage_masked']:.0%} descartado "
+                f"(~{stats['foliage_saved_ms']:.1f}ms salvos)"
             )
 
-            # Texto com confiança
-            self.canvas.create_text(
-                x + 5, y - 15, text=f"🌳 {conf:.0%}",
-                anchor='w', font=('Arial', FONT_SIZE, 'bold'),
-                fill='#FF0000', tags='detection'
+        if self.activity:
+            activity = self.activity.stats()
+            lines.append(
+                f"Atividade: mudança {activity['change']:.1%} | repouso {activity['idle_fraction']:.0%} "
+                f"| CPU poupada {activity['cpu_saved_s']:.0f}s"
             )
 
-        # Atualizar contadores (contar só as de alta confiança)
-        if high_confidence_detections:
-            self.detection_count = len(high_confidence_detections)
-            self.total_detections += len(high_confidence_detections)
+        if self.detector.scene_cache:
+            cache = self.detector.scene_cache.stats()
+            lines.append(
+                f"Cache de cenas: {cache['hit_rate']:.0%} acertos | {cache['entries']} cenas "
+                f"({cache['bytes'] / 1024 / 1024:.1f}MB) | {cache['evicted'] + cache['expired']} removidas"
+            )
 
-        # Atualizar stats
-        avg_fps = self._get_avg_fps()
-        self.canvas.itemconfig(
-            self.stats_text,
-            text=f"FPS: {self.fps:.1f} (avg: {avg_fps:.1f})\n"
-                 f"Detecções 80%+: {self.detection_count}\n"
-                 f"Total sessão: {self.total_detections}"
-        )
+        if self.recorder:
+            recorder_stats = self.recorder.stats()
+            lines.append(f"Gravando: {recorder_stats['recorded']} frames | descartados {recorder_stats['dropped']}")
+
+        if 'jobs_total' in stats and not stats['complete']:
+            lines.append(
+                f"Prazo: {stats['jobs_done']}/{stats['jobs_total']} jobs "
+                f"({stats['jobs_carried']} adiados, idade máx. {stats['max_job_age']})"
+            )
+
+        if 'adaptive_regions' in stats:
+            area = 'exploração' if stats['adaptive_exploring'] else f"{stats['adaptive_regions']} regiões"
+            lines.append(
+                f"ROI adaptativa: {area} | {stats['adaptive_avg_pixels']:.0%} dos pixels "
+                f"| perdidas {stats['adaptive_missed']:.1%}"
+            )
+
+        if 'scale' in stats:
+            scale = stats['scale']
+            scale_text = f"{scale:.2f}x" if scale is not None else "?"
+            lines.append(f"Zoom: {scale_text}{' (calibrando)' if stats['calibrating'] else ''}")
+
+        if 'cascade_candidates' in stats:
+            lines.append(
+                f"Cascata: {stats['cascade_candidates']} cand. ({stats['cascade_stage1_ms']:.1f}ms) → "
+                f"{stats['cascade_verified']} ({stats['cascade_stage2_ms']:.1f}ms)"
+            )
+
+        if 'variance_pruned' in stats:
+            lines.append(
+                f"Textura: {stats['variance_pruned']:.0%} janelas podadas "
+                f"({stats['variance_speedup']:.1f}x menos trabalho)"
+            )
+
+        if 'binary_rejected' in stats:
+            lines.append(
+                f"Binário: {stats['binary_rejected']:.0%} janelas rejeitadas ({stats['binary_ms']:.1f}ms)"
+            )
+
+        if 'sparse_rejected' in stats:
+            lines.append(
+                f"Esparso: {stats['sparse_rejected']:.0%} janelas rejeitadas ({stats['sparse_ms']:.1f}ms)"
+            )
+
+        return lines
 
     def _get_avg_fps(self):
         """Calcula FPS médio"""
@@ -521,8 +675,32 @@ class OverlayWindow:
         print(f"   FPS médio: {self._get_avg_fps():.1f}")
         print(f"   Templates: {len(self.detector.templates)}")
 
+        if self.activity:
+            activity = self.activity.stats()
+            print(f"   Ritmo: ativo {activity['active_s']:.0f}s ({FPS_TARGET} FPS) | "
+                  f"repouso {activity['idle_s']:.0f}s ({ACTIVITY_IDLE_FPS} FPS) | "
+                  f"{activity['wakeups']} despertares")
+            print(f"   CPU poupada: ~{activity['cpu_saved_s']:.0f}s ({activity['cpu_saved_fraction']:.0%} do tempo)")
+
+        if self.detector.scene_cache:
+            cache = self.detector.scene_cache.stats()
+            print(f"   Cache de cenas: {cache['hits']}/{cache['hits'] + cache['misses']} acertos "
+                  f"({cache['hit_rate']:.0%}) | ~{cache['saved_ms'] / 1000:.0f}s de detecção poupados | "
+                  f"{cache['evicted']} removidas por limite, {cache['expired']} vencidas")
+
+        idle = [r for r in self.detector.template_stats() if r['hits'] == 0]
+        if idle:
+            print(f"   Templates sem detecções ≥{TEMPLATE_STATS_MIN_CONFIDENCE:.0%}: {len(idle)} "
+                  f"(veja python -m src.template_report)")
+
         print("🧹 Limpando recursos...")
         self.detecting = False
+        self.events.stop()
+        if self.detection_log:
+            self.detection_log.stop()
+        if self.recorder:
+            self.detector.recorder = None
+            self.recorder.stop()
         self.detector.cleanup()
 
         print("👋 Até logo!")
@@ -0,0 +1,329 @@
+"""
+Pré-filtros baratos que descartam áreas da tela antes do template matching
+"""
+
+import cv2
+import numpy as np
+
+
+def foliage_mask(image_rgb, hsv_ranges):
+    """Máscara binária (0/255) dos pixels dentro de alguma faixa HSV de folhagem"""
+    hsv = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2HSV)
+
+    mask = np.zeros(hsv.shape[:2], dtype=np.uint8)
+    for lower, upper in hsv_ranges:
+        mask |= cv2.inRange(hsv, np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+
+    return mask
+
+
+def foliage_regions(roi_rgb, match_shape, template_size, hsv_ranges, mask_scale, min_area):
+    """
+    Regiões retangulares onde pode haver árvore, em coordenadas da imagem de matching
+
+    - Máscara HSV calculada numa versão reduzida da ROI (mask_scale)
+    - Manchas menores que min_area (pixels da máscara reduzida) são ignoradas
+    - Dilatação pelo tamanho do template: toda janela que toca folhagem cabe na região
+    - Caixas que se sobrepõem são unidas (nenhum pixel é processado duas vezes)
+
+    Retorna (lista de (x, y, w, h), fração da área descartada)
+    """
+    match_h, match_w = match_shape[:2]
+    mask_w = max(1, int(match_w * mask_scale))
+    mask_h = max(1, int(match_h * mask_scale))
+
+    small = cv2.resize(roi_rgb, (mask_w, mask_h), interpolation=cv2.INTER_AREA)
+    mask = foliage_mask(small, hsv_ranges)
+
+    # Remover ruído (pixels verdes soltos na UI, por exemplo)
+    _, labels, comp_stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    keep = comp_stats[:, cv2.CC_STAT_AREA] >= min_area
+    keep[0] = False  # fundo
+    mask = np.where(keep[labels], 255, 0).astype(np.uint8)
+
+    if not mask.any():
+        return [], 1.0
+
+    # Dilatar pelo tamanho do template (nos dois sentidos)
+    tw = max(1, int(np.ceil(template_size[0] * mask_scale)))
+    th = max(1, int(np.ceil(template_size[1] * mask_scale)))
+    kernel = np.ones((2 * th + 1, 2 * tw + 1), dtype=np.uint8)
+    mask = cv2.dilate(mask, kernel)
+
+    # Bounding box de cada área conectada, convertida para a resolução de matching
+    count, _, comp_stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    regions = []
+
+    for label in range(1, count):
+        x, y, w, h = comp_stats[label, :4]
+        x1 = int(x / mask_scale)
+        y1 = int(y / mask_scale)
+        x2 = min(match_w, int(np.ceil((x + w) / mask_scale)))
+        y2 = min(match_h, int(np.ceil((y + h) / mask_scale)))
+        regions.append((x1, y1, x2 - x1, y2 - y1))
+
+    regions = merge_overlapping(regions)
+    covered = np.zeros((match_h, match_w), dtype=np.uint8)
+    for x, y, w, h in regions:
+        covered[y:y + h, x:x + w] = 1
+
+    masked_fraction = 1.0 - covered.mean()
+
+    return regions, float(masked_fraction)
+
+
+def merge_overlapping(regions):
+    """Une regiões (x, y, w, h) que se sobrepõem até todas ficarem disjuntas"""
+    boxes = [(x, y, x + w, y + h) for x, y, w, h in regions]
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        for box in boxes:
+            for i, other in enumerate(result):
+                if box[0] < other[2] and other[0] < box[2] and box[1] < other[3] and other[1] < box[3]:
+                    result[i] = (min(box[0], other[0]), min(box[1], other[1]),
+                                 max(box[2], other[2]), max(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return [(x1, y1, x2 - x1, y2 - y1) for x1, y1, x2, y2 in boxes]
+
+
+def variance_inputs(gray, factor=1):
+    """
+    Imagem e imagem ao quadrado em float32 - uma vez por frame, base de window_variance
+
+    Com factor > 1 a imagem é reduzida antes (médias de blocos factor x factor):
+    mapas factor² vezes mais baratos, suficientes para separar área lisa de textura.
+    """
+    if factor > 1:
+        gray = cv2.resize(gray, (gray.shape[1] // factor, gray.shape[0] // factor), interpolation=cv2.INTER_AREA)
+    image = gray.astype(np.float32)
+    return image, image * image
+
+
+def expand_map(valid, factor, shape):
+    """Mapa booleano reduzido → shape (cada posição repete factor x factor vezes, borda estendida)"""
+    if factor > 1:
+        valid = valid.repeat(factor, axis=0).repeat(factor, axis=1)
+    pad_h, pad_w = max(0, shape[0] - valid.shape[0]), max(0, shape[1] - valid.shape[1])
+    if pad_h or pad_w:
+        valid = np.pad(valid, ((0, pad_h), (0, pad_w)), mode='edge')
+    return valid[:shape[0], :shape[1]]
+
+
+def window_variance(inputs, w, h):
+    """
+    Variância de todas as janelas w x h da imagem (médias por filtro de caixa)
+
+    Retorna mapa com o mesmo formato do resultado de cv2.matchTemplate
+    para um template w x h: (H - h + 1, W - w + 1)
+    """
+    image, squared = inputs
+    rows, cols = image.shape[0] - h + 1, image.shape[1] - w + 1
+    mean = cv2.boxFilter(image, -1, (w, h), anchor=(0, 0), borderType=cv2.BORDER_REPLICATE)[:rows, :cols]
+    mean_sq = cv2.boxFilter(squared, -1, (w, h), anchor=(0, 0), borderType=cv2.BORDER_REPLICATE)[:rows, :cols]
+    return mean_sq - mean * mean
+
+
+def intersect_regions(a, b):
+    """Interseção de duas listas de regiões (x, y, w, h) - retângulos vazios são descartados"""
+    regions = []
+    for ax, ay, aw, ah in a:
+        for bx, by, bw, bh in b:
+            x1, y1 = max(ax, bx), max(ay, by)
+            x2, y2 = min(ax + aw, bx + bw), min(ay + ah, by + bh)
+            if x2 > x1 and y2 > y1:
+                regions.append((x1, y1, x2 - x1, y2 - y1))
+    return regions
+
+
+# Popcount por byte (np.bitwise_count só existe a partir do NumPy 2.0)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount(words):
+    """Bits ligados de cada palavra uint64"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words)
+    as_bytes = words.view(np.uint8).reshape(words.shape + (8,))
+    return _POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def _pack_words(bits):
+    """Bits (..., n) → palavras uint64 (..., ceil(n / 64)) - np.packbits + padding"""
+    packed = np.packbits(bits, axis=-1)
+    pad = -packed.shape[-1] % 8
+    if pad:
+        packed = np.concatenate([packed, np.zeros(packed.shape[:-1] + (pad,), dtype=np.uint8)], axis=-1)
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def sign_descriptor(template, grid):
+    """
+    Padrão de sinais do template: grid x grid células, bit = célula mais clara que
+    a média, empacotado em palavras de 64 bits. A área do descritor é um múltiplo
+    do tamanho de célula, centralizada no template.
+    """
+    h, w = template.shape
+    cw, ch = w // grid, h // grid
+    ox, oy = (w - cw * grid) // 2, (h - ch * grid) // 2
+    cells = cv2.resize(template[oy:oy + ch * grid, ox:ox + cw * grid], (grid, grid),
+                       interpolation=cv2.INTER_AREA).astype(np.float32)
+    return _pack_words((cells > cells.mean()).ravel())
+
+
+def sign_descriptor_maps(gray, cell_w, cell_h, grid, stride):
+    """
+    Descritores de sinais de todas as janelas (cell_w * grid) x (cell_h * grid) do frame,
+    avaliadas a cada `stride` px dentro de uma célula
+
+    Para cada fase (px, py) a imagem é reduzida uma vez para médias de célula
+    (INTER_AREA, blocos inteiros) e cada janela grid x grid dessa imagem pequena
+    vira um descritor. Retorna [(px, py, palavras (nj, ni, n))]; a janela (i, j)
+    da fase começa em (px + i * cell_w, py + j * cell_h).
+    """
+    maps = []
+    for py in range(0, cell_h, stride):
+        for px in range(0, cell_w, stride):
+            rows = (gray.shape[0] - py) // cell_h
+            cols = (gray.shape[1] - px) // cell_w
+            nj, ni = rows - grid + 1, cols - grid + 1
+            if nj <= 0 or ni <= 0:
+                continue
+
+            block = gray[py:py + rows * cell_h, px:px + cols * cell_w]
+            small = cv2.resize(block, (cols, rows), interpolation=cv2.INTER_AREA)
+            mean = cv2.blur(small.astype(np.float32), (grid, grid), anchor=(0, 0),
+                            borderType=cv2.BORDER_CONSTANT)[:nj, :ni]
+
+            windows = np.lib.stride_tricks.sliding_window_view(small, (grid, grid))
+            bright = windows > mean[:, :, None, None]
+            maps.append((px, py, _pack_words(bright.reshape(nj, ni, grid * grid))))
+    return maps
+
+
+def hamming_distance_map(maps, shape, cell_w, cell_h, template_words, stride):
+    """
+    Distância de Hamming de cada janela ao descritor do template, shape = (H - dh + 1, W - dw + 1)
+
+    Posições entre as avaliadas recebem a menor distância da vizinhança
+    (filtro de mínimo do tamanho do espaçamento), o que também dá tolerância a
+    deslocamentos.
+    """
+    distance = np.full(shape, 255, dtype=np.uint8)
+    for px, py, words in maps:
+        d = popcount(words ^ template_words).sum(axis=-1, dtype=np.uint8)
+        target = distance[py::cell_h, px::cell_w]
+        nj, ni = min(d.shape[0], target.shape[0]), min(d.shape[1], target.shape[1])
+        target[:nj, :ni] = d[:nj, :ni]
+
+    # Espaçamento real das avaliações: o passo, limitado ao tamanho de célula
+    kw, kh = 2 * min(stride, cell_w) - 1, 2 * min(stride, cell_h) - 1
+    if kw > 1 or kh > 1:
+        distance = cv2.erode(distance, np.ones((kh, kw), dtype=np.uint8))
+    return distance
+
+
+def valid_boxes(valid, tile):
+    """
+    Retângulos (x1, y1, x2, y2) que cobrem as posições válidas: o mapa é dividido
+    em blocos de tile x tile posições e cada bloco com alguma válida vira o menor
+    retângulo que as contém (aprovações espalhadas não viram um retângulo gigante)
+    """
+    h, w = valid.shape
+    rows, cols = -(-h // tile), -(-w // tile)
+    padded = np.zeros((rows * tile, cols * tile), dtype=bool)
+    padded[:h, :w] = valid
+    blocks = padded.reshape(rows, tile, cols, tile)
+
+    # Linhas / colunas com alguma posição válida, por bloco: (rows, cols, tile)
+    row_any = blocks.any(axis=3).transpose(0, 2, 1)
+    col_any = blocks.any(axis=1)
+    occupied = row_any.any(axis=2)
+
+    y1 = row_any.argmax(axis=2)
+    y2 = tile - row_any[:, :, ::-1].argmax(axis=2)
+    x1 = col_any.argmax(axis=2)
+    x2 = tile - col_any[:, :, ::-1].argmax(axis=2)
+
+    ty, tx = np.nonzero(occupied)
+    oy, ox = ty * tile, tx * tile
+    return [(int(a), int(b), int(c), int(d)) for a, b, c, d in
+            zip(ox + x1[ty, tx], oy + y1[ty, tx], ox + x2[ty, tx], oy + y2[ty, tx])]
+
+
+def sparse_points(template, count):
+    """
+    Pontos mais característicos do template: (ys, xs, valores centrados)
+
+    Pontuação = desvio da média (tronco escuro, copa clara) x força da borda;
+    o template é dividido em ceil(sqrt(count))² blocos e cada bloco contribui
+    com o seu melhor ponto, para a amostra cobrir a árvore inteira.
+    """
+    gray = template.astype(np.float32)
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    score = np.abs(gray - gray.mean()) * (1.0 + cv2.magnitude(gx, gy))
+
+    h, w = gray.shape
+    cells = int(np.ceil(np.sqrt(count)))
+    ys, xs, best = [], [], []
+    for row in range(cells):
+        y1, y2 = row * h // cells, (row + 1) * h // cells
+        for col in range(cells):
+            x1, x2 = col * w // cells, (col + 1) * w // cells
+            block = score[y1:y2, x1:x2]
+            if block.size == 0:
+                continue
+            by, bx = np.unravel_index(int(block.argmax()), block.shape)
+            ys.append(y1 + by)
+            xs.append(x1 + bx)
+            best.append(block[by, bx])
+
+    keep = np.argsort(best)[::-1][:count]
+    ys, xs = np.array(ys)[keep], np.array(xs)[keep]
+    values = gray[ys, xs]
+    return ys, xs, values - values.mean()
+
+
+def sparse_phases(image, stride):
+    """Imagem (float32) separada nas stride² fases de amostragem: phases[py][px] = image[py::stride, px::stride]"""
+    image = image.astype(np.float32)
+    return [[np.ascontiguousarray(image[py::stride, px::stride]) for px in range(stride)] for py in range(stride)]
+
+
+def sparse_correlation(phases, points, shape, stride):
+    """
+    Correlação normalizada entre os pontos do template e os mesmos pontos de
+    cada janela, shape = (H - th + 1, W - tw + 1)
+
+    Avaliada a cada `stride` px: o ponto (y, x) de todas as janelas avaliadas
+    é um recorte contíguo de uma fase (sem laço por janela). As posições do
+    meio recebem o máximo da vizinhança.
+    """
+    ys, xs, values = points
+    rows, cols = -(-shape[0] // stride), -(-shape[1] // stride)
+
+    total = np.zeros((rows, cols), dtype=np.float32)
+    squares = np.zeros((rows, cols), dtype=np.float32)
+    cross = np.zeros((rows, cols), dtype=np.float32)
+    for y, x, value in zip(ys, xs, values):
+        qy, qx = y // stride, x // stride
+        sample = phases[y % stride][x % stride][qy:qy + rows, qx:qx + cols]
+        total += sample
+        squares += sample * sample
+        cross += value * sample
+
+    count = len(values)
+    variance = np.maximum(squares - total * total / count, 1e-6)
+    corr = cross / (np.sqrt(variance) * max(float(np.sqrt((values * values).sum())), 1e-6))
+
+    if stride == 1:
+        return corr
+    full = np.full(shape, -1.0, dtype=np.float32)
+    full[::stride, ::stride] = corr
+    return cv2.dilate(full, np.ones((2 * stride - 1, 2 * stride - 1), dtype=np.uint8))
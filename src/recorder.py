@@ -0,0 +1,301 @@
+"""
+Gravador de sessão em arquivo anel (memmap) e replay sem decodificação
+
+Formato (.ring), tudo pré-alocado na criação:
+    [cabeçalho JSON, HEADER_SIZE bytes] [índice: capacity x SLOT_DTYPE] [frames: capacity x slot]
+
+Cada slot guarda um frame da ROI (cinza ou BGRA) no canto superior esquerdo;
+o índice guarda número de sequência, timestamp, ROI e tamanho real. A
+sequência é gravada por último e marca o slot como completo.
+
+- record() só enfileira (não bloqueia o detection_loop); uma thread copia
+  para o memmap e faz a conversão de cor
+- O replay lê os slots como views do memmap (zero cópia), na velocidade
+  máxima ou na cadência original
+
+Uso:
+    python -m src.recorder info session.ring
+    python -m src.recorder replay session.ring --realtime
+"""
+
+import argparse
+import json
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+MAGIC = 'pxg-ring'
+VERSION = 1
+HEADER_SIZE = 4096
+SLOT_DTYPE = np.dtype([
+    ('seq', '<i8'),        # -1 = slot vazio
+    ('ts', '<f8'),
+    ('roi', '<i4', (4,)),  # x1, y1, x2, y2 na tela
+    ('h', '<i4'),
+    ('w', '<i4'),
+])
+CHANNELS = {'gray': 1, 'bgra': 4}
+
+
+def _open_layout(path, header, mode):
+    """Mapeia índice e frames do arquivo conforme o cabeçalho"""
+    capacity = header['capacity']
+    slot_shape = (header['height'], header['width'], header['channels'])
+
+    index = np.memmap(path, dtype=SLOT_DTYPE, mode=mode, offset=HEADER_SIZE, shape=(capacity,))
+    frames = np.memmap(path, dtype=np.uint8, mode=mode,
+                       offset=HEADER_SIZE + capacity * SLOT_DTYPE.itemsize,
+                       shape=(capacity,) + slot_shape)
+    return index, frames
+
+
+def _convert(frame, color_order, fmt, out):
+    """Converte o frame da ROI ('gray', 'rgb' ou 'bgra') para o formato do arquivo, direto no slot"""
+    if fmt == 'gray':
+        if color_order == 'gray':
+            out[..., 0] = frame
+        else:
+            code = cv2.COLOR_RGB2GRAY if color_order == 'rgb' else cv2.COLOR_BGRA2GRAY
+            out[..., 0] = cv2.cvtColor(frame, code)
+    else:
+        if color_order == 'bgra':
+            out[:] = frame
+        else:
+            code = cv2.COLOR_RGB2BGRA if color_order == 'rgb' else cv2.COLOR_GRAY2BGRA
+            out[:] = cv2.cvtColor(frame, code)
+
+
+class SessionRecorder:
+    """Grava os frames da ROI em um arquivo anel pré-alocado, numa thread própria"""
+
+    def __init__(self, path=RECORDING_FILE, width=1920, height=1080, fmt=RECORDING_FORMAT,
+                 capacity=RECORDING_CAPACITY, max_pending=RECORDING_MAX_PENDING):
+        if fmt not in CHANNELS:
+            raise ValueError(f"Formato de gravação desconhecido: {fmt} (use {', '.join(CHANNELS)})")
+
+        self.path = path
+        self.fmt = fmt
+        self.header = {
+            'magic': MAGIC,
+            'version': VERSION,
+            'format': fmt,
+            'width': width,
+            'height': height,
+            'channels': CHANNELS[fmt],
+            'capacity': capacity,
+            'created_at': time.time()
+        }
+
+        # Criar o arquivo com o tamanho final (pré-alocado) e o cabeçalho
+        raw = json.dumps(self.header).encode()
+        total = HEADER_SIZE + capacity * (SLOT_DTYPE.itemsize + height * width * CHANNELS[fmt])
+        with open(path, 'wb') as f:
+            f.write(raw.ljust(HEADER_SIZE, b' '))
+            f.truncate(total)
+
+        self.index, self.frames = _open_layout(path, self.header, 'r+')
+        self.index['seq'] = -1
+
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self.next_seq = 0
+
+        self.recorded = 0
+        self.dropped = 0
+        self.truncated = 0  # frames maiores que o slot (cortados)
+        self.write_ms = 0.0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._writer_loop, name='session-recorder', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Grava o que falta, descarrega o memmap e encerra a thread (nunca trava se ela morreu)"""
+        thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        if thread.is_alive():
+            try:
+                self.queue.put(None, timeout=timeout)
+                thread.join(timeout)
+            except queue.Full:
+                print(f"⚠️ Gravação da sessão não esvaziou em {timeout:.0f}s, {self.queue.qsize()} frames descartados")
+        self.index.flush()
+        self.frames.flush()
+
+    def record(self, frame, roi=None, color_order='rgb', timestamp=None):
+        """
+        Enfileira um frame da ROI (não bloqueia; descarta se a fila estiver cheia)
+
+        O array não é copiado aqui: quem chama não pode reaproveitá-lo depois.
+        """
+        record = (frame, tuple(roi) if roi else (0, 0, frame.shape[1], frame.shape[0]), color_order,
+                  timestamp if timestamp is not None else time.time())
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _writer_loop(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            try:
+                self._write(*record)
+            except Exception as e:
+                # Frame perdido, mas a thread continua esvaziando a fila
+                self.dropped += 1
+                print(f"❌ Erro ao gravar frame da sessão: {e}")
+
+    def _write(self, frame, roi, color_order, timestamp):
+        start = time.perf_counter()
+
+        seq = self.next_seq
+        self.next_seq += 1
+        slot = seq % self.header['capacity']
+
+        h = min(frame.shape[0], self.header['height'])
+        w = min(frame.shape[1], self.header['width'])
+        if (h, w) != frame.shape[:2]:
+            self.truncated += 1
+
+        entry = self.index[slot]
+        entry['seq'] = -1  # slot inválido enquanto é sobrescrito
+        _convert(frame[:h, :w], color_order, self.fmt, self.frames[slot, :h, :w])
+        entry['ts'] = timestamp
+        entry['roi'] = roi
+        entry['h'] = h
+        entry['w'] = w
+        entry['seq'] = seq
+
+        self.recorded += 1
+        self.write_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        return {
+            'pending': self.queue.qsize(),
+            'recorded': self.recorded,
+            'dropped': self.dropped,
+            'truncated': self.truncated,
+            'avg_write_ms': self.write_ms / self.recorded if self.recorded else 0.0
+        }
+
+
+class SessionReplay:
+    """Lê uma gravação .ring: frames como views do memmap, em ordem de sequência"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.header = json.loads(f.read(HEADER_SIZE).decode().strip())
+
+        if self.header.get('magic') != MAGIC:
+            raise ValueError(f"{path} não é uma gravação de sessão")
+
+        self.index, self.frames = _open_layout(path, self.header, 'r')
+        self.order = [int(slot) for slot in np.argsort(self.index['seq']) if self.index['seq'][slot] >= 0]
+
+    def __len__(self):
+        return len(self.order)
+
+    @property
+    def color_order(self):
+        return self.header['format']
+
+    def frame(self, position):
+        """(timestamp, frame, roi) do position-ésimo frame gravado - o frame é uma view do arquivo"""
+        slot = self.order[position]
+        entry = self.index[slot]
+        frame = self.frames[slot, :entry['h'], :entry['w']]
+        if self.header['format'] == 'gray':
+            frame = frame[..., 0]
+        return float(entry['ts']), frame, tuple(int(v) for v in entry['roi'])
+
+    def frames_iter(self, start_frame=0, every=1, realtime=False):
+        """Gera (índice, timestamp, frame, roi); realtime=True respeita a cadência original"""
+        first_ts = None
+        clock_start = time.perf_counter()
+
+        for position in range(start_frame, len(self), every):
+            timestamp, frame, roi = self.frame(position)
+
+            if realtime:
+                if first_ts is None:
+                    first_ts = timestamp
+                wait = (timestamp - first_ts) - (time.perf_counter() - clock_start)
+                if wait > 0:
+                    time.sleep(wait)
+
+            yield position, timestamp, frame, roi
+
+
+def replay(path, templates_folder=SAVE_FOLDER, engine=DETECTION_ENGINE, realtime=False):
+    """Roda o detector sobre uma gravação; detecções voltam em coordenadas da tela"""
+    from src.detector import TreeDetector
+
+    session = SessionReplay(path)
+    detector = TreeDetector(save_folder=templates_folder, verbose=False, engine=engine)
+
+    times = []
+    total = 0
+    try:
+        for _, _, frame, roi in session.frames_iter(realtime=realtime):
+            start = time.perf_counter()
+            detections = detector.detect(frame, custom_roi=(0, 0, frame.shape[1], frame.shape[0]))
+            times.append((time.perf_counter() - start) * 1000)
+
+            for det in detections:
+                det['x'] += roi[0]
+                det['y'] += roi[1]
+            total += len(detections)
+    finally:
+        detector.cleanup()
+
+    return {'frames': len(times), 'detections': total, 'times': np.array(times)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.recorder',
+                                     description='Inspeciona e reexecuta gravações de sessão')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    info = sub.add_parser('info', help='Resumo da gravação')
+    info.add_argument('path', nargs='?', default=RECORDING_FILE)
+
+    run = sub.add_parser('replay', help='Reexecuta o detector sobre os frames gravados')
+    run.add_argument('path', nargs='?', default=RECORDING_FILE)
+    run.add_argument('--realtime', action='store_true', help='Respeitar a cadência original')
+    run.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    run.add_argument('--engine', default=DETECTION_ENGINE)
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        session = SessionReplay(args.path)
+        header = session.header
+        print(f"🎞️ {len(session)}/{header['capacity']} frames {header['format']} "
+              f"(slot {header['width']}x{header['height']})")
+        if len(session):
+            first, last = session.frame(0)[0], session.frame(len(session) - 1)[0]
+            duration = last - first
+            fps = (len(session) - 1) / duration if duration > 0 else 0
+            print(f"⏱️ {duration:.1f}s gravados (~{fps:.1f} FPS)")
+    else:
+        result = replay(args.path, args.templates, args.engine, args.realtime)
+        times = result['times']
+        if not len(times):
+            print("⚠️ Gravação vazia!")
+            return
+        print(f"🎞️ {result['frames']} frames | 🌳 {result['detections']} detecções")
+        print(f"⏱️ média {times.mean():.1f}ms | p95 {np.percentile(times, 95):.1f}ms | máx {times.max():.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
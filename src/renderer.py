@@ -0,0 +1,130 @@
+"""
+Renderização incremental das detecções no canvas do overlay
+
+Em vez de apagar e recriar 4 itens por detecção a cada frame, mantém um
+pool de itens por ID de detecção e só move, recolore ou esconde.
+"""
+
+import time
+from collections import deque
+
+from src.config import *
+from src.tracking import Tracker
+
+
+class DetectionRenderer:
+    """Pool de itens do canvas indexado pelo ID (track) de cada detecção"""
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.active = {}  # id -> {'items': (...), 'box': (x, y, w, h), 'label': str, 'color': str}
+        self.free = []  # grupos de itens escondidos, prontos para reuso
+        self.tracker = Tracker(max_misses=0, prefix='d')
+        self.render_times = deque(maxlen=100)
+        self.last_render_ms = 0.0
+
+    def reset(self):
+        """Esquece o pool (usar depois de canvas.delete('all'))"""
+        self.active = {}
+        self.free = []
+        self.tracker.reset()
+
+    def clear(self):
+        """Esconde todas as detecções visíveis"""
+        for entry in self.active.values():
+            self._hide(entry['items'])
+            self.free.append(entry['items'])
+        self.active = {}
+        self.tracker.reset()
+
+    def _assign_ids(self, detections):
+        """
+        Associa cada detecção a um ID estável: usa 'track_id' se todas tiverem,
+        senão o ID da detecção anterior mais próxima (Tracker)
+        """
+        if detections and all('track_id' in det for det in detections):
+            return [(det['track_id'], det) for det in detections]
+
+        assigned, _ = self.tracker.update(detections)
+        return assigned
+
+    def _create_items(self):
+        """Cria um grupo de itens (escondido) para uma detecção"""
+        outer = self.canvas.create_rectangle(
+            0, 0, 0, 0, outline=DETECTION_COLOR, width=DETECTION_WIDTH,
+            tags='detection', state='hidden'
+        )
+        inner = self.canvas.create_rectangle(
+            0, 0, 0, 0, outline=DETECTION_COLOR, width=2,
+            tags='detection', state='hidden'
+        )
+        label_bg = self.canvas.create_rectangle(
+            0, 0, 0, 0, fill='black', outline='', tags='detection', state='hidden'
+        )
+        label = self.canvas.create_text(
+            0, 0, text='', anchor='w', font=('Arial', FONT_SIZE, 'bold'),
+            fill=DETECTION_COLOR, tags='detection', state='hidden'
+        )
+        return (outer, inner, label_bg, label)
+
+    def _hide(self, items):
+        for item in items:
+            self.canvas.itemconfigure(item, state='hidden')
+
+    def _place(self, items, det, entry):
+        """Move/atualiza um grupo de itens só no que mudou"""
+        outer, inner, label_bg, label = items
+        x, y, w, h = det['x'], det['y'], det['w'], det['h']
+        box = (x, y, w, h)
+
+        if entry is None or entry['box'] != box:
+            self.canvas.coords(outer, x, y, x + w, y + h)
+            self.canvas.coords(inner, x + 2, y + 2, x + w - 2, y + h - 2)
+            self.canvas.coords(label_bg, x, y - 25, x + 100, y - 5)
+            self.canvas.coords(label, x + 5, y - 15)
+
+        text = f"🌳 {det['confidence']:.0%}"
+        if entry is None or entry['label'] != text:
+            self.canvas.itemconfigure(label, text=text)
+
+        color = det.get('color', DETECTION_COLOR)
+        if entry is None or entry['color'] != color:
+            self.canvas.itemconfigure(outer, outline=color)
+            self.canvas.itemconfigure(inner, outline=color)
+            self.canvas.itemconfigure(label, fill=color)
+
+        if entry is None:
+            for item in items:
+                self.canvas.itemconfigure(item, state='normal')
+
+        return {'items': items, 'box': box, 'label': text, 'color': color}
+
+    def render(self, detections):
+        """Atualiza o canvas para mostrar exatamente estas detecções"""
+        start = time.perf_counter()
+
+        active = {}
+        for det_id, det in self._assign_ids(detections):
+            entry = self.active.pop(det_id, None)
+            if entry is not None:
+                items = entry['items']
+            elif self.free:
+                items = self.free.pop()
+            else:
+                items = self._create_items()
+            active[det_id] = self._place(items, det, entry)
+
+        # Detecções que sumiram: esconder e devolver ao pool
+        for entry in self.active.values():
+            self._hide(entry['items'])
+            self.free.append(entry['items'])
+
+        self.active = active
+
+        self.last_render_ms = (time.perf_counter() - start) * 1000
+        self.render_times.append(self.last_render_ms)
+
+    def avg_render_ms(self):
+        if not self.render_times:
+            return 0.0
+        return sum(self.render_times) / len(self.render_times)
@@ -0,0 +1,348 @@
+"""
+Scanner offline - roda o TreeDetector sobre gravações (vídeo ou pasta de screenshots)
+
+Uso:
+    python -m src.scan gameplay.mp4 -o arvores.jsonl
+    python -m src.scan prints/ -o arvores.csv --format csv --resume
+
+- Processa frames em paralelo usando todos os cores (um TreeDetector por processo)
+- Memória limitada: só SCAN_MAX_IN_FLIGHT frames por worker ficam em trânsito
+- Progresso retomável: checkpoint em <saida>.progress.json
+"""
+
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+CSV_FIELDS = ['frame', 'timestamp', 'x', 'y', 'w', 'h', 'confidence', 'template_id']
+
+# Detector do processo worker (criado uma vez por processo no initializer)
+_worker_detector = None
+
+
+def iter_video_frames(path, start_frame=0, every=1):
+    """Lê frames de um vídeo sob demanda: (índice, timestamp em segundos, frame RGB, None)"""
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Não foi possível abrir o vídeo: {path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or FPS_TARGET
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+
+    idx = start_frame
+    try:
+        while True:
+            ok, frame_bgr = cap.read()
+            if not ok:
+                break
+            if (idx - start_frame) % every == 0:
+                yield idx, idx / fps, cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB), None
+            idx += 1
+    finally:
+        cap.release()
+
+
+def iter_image_frames(folder, start_frame=0, every=1):
+    """Lê imagens de uma pasta em ordem alfabética (timestamp = mtime do arquivo)"""
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS))
+
+    for idx in range(start_frame, len(files), every):
+        filepath = os.path.join(folder, files[idx])
+        # cv2.imdecode em vez de cv2.imread: aceita caminhos com acentos no Windows
+        frame_bgr = cv2.imdecode(np.fromfile(filepath, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame_bgr is None:
+            print(f"  ❌ Erro ao ler {files[idx]}")
+            continue
+        yield idx, os.path.getmtime(filepath), cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB), None
+
+
+def iter_synthetic_frames(spec, start_frame=0, every=1):
+    """Frames gerados por src.synthetic ('synthetic:LxA:árvores:frames[:seed]')"""
+    from src.synthetic import SyntheticScene, parse_spec
+
+    kwargs, count = parse_spec(spec)
+    for idx, timestamp, frame_rgb, _ in SyntheticScene(**kwargs).frames(count):
+        if idx >= start_frame and (idx - start_frame) % every == 0:
+            yield idx, timestamp, frame_rgb.copy(), None
+
+
+def iter_recording_frames(path, start_frame=0, every=1):
+    """
+    Frames de uma gravação de sessão (src.recorder) - views do memmap, sem decodificação
+
+    O frame gravado já é o recorte da ROI: o quarto item é essa ROI (x1, y1, x2, y2) na tela.
+    """
+    from src.recorder import SessionReplay
+
+    for idx, timestamp, frame, roi in SessionReplay(path).frames_iter(start_frame, every):
+        yield idx, timestamp, frame, roi
+
+
+def is_recording(source):
+    """Gravação de sessão (.ring): frames já recortados na ROI"""
+    return source.endswith('.ring')
+
+
+def iter_frames(source, start_frame=0, every=1):
+    """
+    Escolhe a fonte: cena sintética, gravação de sessão, pasta de imagens ou vídeo
+
+    Gera (índice, timestamp, frame RGB, roi); roi é None quando o frame é a tela
+    inteira e (x1, y1, x2, y2) quando ele já é o recorte dessa ROI (gravações).
+    """
+    if source.startswith('synthetic:'):
+        return iter_synthetic_frames(source, start_frame, every)
+    if is_recording(source):
+        return iter_recording_frames(source, start_frame, every)
+    if os.path.isdir(source):
+        return iter_image_frames(source, start_frame, every)
+    return iter_video_frames(source, start_frame, every)
+
+
+def detect_frame(detector, frame_rgb, roi=None, custom_roi=None, **kwargs):
+    """
+    Detecta num frame de iter_frames, com as detecções em coordenadas da tela
+
+    Frame com roi (gravação) já é o recorte: busca nele inteiro e soma a origem
+    da ROI, como o src.recorder.replay().
+    """
+    if roi is None:
+        return detector.detect(frame_rgb, custom_roi=custom_roi, **kwargs)
+
+    detections = detector.detect(frame_rgb, custom_roi=(0, 0, frame_rgb.shape[1], frame_rgb.shape[0]), **kwargs)
+    for det in detections:
+        det['x'] += roi[0]
+        det['y'] += roi[1]
+    return detections
+
+
+def _init_worker(templates_folder, threshold, engine):
+    """Cria o detector do processo worker (sem threads internas: o paralelismo é por processo)"""
+    global _worker_detector
+    from src.detector import TreeDetector
+
+    _worker_detector = TreeDetector(
+        similarity_threshold=threshold,
+        save_folder=templates_folder,
+        use_threading=False,
+        verbose=False,
+        engine=engine
+    )
+
+
+def _scan_frame(frame_rgb, roi, custom_roi, min_confidence):
+    """Detecta árvores em um frame (executado no worker)"""
+    return detect_frame(_worker_detector, frame_rgb, roi, custom_roi, thresholds={'scan': min_confidence})
+
+
+class ScanWriter:
+    """Escreve detecções em JSON-lines ou CSV (uma linha por detecção)"""
+
+    def __init__(self, path, fmt, append):
+        self.fmt = fmt
+        write_header = not (append and os.path.exists(path) and os.path.getsize(path) > 0)
+        self.file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.file, fieldnames=CSV_FIELDS)
+            if write_header:
+                self.csv.writeheader()
+
+    def write(self, frame_idx, timestamp, detections):
+        for det in detections:
+            row = {
+                'frame': frame_idx,
+                'timestamp': round(timestamp, 3),
+                'x': det['x'],
+                'y': det['y'],
+                'w': det['w'],
+                'h': det['h'],
+                'confidence': round(det['confidence'], 4),
+                'template_id': det['template_id']
+            }
+            if self.fmt == 'csv':
+                self.csv.writerow(row)
+            else:
+                self.file.write(json.dumps(row) + '\n')
+
+    def checkpoint(self):
+        """Força escrita em disco e retorna o offset atual do arquivo"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+def _progress_path(output):
+    return f"{output}.progress.json"
+
+
+def load_progress(output, source):
+    """Lê checkpoint de um scan anterior da mesma fonte"""
+    path = _progress_path(output)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, 'r') as f:
+        progress = json.load(f)
+
+    if progress.get('source') != os.path.abspath(source):
+        print(f"⚠️ Checkpoint é de outra fonte ({progress.get('source')}), ignorando")
+        return None
+
+    return progress
+
+
+def save_progress(output, source, next_frame, output_bytes):
+    """Salva checkpoint atomicamente (escreve em .tmp e renomeia)"""
+    path = _progress_path(output)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'source': os.path.abspath(source),
+            'next_frame': next_frame,
+            'output_bytes': output_bytes
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def scan(source, output, fmt='jsonl', workers=None, resume=False, every=1,
+         custom_roi=None, min_confidence=0.0, templates_folder=SAVE_FOLDER,
+         threshold=SIMILARITY_THRESHOLD, engine=DETECTION_ENGINE):
+    """
+    Processa uma gravação inteira e escreve as detecções em `output`
+
+    Retorna um resumo com frames processados, detecções e FPS alcançado.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * SCAN_MAX_IN_FLIGHT
+
+    start_frame = 0
+    if resume:
+        progress = load_progress(output, source)
+        if progress:
+            start_frame = progress['next_frame']
+            # Descartar o que foi escrito depois do último checkpoint
+            if os.path.exists(output):
+                with open(output, 'r+b') as f:
+                    f.truncate(progress['output_bytes'])
+            print(f"↩️ Retomando do frame {start_frame}")
+
+    writer = ScanWriter(output, fmt, append=resume and start_frame > 0)
+
+    print(f"🎞️ Fonte: {source}")
+    print(f"⚡ Workers: {workers} processos")
+
+    frames_done = 0
+    total_detections = 0
+    next_frame = start_frame
+    start_time = time.time()
+    last_report = start_time
+
+    pending = deque()
+
+    def collect(future_entry):
+        nonlocal frames_done, total_detections, next_frame
+        frame_idx, timestamp, future = future_entry
+        detections = [d for d in future.result() if d['confidence'] >= min_confidence]
+        writer.write(frame_idx, timestamp, detections)
+        frames_done += 1
+        total_detections += len(detections)
+        # Próximo frame da amostragem (com --every N o resume continua na mesma grade)
+        next_frame = frame_idx + every
+
+        if frames_done % SCAN_CHECKPOINT_EVERY == 0:
+            save_progress(output, source, next_frame, writer.checkpoint())
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(templates_folder, threshold, engine)) as pool:
+            for frame_idx, timestamp, frame_rgb, roi in iter_frames(source, start_frame, every):
+                # Memória limitada: esperar o frame mais antigo antes de ler mais
+                while len(pending) >= max_in_flight:
+                    collect(pending.popleft())
+
+                future = pool.submit(_scan_frame, frame_rgb, roi, custom_roi, min_confidence)
+                pending.append((frame_idx, timestamp, future))
+
+                now = time.time()
+                if now - last_report >= 5.0:
+                    fps = frames_done / (now - start_time)
+                    print(f"  🔍 frame {next_frame} | {fps:.1f} FPS | {total_detections} detecções")
+                    last_report = now
+
+            while pending:
+                collect(pending.popleft())
+
+    except KeyboardInterrupt:
+        print("\n⚠️ Interrompido - use --resume para continuar de onde parou")
+
+    finally:
+        save_progress(output, source, next_frame, writer.checkpoint())
+        writer.close()
+
+    elapsed = time.time() - start_time
+    summary = {
+        'frames': frames_done,
+        'detections': total_detections,
+        'elapsed': elapsed,
+        'fps': frames_done / elapsed if elapsed > 0 else 0,
+        'next_frame': next_frame
+    }
+
+    print(f"\n📊 Frames processados: {summary['frames']}")
+    print(f"🌳 Detecções: {summary['detections']}")
+    print(f"⏱️ Tempo: {summary['elapsed']:.1f}s")
+    print(f"🚀 FPS médio: {summary['fps']:.1f}")
+
+    return summary
+
+
+def _parse_roi(value):
+    x1, y1, x2, y2 = (int(v) for v in value.split(','))
+    return (x1, y1, x2, y2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m src.scan',
+        description='Detecta árvores em vídeos gravados ou pastas de screenshots'
+    )
+    parser.add_argument('source', help='Arquivo de vídeo, pasta com imagens ou synthetic:LxA:árvores:frames')
+    parser.add_argument('-o', '--output', required=True, help='Arquivo de saída (.jsonl ou .csv)')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default=None,
+                        help='Formato da saída (padrão: pela extensão do arquivo)')
+    parser.add_argument('--workers', type=int, default=None, help='Processos (padrão: todos os cores)')
+    parser.add_argument('--resume', action='store_true', help='Continuar do último checkpoint')
+    parser.add_argument('--every', type=int, default=1, help='Processar 1 a cada N frames')
+    parser.add_argument('--roi', type=_parse_roi, default=None, help='ROI x1,y1,x2,y2 (padrão: ROI do config; gravações .ring usam a ROI gravada)')
+    parser.add_argument('--min-confidence', type=float, default=0.0, help='Descartar detecções abaixo disso')
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--engine', default=DETECTION_ENGINE, help="Motor de detecção ('template', 'cascade' ou 'gradient')")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('csv' if args.output.lower().endswith('.csv') else 'jsonl')
+
+    scan(
+        args.source, args.output, fmt=fmt, workers=args.workers, resume=args.resume,
+        every=args.every, custom_roi=args.roi, min_confidence=args.min_confidence,
+        templates_folder=args.templates, threshold=args.threshold, engine=args.engine
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+"""
+Cache de cenas: reaproveita o resultado de telas já vistas
+
+Voando de um lado para o outro na mesma rota de farm, o detector recebe
+várias vezes a mesma cena. Cada resultado completo fica guardado com uma
+miniatura da ROI em cinza e um hash perceptual (dHash de 64 bits) dela.
+
+Num frame novo:
+- Procura as entradas com o hash mais próximo (distância de Hamming até
+  SCENE_CACHE_MAX_DISTANCE) e o mesmo contexto (ROI, versão dos templates,
+  motor, escala travada)
+- Estima o deslocamento entre as miniaturas (correlação de fase) e confere
+  que, alinhadas, nenhum trecho mudou (árvore cortada, monstro passando)
+- Acerto: devolve as detecções guardadas, transladas pelo deslocamento, sem
+  rodar o matching; se a cena andou, só as faixas que entraram pela borda
+  (exposed_regions) passam pelo matching
+
+LRU limitado por número de entradas e por memória; entradas mais velhas que
+SCENE_CACHE_TTL são descartadas (árvores renascem).
+"""
+
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+# Tamanho estimado de um dict de detecção (chaves + valores), para o limite de memória
+DETECTION_BYTES = 400
+
+
+def exposed_regions(roi, shift, margin):
+    """
+    Faixas (x1, y1, x2, y2) da ROI que entraram na tela com o deslocamento (dx, dy)
+
+    margin: (mx, my) somado à largura/altura de cada faixa - o tamanho do maior
+    template (janelas que tocam a faixa nova) mais a incerteza do deslocamento.
+    """
+    x1, y1, x2, y2 = roi
+    dx, dy = shift
+    mx, my = margin
+
+    regions = []
+    if dx > 0:
+        regions.append((x1, y1, min(x2, x1 + dx + mx), y2))
+    elif dx < 0:
+        regions.append((max(x1, x2 + dx - mx), y1, x2, y2))
+    if dy > 0:
+        regions.append((x1, y1, x2, min(y2, y1 + dy + my)))
+    elif dy < 0:
+        regions.append((x1, max(y1, y2 + dy - my), x2, y2))
+    return regions
+
+
+def scene_hash(thumb):
+    """dHash de 64 bits: cada bit diz se o pixel é mais claro que o vizinho da direita (imagem 9x8)"""
+    small = cv2.resize(thumb, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+
+class SceneCache:
+    """LRU de resultados por cena (hash perceptual + verificação na miniatura)"""
+
+    def __init__(self, max_entries=SCENE_CACHE_MAX_ENTRIES, max_mb=SCENE_CACHE_MAX_MB, ttl=SCENE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+
+        self.entries = OrderedDict()  # id -> entrada (a mais recente no fim)
+        self.bytes = 0
+        self._next_id = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0  # Candidatos com hash parecido que não bateram na verificação
+        self.evicted = 0  # Removidas por limite de entradas/memória
+        self.expired = 0  # Removidas por idade
+        self.saved_ms = 0.0  # Tempo de detecção das entradas reaproveitadas
+
+    def thumbnail(self, gray):
+        """Miniatura float32 da ROI em cinza (SCENE_CACHE_THUMB_WIDTH px de largura)"""
+        h, w = gray.shape[:2]
+        width = min(SCENE_CACHE_THUMB_WIDTH, w)
+        height = max(1, round(h * width / w))
+        return cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+    def _expire(self, now):
+        for key in [k for k, entry in self.entries.items() if now - entry['created'] > self.ttl]:
+            self._remove(key)
+            self.expired += 1
+
+    def _remove(self, key):
+        self.bytes -= self.entries.pop(key)['bytes']
+
+    def _align(self, cached, thumb):
+        """
+        Deslocamento (dx, dy) da cena atual em relação à guardada, em px da
+        miniatura, ou None se ela mudou / andou demais
+        """
+        if cached.shape != thumb.shape:
+            return None
+
+        (dx, dy), response = cv2.phaseCorrelate(cached, thumb)
+        h, w = thumb.shape
+        if response < SCENE_CACHE_MIN_RESPONSE or abs(dx) > SCENE_CACHE_MAX_SHIFT * w \
+                or abs(dy) > SCENE_CACHE_MAX_SHIFT * h:
+            return None
+
+        # Alinhadas, a maior diferença local (média em blocos 4x4) precisa ser pequena
+        shift = np.float32([[1, 0, dx], [0, 1, dy]])
+        aligned = cv2.warpAffine(cached, shift, (w, h))
+        mx1, my1 = int(np.ceil(max(dx, 0))), int(np.ceil(max(dy, 0)))
+        mx2, my2 = w + int(np.floor(min(dx, 0))), h + int(np.floor(min(dy, 0)))
+        if mx2 - mx1 < 4 or my2 - my1 < 4:
+            return None
+
+        diff = cv2.blur(cv2.absdiff(aligned[my1:my2, mx1:mx2], thumb[my1:my2, mx1:mx2]), (4, 4))
+        if float(diff.max()) > SCENE_CACHE_MAX_DIFF:
+            return None
+        return dx, dy
+
+    def lookup(self, thumb, context, roi, materialize, now=None):
+        """
+        (detecções guardadas para esta cena (cópias, já transladadas), (dx, dy)) ou None
+
+        roi: (x1, y1, x2, y2) da ROI na tela, para converter o deslocamento e
+        descartar caixas que saíram dela; materialize: threshold pedido agora
+        (a entrada precisa ter guardado pelo menos até ele). O deslocamento
+        volta em px da tela: as faixas que entraram na tela não estão no cache.
+        """
+        now = time.perf_counter() if now is None else now
+        self._expire(now)
+
+        key_hash = scene_hash(thumb)
+        candidates = []
+        for key, entry in self.entries.items():
+            if entry['context'] != context or entry['materialize'] > materialize:
+                continue
+            distance = bin(entry['hash'] ^ key_hash).count('1')
+            if distance <= SCENE_CACHE_MAX_DISTANCE:
+                candidates.append((distance, key))
+
+        # Hashes mais próximos primeiro; a verificação na miniatura decide
+        best = shift = None
+        for _, key in sorted(candidates)[:SCENE_CACHE_CANDIDATES]:
+            shift = self._align(self.entries[key]['thumb'], thumb)
+            if shift is not None:
+                best = key
+                break
+            self.rejected += 1
+
+        if best is None:
+            self.misses += 1
+            return None
+
+        entry = self.entries[best]
+        self.entries.move_to_end(best)
+        self.hits += 1
+        self.saved_ms += entry['detect_ms']
+
+        x1, y1, x2, y2 = roi
+        factor = (x2 - x1) / thumb.shape[1]
+        dx, dy = round(shift[0] * factor), round(shift[1] * factor)
+
+        # A caixa inteira precisa continuar dentro da ROI (como no matching), com tolerância
+        # de dois pixels da miniatura (erro do deslocamento): quem passa um pouco é encostado na borda
+        tolerance = int(np.ceil(2 * factor))
+        detections = []
+        for det in entry['detections']:
+            if det['confidence'] < materialize:
+                continue
+            x, y, w, h = det['x'] + dx, det['y'] + dy, det['w'], det['h']
+            if x1 - tolerance <= x and x + w <= x2 + tolerance and y1 - tolerance <= y and y + h <= y2 + tolerance:
+                detections.append(dict(det, x=min(max(x, x1), x2 - w), y=min(max(y, y1), y2 - h)))
+        return detections, (dx, dy)
+
+    def store(self, thumb, context, materialize, detections, detect_ms, now=None):
+        """Guarda o resultado de uma cena (o mais antigo sai se passar dos limites)"""
+        now = time.perf_counter() if now is None else now
+        entry = {
+            'hash': scene_hash(thumb),
+            'thumb': thumb,
+            'context': context,
+            'materialize': materialize,
+            'detections': [dict(det) for det in detections],
+            'detect_ms': detect_ms,
+            'created': now,
+            'bytes': thumb.nbytes + DETECTION_BYTES * len(detections)
+        }
+
+        self.entries[self._next_id] = entry
+        self._next_id += 1
+        self.bytes += entry['bytes']
+
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes > self.max_bytes):
+            self._remove(next(iter(self.entries)))
+            self.evicted += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'rejected': self.rejected,
+            'evicted': self.evicted,
+            'expired': self.expired,
+            'saved_ms': self.saved_ms
+        }
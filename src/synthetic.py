@@ -0,0 +1,223 @@
+"""
+Gerador de cenas sintéticas determinísticas (com rótulos) para testes headless
+
+- Compõe os templates de tree_training_data/ (ou árvores procedurais, se a
+  pasta estiver vazia) sobre um fundo texturizado com grama, água e caminhos
+- Posições, escalas e densidade conhecidas, tudo a partir de uma seed
+- Câmera rolando pelo "mundo" para imitar o personagem voando
+- Rótulos no mesmo formato do autotuner (labels.jsonl)
+
+Uso:
+    python -m src.synthetic dataset/ --frames 300 --size 1920x1080 --trees 20
+    python -m src.benchmark synthetic:3840x2160:100:120   # direto, sem gravar em disco
+"""
+
+import argparse
+import json
+import os
+
+import cv2
+import numpy as np
+
+from src.config import *
+
+
+def procedural_tree(rng, w, h):
+    """Árvore simples (copa + tronco + textura) em RGB"""
+    tree = np.zeros((h, w, 3), dtype=np.uint8)
+    tree[:] = (90, 140, 60)
+    trunk_w = max(2, w // 10)
+    cv2.rectangle(tree, (w // 2 - trunk_w, int(h * 0.6)), (w // 2 + trunk_w, h - 1), (100, 60, 30), -1)
+    green = int(rng.integers(90, 150))
+    cv2.ellipse(tree, (w // 2, int(h * 0.38)), (max(1, w // 2 - 2), max(1, int(h * 0.36))),
+                0, 0, 360, (40, green, 30), -1)
+    noise = rng.integers(0, 50, size=(h, w, 1), dtype=np.uint8)
+    tree = cv2.add(tree, np.repeat(noise, 3, axis=2))
+    return cv2.GaussianBlur(tree, (3, 3), 0)
+
+
+def load_sprites(folder, rng, fallback_count=6):
+    """Templates RGB da pasta; sem templates, gera árvores procedurais"""
+    sprites = []
+    if os.path.isdir(folder):
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith('.png'):
+                continue
+            # cv2.imdecode em vez de cv2.imread: aceita caminhos com acentos no Windows
+            image = cv2.imdecode(np.fromfile(os.path.join(folder, filename), dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is not None:
+                sprites.append(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+
+    if not sprites:
+        for i in range(fallback_count):
+            sprites.append(procedural_tree(rng, 36 + i * 6, 44 + i * 7))
+
+    return sprites
+
+
+def textured_background(rng, width, height):
+    """Grama com variação de baixa frequência, manchas de água e caminhos de terra"""
+    # Variação suave: ruído pequeno ampliado
+    low = rng.integers(0, 40, size=(max(2, height // 64), max(2, width // 64), 1), dtype=np.uint8)
+    low = cv2.resize(low, (width, height), interpolation=cv2.INTER_CUBIC)[..., None]
+
+    background = np.empty((height, width, 3), dtype=np.uint8)
+    background[:] = (70, 120, 50)
+    background = cv2.add(background, np.repeat(low, 3, axis=2))
+
+    # Água
+    for _ in range(max(1, (width * height) // 2_000_000)):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        axes = (int(rng.integers(width // 20, width // 6)), int(rng.integers(height // 20, height // 6)))
+        cv2.ellipse(background, center, axes, float(rng.uniform(0, 180)), 0, 360, (40, 90, 170), -1)
+
+    # Caminhos
+    for _ in range(max(1, (width * height) // 3_000_000)):
+        pt1 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        pt2 = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        cv2.line(background, pt1, pt2, (150, 120, 80), int(rng.integers(20, 60)))
+
+    # Ruído fino (textura de grama)
+    fine = rng.integers(0, 20, size=(height, width, 1), dtype=np.uint8)
+    return cv2.add(background, np.repeat(fine, 3, axis=2))
+
+
+class SyntheticScene:
+    """
+    Mundo sintético maior que a tela, com árvores em posições conhecidas,
+    filmado por uma câmera que rola (e rebate nas bordas do mundo)
+    """
+
+    def __init__(self, width=1920, height=1080, trees_per_frame=20, seed=0,
+                 templates_folder=SAVE_FOLDER, scale_range=(1.0, 1.0), speed=(6.0, 2.0),
+                 world_factor=2.0, jitter=12, fps=FPS_TARGET):
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.rng = np.random.default_rng(seed)
+
+        self.world_w = int(width * world_factor)
+        self.world_h = int(height * world_factor)
+        self.world = textured_background(self.rng, self.world_w, self.world_h)
+
+        self.sprites = load_sprites(templates_folder, self.rng)
+        self.trees = []  # (x, y, w, h, sprite_id, scale) em coordenadas do mundo
+
+        area_ratio = (self.world_w * self.world_h) / (width * height)
+        self._place_trees(int(round(trees_per_frame * area_ratio)), scale_range, jitter)
+
+        self.camera = np.array([
+            self.rng.uniform(0, self.world_w - width),
+            self.rng.uniform(0, self.world_h - height)
+        ])
+        self.velocity = np.array(speed, dtype=float)
+
+    def _place_trees(self, count, scale_range, jitter):
+        """Posiciona árvores sem sobreposição (tentativas limitadas)"""
+        occupied = np.zeros((self.world_h, self.world_w), dtype=bool)
+
+        for _ in range(count):
+            sprite_id = int(self.rng.integers(len(self.sprites)))
+            scale = float(self.rng.uniform(*scale_range))
+            sprite = self.sprites[sprite_id]
+            w = max(MIN_TEMPLATE_SIZE, int(sprite.shape[1] * scale))
+            h = max(MIN_TEMPLATE_SIZE, int(sprite.shape[0] * scale))
+
+            for _ in range(20):
+                x = int(self.rng.integers(0, self.world_w - w))
+                y = int(self.rng.integers(0, self.world_h - h))
+                if not occupied[y:y + h, x:x + w].any():
+                    break
+            else:
+                continue
+
+            image = cv2.resize(sprite, (w, h)) if (w, h) != sprite.shape[1::-1] else sprite
+
+            # Variação leve de brilho para não ser uma cópia exata do template
+            if jitter:
+                delta = int(self.rng.integers(-jitter, jitter + 1))
+                image = cv2.add(image, np.full_like(image, abs(delta))) if delta >= 0 \
+                    else cv2.subtract(image, np.full_like(image, abs(delta)))
+
+            self.world[y:y + h, x:x + w] = image
+            occupied[y:y + h, x:x + w] = True
+            self.trees.append((x, y, w, h, sprite_id, scale))
+
+    def _advance(self):
+        """Move a câmera e rebate nas bordas do mundo"""
+        self.camera += self.velocity
+        limits = (self.world_w - self.width, self.world_h - self.height)
+        for axis in range(2):
+            if self.camera[axis] < 0 or self.camera[axis] > limits[axis]:
+                self.velocity[axis] = -self.velocity[axis]
+                self.camera[axis] = min(max(self.camera[axis], 0), limits[axis])
+
+    def labels(self, cam_x, cam_y):
+        """Árvores totalmente visíveis no frame: [(x, y, w, h)] em coordenadas da tela"""
+        visible = []
+        for x, y, w, h, _, _ in self.trees:
+            sx, sy = x - cam_x, y - cam_y
+            if sx >= 0 and sy >= 0 and sx + w <= self.width and sy + h <= self.height:
+                visible.append((sx, sy, w, h))
+        return visible
+
+    def frames(self, count):
+        """Gera (índice, timestamp, frame RGB, rótulos) - o frame é uma view do mundo"""
+        for idx in range(count):
+            cam_x, cam_y = int(self.camera[0]), int(self.camera[1])
+            frame = self.world[cam_y:cam_y + self.height, cam_x:cam_x + self.width]
+            yield idx, idx / self.fps, frame, self.labels(cam_x, cam_y)
+            self._advance()
+
+
+def parse_spec(spec):
+    """'synthetic:LxA:árvores:frames[:seed]' → (kwargs do SyntheticScene, frames)"""
+    parts = spec.split(':')[1:]
+    width, height = (int(v) for v in parts[0].split('x'))
+    trees = int(parts[1]) if len(parts) > 1 else 20
+    frames = int(parts[2]) if len(parts) > 2 else 300
+    seed = int(parts[3]) if len(parts) > 3 else 0
+    return {'width': width, 'height': height, 'trees_per_frame': trees, 'seed': seed}, frames
+
+
+def write_dataset(folder, scene, count):
+    """Grava PNGs + labels.jsonl (formato do autotuner)"""
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'labels.jsonl'), 'w') as labels_file:
+        for idx, timestamp, frame, boxes in scene.frames(count):
+            filename = f"frame_{idx:05d}.png"
+            cv2.imencode('.png', cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))[1].tofile(os.path.join(folder, filename))
+            labels_file.write(json.dumps({
+                'frame': filename,
+                'timestamp': round(timestamp, 3),
+                'boxes': [list(map(int, box)) for box in boxes]
+            }) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.synthetic',
+                                     description='Gera frames sintéticos rotulados')
+    parser.add_argument('output', help='Pasta de saída (PNGs + labels.jsonl)')
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--size', default='1920x1080', help='Resolução LxA (até 3840x2160)')
+    parser.add_argument('--trees', type=int, default=20, help='Árvores por frame (em média)')
+    parser.add_argument('--scale', type=float, nargs=2, default=(1.0, 1.0), metavar=('MIN', 'MAX'),
+                        help='Faixa de escala das árvores')
+    parser.add_argument('--speed', type=float, nargs=2, default=(6.0, 2.0), metavar=('VX', 'VY'),
+                        help='Velocidade da câmera (px/frame)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    args = parser.parse_args(argv)
+
+    width, height = (int(v) for v in args.size.split('x'))
+    scene = SyntheticScene(width, height, args.trees, args.seed, args.templates,
+                           tuple(args.scale), tuple(args.speed))
+
+    print(f"🌲 Mundo {scene.world_w}x{scene.world_h} com {len(scene.trees)} árvores "
+          f"({len(scene.sprites)} sprites)")
+    write_dataset(args.output, scene, args.frames)
+    print(f"💾 {args.frames} frames em {args.output}")
+
+
+if __name__ == '__main__':
+    main()
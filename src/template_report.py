@@ -0,0 +1,161 @@
+"""
+Relatório de custo x benefício dos templates e proposta de poda
+
+Roda o detector (sequencial, para os tempos somarem) sobre uma gravação e
+ranqueia os templates por detecções por milissegundo de matching. A poda é
+gulosa: do pior para o melhor, um template sai se as detecções que só ele
+achava não passarem de --max-loss do total.
+
+Uso:
+    python -m src.template_report gameplay.mp4
+    python -m src.template_report session.ring --max-loss 0.02
+    python -m src.template_report prints/ --apply tree_training_data/podados
+"""
+
+import argparse
+import os
+import shutil
+import time
+
+import numpy as np
+
+from src.config import *
+from src.scan import iter_frames, is_recording
+
+
+def collect(detector, frames, custom_roi=None):
+    """
+    Roda o detector e guarda, por detecção final, os templates que a acharam
+
+    Retorna (lista de conjuntos de templates, tempos de detecção em ms)
+    """
+    thresholds = {'report': TEMPLATE_STATS_MIN_CONFIDENCE}
+
+    # Aquecimento fora da contabilidade
+    detector.detect(frames[0], custom_roi=custom_roi, thresholds=thresholds)
+    detector.reset_template_stats()
+
+    supports = []
+    times = []
+    for frame in frames:
+        start = time.perf_counter()
+        detections = detector.detect(frame, custom_roi=custom_roi, thresholds=thresholds)
+        times.append((time.perf_counter() - start) * 1000)
+
+        for det, found_by in zip(detections, detector.last_support):
+            if det['confidence'] >= TEMPLATE_STATS_MIN_CONFIDENCE:
+                supports.append(frozenset(found_by))
+
+    return supports, np.array(times)
+
+
+def propose_pruning(rows, supports, max_loss=0.0):
+    """
+    Poda gulosa do template menos rentável para o mais rentável
+
+    Retorna (ids removidos, detecções perdidas)
+    """
+    allowed = int(max_loss * len(supports))
+    removed = set()
+    lost = 0
+
+    for row in sorted(rows, key=lambda r: (r['hits_per_ms'], -r['ms_per_frame'])):
+        candidate = removed | {row['template_id']}
+        candidate_lost = sum(1 for found_by in supports if found_by <= candidate)
+        if candidate_lost <= allowed:
+            removed = candidate
+            lost = candidate_lost
+
+    return removed, lost
+
+
+def project(rows, removed, times):
+    """Tempo por frame projetado sem os templates removidos (o resto do pipeline fica igual)"""
+    current_ms = float(times.mean())
+    matching_ms = sum(r['ms_per_frame'] for r in rows)
+    overhead_ms = max(0.0, current_ms - matching_ms)
+    projected_ms = overhead_ms + sum(r['ms_per_frame'] for r in rows if r['template_id'] not in removed)
+    return current_ms, projected_ms
+
+
+def print_report(rows, supports, removed, lost, current_ms, projected_ms):
+    print(f"\n{'#':>3}  {'template':<32}{'tamanho':>9}{'ms/frame':>10}{'hits':>6}"
+          f"{'melhor':>8}{'média':>7}{'únicos':>8}{'hits/ms':>9}")
+    for r in sorted(rows, key=lambda r: r['hits_per_ms'], reverse=True):
+        h, w = r['size'][:2]
+        mark = '  ✂️' if r['template_id'] in removed else ''
+        print(
+            f"{r['template_id']:>3}  {os.path.basename(r['path'])[:31]:<32}{f'{w}x{h}':>9}"
+            f"{r['ms_per_frame']:>10.2f}{r['hits']:>6}{r['best']:>8.0%}{r['mean']:>7.0%}"
+            f"{r['unique']:>8}{r['hits_per_ms']:>9.2f}{mark}"
+        )
+
+    total = len(supports)
+    print(f"\n🌳 {total} detecções ≥{TEMPLATE_STATS_MIN_CONFIDENCE:.0%} | "
+          f"{sum(1 for r in rows if r['hits'] == 0)} templates sem nenhuma")
+
+    if not removed:
+        print("✅ Nenhum template pode sair sem perder detecções")
+        return
+
+    print(f"✂️ Poda proposta: {len(removed)}/{len(rows)} templates | "
+          f"perde {lost} detecções ({lost / max(total, 1):.1%})")
+    print(f"⚡ {current_ms:.1f}ms → {projected_ms:.1f}ms por frame "
+          f"({1000 / current_ms:.1f} → {1000 / max(projected_ms, 1e-6):.1f} FPS, "
+          f"{current_ms / max(projected_ms, 1e-6):.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.template_report',
+                                     description='Custo x benefício dos templates e poda sugerida')
+    parser.add_argument('source', help='Vídeo, pasta de imagens, gravação .ring ou synthetic:...')
+    parser.add_argument('--max-frames', type=int, default=300)
+    parser.add_argument('--every', type=int, default=1, help='Usar 1 a cada N frames')
+    parser.add_argument('--max-loss', type=float, default=0.0,
+                        help='Fração de detecções que a poda pode perder')
+    parser.add_argument('--templates', default=SAVE_FOLDER, help='Pasta de templates')
+    parser.add_argument('--engine', default=DETECTION_ENGINE)
+    parser.add_argument('--full-frame', action='store_true', help='Buscar no frame inteiro')
+    parser.add_argument('--apply', metavar='PASTA', default=None,
+                        help='Mover os templates podados para esta pasta')
+    args = parser.parse_args(argv)
+
+    from src.detector import TreeDetector
+
+    frames = []
+    for _, _, frame, _ in iter_frames(args.source, 0, args.every):
+        frames.append(frame)
+        if len(frames) >= args.max_frames:
+            break
+
+    if not frames:
+        print("⚠️ Nenhum frame lido da fonte!")
+        return
+
+    # Gravações já são o recorte da ROI: buscar no frame inteiro (como o replay)
+    full_frame = args.full_frame or is_recording(args.source)
+    custom_roi = (0, 0, frames[0].shape[1], frames[0].shape[0]) if full_frame else None
+
+    # Sequencial: o custo de cada template soma direto no tempo do frame
+    detector = TreeDetector(save_folder=args.templates, use_threading=False, verbose=False, engine=args.engine)
+    try:
+        print(f"🎞️ {len(frames)} frames | 📚 {len(detector.templates)} templates")
+        supports, times = collect(detector, frames, custom_roi)
+        rows = detector.template_stats()
+    finally:
+        detector.cleanup()
+
+    removed, lost = propose_pruning(rows, supports, args.max_loss)
+    current_ms, projected_ms = project(rows, removed, times)
+    print_report(rows, supports, removed, lost, current_ms, projected_ms)
+
+    if args.apply and removed:
+        os.makedirs(args.apply, exist_ok=True)
+        for r in rows:
+            if r['template_id'] in removed:
+                shutil.move(r['path'], os.path.join(args.apply, os.path.basename(r['path'])))
+        print(f"📦 {len(removed)} templates movidos para {args.apply}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Conjunto de templates imutável e versionado + gravação assíncrona em disco
+
+O detector guarda um TemplateSet (tupla imutável com número de versão) e
+cada frame usa o conjunto que estava publicado quando começou. Mudanças
+(novo template, escala travada, troca de motor) criam um conjunto novo e o
+publicam trocando uma única referência - threads no meio de um frame nunca
+veem uma lista pela metade.
+
+O PNG de um template capturado é gravado por uma thread própria: a captura
+não espera o disco.
+
+O TemplateBank junta conjunto publicado, lock de publicação e gravação; vários
+detectores (um por cliente, ver src.multiclient) podem compartilhar o mesmo banco.
+"""
+
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+from src.config import *
+
+
+class TemplateSet(tuple):
+    """Tupla de dicts de template com `version` (incrementada a cada publicação)"""
+
+    def __new__(cls, templates=(), version=0):
+        instance = super().__new__(cls, templates)
+        instance.version = version
+        return instance
+
+    def replace(self, templates):
+        """Nova versão com outros templates (o conjunto atual não muda)"""
+        return TemplateSet(templates, self.version + 1)
+
+
+class TemplatePersistence:
+    """Fila de gravação de templates em PNG com uma thread escritora (iniciada no primeiro uso)"""
+
+    def __init__(self, max_pending=TEMPLATE_SAVE_MAX_PENDING):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.saved = 0
+        self.errors = 0
+        self.save_ms = 0.0
+
+    def save(self, image, path):
+        """Enfileira a gravação (imagem PIL ou array RGB); só bloqueia se a fila estiver cheia"""
+        with self._lock:
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._writer_loop, name='template-writer', daemon=True)
+                self._thread.start()
+        self.queue.put((image, path))
+
+    def stop(self, timeout=5.0):
+        """Grava o que falta e encerra a thread (nunca trava se ela morreu)"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None or not thread.is_alive():
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            print(f"⚠️ Gravação de templates não esvaziou em {timeout:.0f}s, {self.queue.qsize()} pendentes")
+            return
+        thread.join(timeout)
+
+    def _writer_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            image, path = item
+            start = time.perf_counter()
+            try:
+                if hasattr(image, 'save'):
+                    image.save(path)
+                else:
+                    # cv2.imencode + tofile em vez de cv2.imwrite: aceita caminhos com acentos no Windows
+                    cv2.imencode(os.path.splitext(path)[1], cv2.cvtColor(image, cv2.COLOR_RGB2BGR))[1].tofile(path)
+                self.saved += 1
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ Erro ao salvar template {path}: {e}")
+            self.save_ms += (time.perf_counter() - start) * 1000
+
+    def stats(self):
+        return {
+            'pending': self.queue.qsize(),
+            'saved': self.saved,
+            'errors': self.errors,
+            'avg_save_ms': self.save_ms / self.saved if self.saved else 0.0
+        }
+
+
+class TemplateBank:
+    """Conjunto publicado + publicação serializada + gravação em disco (compartilhável entre detectores)"""
+
+    def __init__(self):
+        self.current = TemplateSet()
+        self._lock = threading.Lock()
+        self.persistence = TemplatePersistence()
+
+    def publish(self, update):
+        """
+        Publica um novo conjunto: update(lista atual) → nova lista
+
+        Publicadores são serializados; leitores nunca esperam (só trocam a referência).
+        """
+        with self._lock:
+            self.current = self.current.replace(update(list(self.current)))
+        return self.current
+
+    def close(self):
+        self.persistence.stop()
@@ -0,0 +1,75 @@
+"""
+Rastreamento simples de detecções entre frames (IDs estáveis por proximidade)
+"""
+
+from src.config import *
+
+
+def center(det):
+    """Centro (x, y) de uma detecção"""
+    return det['x'] + det['w'] / 2, det['y'] + det['h'] / 2
+
+
+class Tracker:
+    """
+    Associa cada detecção ao track anterior mais próximo (centros a menos de
+    max_distance em x e y), das mais confiáveis para as menos
+
+    Um track some depois de max_misses frames seguidos sem detecção.
+    """
+
+    def __init__(self, max_distance=DUPLICATE_DISTANCE, max_misses=0, prefix='t'):
+        self.max_distance = max_distance
+        self.max_misses = max_misses
+        self.prefix = prefix
+        self.tracks = {}  # id -> {'center': (x, y), 'hits': int, 'misses': int, 'det': dict}
+        self.next_id = 0
+
+    def reset(self):
+        self.tracks = {}
+
+    def update(self, detections):
+        """
+        Atualiza os tracks com as detecções do frame
+
+        Retorna (lista de (track_id, detecção), lista de tracks removidos)
+        """
+        unmatched = dict(self.tracks)
+        assigned = []
+
+        for det in sorted(detections, key=lambda d: d['confidence'], reverse=True):
+            cx, cy = center(det)
+            track_id = None
+            best_dist = None
+
+            for candidate_id, track in unmatched.items():
+                dx = abs(cx - track['center'][0])
+                dy = abs(cy - track['center'][1])
+                if dx < self.max_distance and dy < self.max_distance:
+                    dist = dx * dx + dy * dy
+                    if best_dist is None or dist < best_dist:
+                        best_dist = dist
+                        track_id = candidate_id
+
+            if track_id is None:
+                track_id = f"{self.prefix}{self.next_id}"
+                self.next_id += 1
+                self.tracks[track_id] = {'hits': 0}
+            else:
+                del unmatched[track_id]
+
+            track = self.tracks[track_id]
+            track['center'] = (cx, cy)
+            track['hits'] += 1
+            track['misses'] = 0
+            track['det'] = det
+            assigned.append((track_id, det))
+
+        removed = []
+        for track_id, track in unmatched.items():
+            track['misses'] += 1
+            track['hits'] = 0
+            if track['misses'] > self.max_misses:
+                removed.append((track_id, self.tracks.pop(track_id)))
+
+        return assigned, removed